@@ -1,3 +1,5 @@
+import StatusError from './StatusError.js';
+
 /**
  * @typedef {Object} Language
  * @property {string} code
@@ -53,15 +55,33 @@ export class TranslationsManager {
         return this.loadLanguages();
     }
 
+    /**
+     * Method, that loads hash of current translations for some language from API.
+     * @param {string} lang Code of language.
+     * @return {Promise.<string|undefined>}
+     */
+    async loadTranslationsHash(lang) {
+        const language = (await this.loadLanguages()).find((item) => item.code === lang);
+        return language ? language.translations_hash : undefined;
+    }
+
     /**
      * Method, that loads translations for some language from API.
+     * Url with hash of translations is cached by browser forever.
      * @param {string} lang Code of language, translations of which to load.
+     * @param {string=} hash Hash of translations.
      * @return {Promise.<Object>}
      */
-    loadTranslations(lang) {
-        return this.api.bulkQuery({ path: ['_lang', lang], method: 'get' }).then((response) => {
-            return response.data.translations;
+    async loadTranslations(lang, hash = undefined) {
+        const response = await this.api.makeRequest({
+            method: 'get',
+            path: ['_lang', lang],
+            query: hash ? { v: hash } : undefined,
         });
+        if (response.status !== 200) {
+            throw new StatusError(response.status, response.data);
+        }
+        return response.data.translations;
     }
 
     /**
@@ -70,12 +90,14 @@ export class TranslationsManager {
      * @return {Promise.<Object>}
      */
     async getTranslationsFromCache(lang) {
+        const hash = await this.loadTranslationsHash(lang);
+        const key = `translations.${lang}.${hash}`;
         try {
-            const response = await this.cache.get('translations.' + lang);
+            const response = await this.cache.get(key);
             return JSON.parse(response.data);
         } catch (error) {
-            const translations = await this.loadTranslations(lang);
-            this.cache.set('translations.' + lang, JSON.stringify(translations));
+            const translations = await this.loadTranslations(lang, hash);
+            this.cache.set(key, JSON.stringify(translations));
             return translations;
         }
     }
@@ -85,10 +107,10 @@ export class TranslationsManager {
      * @param {string} lang - Code of language, translations of which to load.
      * @return {Promise.<Object>}
      */
-    getTranslations(lang) {
+    async getTranslations(lang) {
         if (this.cache) {
             return this.getTranslationsFromCache(lang);
         }
-        return this.loadTranslations(lang);
+        return this.loadTranslations(lang, await this.loadTranslationsHash(lang));
     }
 }
@@ -5,6 +5,10 @@ import shutil
 import re
 import io
 import pwd
+import time
+import subprocess
+import threading
+import asyncio
 from pathlib import Path
 
 from unittest.mock import patch, PropertyMock
@@ -19,6 +23,7 @@ from django.core.management import call_command
 from django.template.exceptions import TemplateDoesNotExist
 from django.middleware.csrf import _get_new_csrf_token
 from django.core.cache import cache
+from django.core.signals import request_finished
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
 from django.test import Client
@@ -38,7 +43,7 @@ from vstutils.api.validators import (
 )
 from vstutils.api.auth import UserViewSet
 from vstutils.exceptions import UnknownTypeException
-from vstutils.ldap_utils import LDAP
+from vstutils.ldap_utils import LDAP, LDAPConnectionPool
 from vstutils.templatetags.vst_gravatar import get_user_gravatar
 from vstutils.tests import BaseTestCase, json, override_settings
 from vstutils.tools import get_file_value
@@ -112,6 +117,12 @@ def async_test(coro):
     return async_to_sync(coro, force_new_loop=True)
 
 
+def host_name_upper(obj):
+    if obj.name.endswith('_error'):
+        raise ValueError(obj.name)
+    return obj.name.upper()
+
+
 class VSTUtilsCommandsTestCase(BaseTestCase):
 
     def setUp(self):
@@ -129,6 +140,165 @@ class VSTUtilsCommandsTestCase(BaseTestCase):
         except OSError:
             pass
 
+    def test_buildstatic(self):
+        import gzip
+        from django.template import Template, Context
+        from vstutils.static_files import static_manifest
+
+        source = Path(self.project_place) / 'static'
+        output = Path(self.project_place) / 'static_build'
+        (source / 'bundle').mkdir(parents=True)
+        (source / 'bundle' / 'app.js').write_text('console.log("test");\n' * 100)
+        (source / 'bundle' / 'small.js').write_text('1;')
+        (source / 'img.png').write_bytes(b'\x89PNG' * 500)
+
+        with override_settings(STATIC_FILES_FOLDERS=[str(source)], STATIC_BUILD_DIR=str(output)):
+            out = io.StringIO()
+            call_command('buildstatic', stdout=out)
+            self.assertIn('Built 3 files (1 compressed)', out.getvalue())
+            manifest = json.loads((output / 'manifest.json').read_text())
+            hashed_name = manifest['files']['bundle/app.js']
+            self.assertRegex(hashed_name, r'^bundle/app\.[0-9a-f]{12}\.js$')
+            self.assertEqual(manifest['encodings'], {hashed_name: ['gzip']})
+            self.assertTrue((output / hashed_name).exists())
+            self.assertFalse((output / (manifest['files']['img.png'] + '.gz')).exists())
+
+            # Tags resolve names through manifest.
+            rendered = Template(
+                '{% load request_static %}{% static "bundle/app.js" %}|{% static_path "unknown.js" %}'
+            ).render(Context({'host_url': 'http://server'}))
+            self.assertEqual(rendered, f'/static/{hashed_name}|http://server/static/unknown.js')
+
+            url = f'/static/{hashed_name}'
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip, deflate')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertIn('javascript', response['Content-Type'])
+            content = b''.join(response.streaming_content)
+            self.assertEqual(gzip.decompress(content), (source / 'bundle' / 'app.js').read_bytes())
+            self.assertEqual(int(response['Content-Length']), len(content))
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(b''.join(response.streaming_content), (source / 'bundle' / 'app.js').read_bytes())
+            self.assertEqual(self.client.get('/static/bundle/app.0123456789ab.js').status_code, 404)
+
+            # Unchanged files are not rebuilt and manifest is reloaded on change.
+            mtime = (output / hashed_name).stat().st_mtime_ns
+            (source / 'bundle' / 'app.js').write_text('console.log("changed");\n' * 100)
+            time.sleep(0.01)
+            call_command('buildstatic', '--no-compress', stdout=io.StringIO())
+            self.assertEqual((output / hashed_name).stat().st_mtime_ns, mtime)
+            self.assertNotEqual(static_manifest.get_name('bundle/app.js'), hashed_name)
+            self.assertEqual(static_manifest.encodings, {})
+
+    def test_searchindexes(self):
+        from django.core.management import CommandError
+        from django.db import connection, DatabaseError
+        from django.test.utils import CaptureQueriesContext
+        from vstutils.search import get_search_backend, MySQLSearchBackend, SQLiteSearchBackend
+
+        backend = get_search_backend()
+        self.addCleanup(backend.clear_cache)
+        Host.objects.bulk_create([Host(name=name) for name in ('first_host', 'Second_Host', 'other')])
+        filterset_class = Host.generated_view.filterset_class
+
+        def search(value, field='name'):
+            with CaptureQueriesContext(connection) as queries:
+                result = sorted(filterset_class({field: value}, queryset=Host.objects.all()).qs.values_list(
+                    'name', flat=True
+                ))
+            return result, queries[-1]['sql']
+
+        # Without index search uses only `contains`.
+        names, sql = search('_host')
+        self.assertEqual(names, ['Second_Host', 'first_host'])
+        self.assertNotIn('_fts', sql)
+
+        # Missing index is checked again after timeout.
+        name_field = Host._meta.get_field('name')
+        with patch.object(SQLiteSearchBackend, 'index_exists', return_value=False) as index_exists:
+            backend.clear_cache()
+            self.assertFalse(backend.has_index(Host, name_field))
+            self.assertFalse(backend.has_index(Host, name_field))
+            self.assertEqual(index_exists.call_count, 1)
+            with patch('vstutils.search.time.time', return_value=time.time() + backend.index_check_timeout):
+                self.assertFalse(backend.has_index(Host, name_field))
+            self.assertEqual(index_exists.call_count, 2)
+
+        out = io.StringIO()
+        call_command('searchindexes', '--dry-run', stdout=out)
+        self.assertIn('CREATE VIRTUAL TABLE IF NOT EXISTS "test_proj_host_name_fts"', out.getvalue())
+        self.assertNotIn('test_proj_file', out.getvalue())
+        self.assertNotIn('_fts', search('_host')[1])
+
+        # Failed index doesn't stop creation of other indexes.
+        create_index = SQLiteSearchBackend.create_index
+
+        def create_index_mock(self, model, field):
+            if model is Host:
+                raise DatabaseError('test error')
+            return create_index(self, model, field)
+
+        out = io.StringIO()
+        with patch.object(SQLiteSearchBackend, 'create_index', create_index_mock):
+            with self.assertRaisesMessage(CommandError, 'test_proj.Host.name'):
+                call_command('searchindexes', stdout=out)
+        self.assertIn('Failed to create search index for test_proj.Host.name: test error', out.getvalue())
+        self.assertIn('Created search index for test_proj.Author.name.', out.getvalue())
+
+        out = io.StringIO()
+        call_command('searchindexes', stdout=out)
+        self.assertIn('Created search index for test_proj.Host.name.', out.getvalue())
+        self.assertIn('Skip test_proj.Author.name: search index already exists.', out.getvalue())
+        out = io.StringIO()
+        call_command('searchindexes', stdout=out)
+        self.assertIn('Skip test_proj.Host.name: search index already exists.', out.getvalue())
+
+        names, sql = search('_host')
+        self.assertEqual(names, ['Second_Host', 'first_host'])
+        self.assertIn('"test_proj_host_name_fts" MATCH', sql)
+        # Index is kept in sync by triggers.
+        Host.objects.filter(name='other').update(name='third_host')
+        Host.objects.filter(name='first_host').delete()
+        self.assertEqual(search('_host')[0], ['Second_Host', 'third_host'])
+        self.assertEqual(search('d_"h')[0], [])
+        # Short values and exclusion are filtered by `contains`.
+        names, sql = search('_h')
+        self.assertEqual(names, ['Second_Host', 'third_host'])
+        self.assertNotIn('_fts', sql)
+        self.assertNotIn('_fts', search('ird', 'name__not')[1])
+        self.assertEqual(search('ird', 'name__not')[0], ['Second_Host'])
+
+        # Index without triggers (e.g. after table is altered by migration) isn't used until it is recreated.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "test_proj_host_name_fts_ai"')
+        backend.clear_cache()
+        self.assertFalse(backend.index_exists(Host, name_field))
+        Host.objects.create(name='new_host')
+        names, sql = search('_host')
+        self.assertEqual(names, ['Second_Host', 'new_host', 'third_host'])
+        self.assertNotIn('_fts', sql)
+        out = io.StringIO()
+        call_command('searchindexes', stdout=out)
+        self.assertIn('Created search index for test_proj.Host.name.', out.getvalue())
+        names, sql = search('_host')
+        self.assertEqual(names, ['Second_Host', 'new_host', 'third_host'])
+        self.assertIn('_fts', sql)
+
+        # MySQL index has no ngrams of short words.
+        mysql_backend = MySQLSearchBackend('default')
+        self.assertTrue(mysql_backend.can_use_index('ab cd'))
+        self.assertFalse(mysql_backend.can_use_index('ab c'))
+        self.assertFalse(mysql_backend.can_use_index(' " '))
+        # Uncommitted rows are not in index, so it isn't used in transaction.
+        with patch.object(MySQLSearchBackend, 'has_index', return_value=True):
+            self.assertNotIn('MATCH', str(mysql_backend.filter(Host.objects.all(), 'name', 'host').query))
+            with patch.object(connection, 'in_atomic_block', False):
+                self.assertIn('MATCH', str(mysql_backend.filter(Host.objects.all(), 'name', 'host').query))
+
     def test_executors(self):
         dir_name = os.path.dirname(__file__)
         cmd = utils.UnhandledExecutor(stderr=utils.UnhandledExecutor.DEVNULL)
@@ -139,6 +309,154 @@ class VSTUtilsCommandsTestCase(BaseTestCase):
         with utils.raise_context():
             cmd.execute('bash -c "python0.0 --version"'.split(' '), dir_name)
 
+        class StreamingExecutor(utils.StreamingExecutor):
+            LINES_BATCH = 100
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.batches = []
+                self.checks = 0
+
+            def lines_handler(self, lines):
+                self.batches.append(len(lines))
+                super().lines_handler(lines)
+
+            def working_handler(self, proc):
+                self.checks += 1
+
+        script = 'import sys\nfor i in range(1000): print(i)\nsys.stdout.write("a\\r\\nb\\rc  ")'
+        output_file = Path(self.project_place) / 'output.log'
+        os.makedirs(self.project_place, exist_ok=True)
+        cmd = StreamingExecutor(output_limit=10, output_file=output_file)
+        self.assertEqual(cmd.execute([sys.executable, '-c', script], dir_name), '7998999abc')
+        self.assertEqual(sum(cmd.batches), 1003)
+        self.assertLessEqual(max(cmd.batches), 100)
+        self.assertTrue(output_file.read_text().startswith('0123'))
+        self.assertTrue(output_file.read_text().endswith('999abc'))
+        with self.assertRaises(utils.StreamingExecutor.CalledProcessError):
+            cmd.execute([sys.executable, '-c', 'print("error"); exit(2)'], dir_name)
+        self.assertEqual(cmd.output, 'error')
+
+        # Cancellation wakes up reading loop without waiting for output or working_handler.
+        cmd = utils.StreamingExecutor()
+        cmd.working_handler = None
+        threading.Timer(0.2, cmd.cancel).start()
+        start = time.monotonic()
+        with self.assertRaises(utils.StreamingExecutor.CalledProcessError):
+            cmd.execute([sys.executable, '-c', 'import time; print("started", flush=True); time.sleep(10)'], dir_name)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(cmd.output, 'started')
+        # Closed wakeup pipe isn't written, so its descriptors could be reused safely.
+        with patch('vstutils.utils.os.write') as write_mock:
+            cmd.cancel()
+        write_mock.assert_not_called()
+        # Cancel doesn't block when wakeup pipe is full.
+        with patch.object(cmd, 'working_handler', lambda proc: [cmd.cancel() for _ in range(70000)]):
+            with self.assertRaises(utils.StreamingExecutor.CalledProcessError):
+                cmd.execute([sys.executable, '-c', 'import time; time.sleep(10)'], dir_name)
+
+        self.assertEqual('yes', async_to_sync(utils.StreamingExecutor().aexecute)(['echo', 'yes'], dir_name))
+
+        marker = Path(self.project_place) / 'marker'
+        running = {'now': 0, 'max': 0}
+
+        class AsyncExecutor(utils.AsyncExecutor):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.lines = []
+                self.checks = 0
+
+            async def aline_handler(self, line):
+                await super().aline_handler(line)
+                self.lines.append(line)
+                if line == 'line1':
+                    running['now'] += 1
+                    running['max'] = max(running['max'], running['now'])
+                    if running['now'] == 2:
+                        marker.parent.mkdir(parents=True, exist_ok=True)
+                        marker.touch()
+                elif line == 'line2':
+                    running['now'] -= 1
+
+            async def aworking_handler(self, proc):
+                self.checks += 1
+
+        # Process waits until two processes are running at the same time.
+        wait_cmd = [
+            sys.executable, '-c',
+            'import os, sys, time\n'
+            'print("line1", flush=True)\n'
+            'deadline = time.monotonic() + 10\n'
+            'while not os.path.exists(sys.argv[1]) and time.monotonic() < deadline:\n'
+            '    time.sleep(0.01)\n'
+            'print("line2")',
+            str(marker),
+        ]
+        self.assertEqual('yes', AsyncExecutor().execute(['echo', 'yes'], dir_name))
+
+        async def run_async_executors():
+            executors = [AsyncExecutor() for _ in range(4)]
+            results = await utils.AsyncExecutor.execute_many(
+                [(executor, wait_cmd, dir_name) for executor in executors] +
+                [(AsyncExecutor(), [sys.executable, '-c', 'exit(3)'], dir_name)],
+                concurrency=2,
+            )
+            self.assertEqual(results[:4], ['line1line2'] * 4)
+            self.assertIsInstance(results[4], utils.AsyncExecutor.CalledProcessError)
+            self.assertEqual(running['max'], 2)
+            self.assertEqual(executors[0].lines, ['line1', 'line2'])
+
+            executor = AsyncExecutor(semaphore=asyncio.Semaphore(1))
+            task = asyncio.ensure_future(executor.aexecute(
+                [sys.executable, '-c', 'import time; print("started", flush=True); time.sleep(10)'], dir_name
+            ))
+            while not executor.lines or not executor.checks:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertEqual(executor.output, 'started')
+
+            executor = utils.AsyncExecutor()
+            asyncio.get_event_loop().call_later(0.2, executor.cancel)
+            with self.assertRaises(utils.AsyncExecutor.CalledProcessError):
+                await executor.aexecute([sys.executable, '-c', 'import time; time.sleep(10)'], dir_name)
+
+            # Synchronous working_handler gets Popen compatible process and doesn't block event loop.
+            class SyncHandlerExecutor(utils.AsyncExecutor):
+                def working_handler(self, proc):
+                    handler_calls.append((threading.current_thread(), proc.pid, proc.poll()))
+                    try:
+                        proc.wait(0.01)
+                    except subprocess.TimeoutExpired as err:
+                        handler_calls.append(err)
+                    proc.terminate()
+
+            handler_calls = []
+            executor = SyncHandlerExecutor()
+            with self.assertRaises(utils.AsyncExecutor.CalledProcessError):
+                await executor.aexecute([sys.executable, '-c', 'import time; time.sleep(10)'], dir_name)
+            self.assertEqual(len(handler_calls), 2)
+            self.assertIsInstance(handler_calls[1], subprocess.TimeoutExpired)
+            self.assertIsNot(handler_calls[0][0], threading.current_thread())
+            self.assertIsInstance(handler_calls[0][1], int)
+            self.assertIsNone(handler_calls[0][2])
+
+            # Python < 3.8 supervises process in thread, but hooks are still called in event loop.
+            executor = AsyncExecutor()
+            with patch.object(utils.AsyncExecutor, '_supervise_in_thread', return_value=True):
+                task = asyncio.ensure_future(executor.aexecute(
+                    [sys.executable, '-c', 'import time; print("started", flush=True); time.sleep(10)'], dir_name
+                ))
+                while not executor.lines or not executor.checks:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            self.assertEqual(executor.lines, ['started'])
+
+        async_to_sync(run_async_executors)()
+
     def test_startproject(self):
         # Easy create
         out = io.StringIO()
@@ -274,6 +592,50 @@ class VSTUtilsTestCase(BaseTestCase):
             tree["dc=test,dc=lan"]
         )
 
+    @patch('ldap.initialize')
+    def test_ldap_pool_and_cache(self, ldap_obj):
+        self.addCleanup(cache.clear)
+        self.addCleanup(LDAPConnectionPool.clear_all)
+        LDAPConnectionPool.clear_all()
+        cache.clear()
+        admin = "cn=admin,dc=test,dc=lan"
+        admin_password = "ldaptest"
+        admin_dict = {"objectCategory": ['top', 'user'], "userPassword": [admin_password], 'cn': ['admin']}
+        LDAP_obj = MockLDAP({admin: admin_dict, "dc=test,dc=lan": {admin: admin_dict}})
+        ldap_obj.return_value = LDAP_obj
+
+        # Connection is reused and auth result is cached.
+        for _ in range(3):
+            ldap_backend = LDAP('ldap://10.10.10.23', 'admin', admin_password, 'test.lan')
+            self.assertTrue(ldap_backend.isAuth())
+            ldap_backend.close()
+        self.assertEqual(ldap_obj.call_count, 1)
+        self.assertEqual(LDAP_obj.ldap_methods_called().count('simple_bind_s'), 1)
+
+        # Negative results are cached too.
+        for _ in range(2):
+            self.assertFalse(LDAP('ldap://10.10.10.23', 'admin', 'invalid', 'test.lan').isAuth())
+        self.assertEqual(LDAP_obj.ldap_methods_called().count('simple_bind_s'), 2)
+
+        # Connection binds lazily for cached auth and group search is cached per user.
+        ldap_backend = LDAP('ldap://10.10.10.23', 'admin', admin_password, 'test.lan')
+        groups = json.loads(ldap_backend.group_list())
+        self.assertEqual(groups["dc=test,dc=lan"], {admin: admin_dict})
+        self.assertEqual(LDAP_obj.ldap_methods_called().count('simple_bind_s'), 3)
+        self.assertEqual(json.loads(ldap_backend.group_list()), groups)
+        self.assertEqual(LDAP_obj.ldap_methods_called().count('search_s'), 1)
+        ldap_backend.close()
+
+        # Pool is bounded.
+        pool = LDAPConnectionPool('ldap://10.10.10.23', size=1, timeout=0.01)
+        conn = pool.acquire()
+        with self.assertRaises(LDAP.PoolExhausted):
+            pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        pool.discard(conn)
+        self.assertIsNot(pool.acquire(), None)
+
     def test_model_handler(self):
         test_handler_structure["User"]['OPTIONS'] = dict(username='test')
         with override_settings(TEST_HANDLERS=test_handler_structure):
@@ -341,7 +703,122 @@ class VSTUtilsTestCase(BaseTestCase):
         for _ in Host.objects.paged(chunk_size=1):
             pass
 
-        Host.objects.filter(name__startswith="paged_test_host_").delete()
+        hosts = Host.objects.filter(name__startswith="paged_test_host_")
+        expected = list(hosts.order_by('pk').values_list('pk', flat=True))
+        with self.assertNumQueries(4):
+            result = [obj.pk for obj in hosts.paged(chunk_size=3, strategy='keyset')]
+        self.assertEqual(result, expected)
+        paginator = hosts.get_paginator(chunk_size=5, strategy='keyset')
+        self.assertEqual([len(chunk) for chunk in paginator], [5, 5])
+        # Objects changed during iteration are neither skipped nor repeated.
+        result = []
+        for obj in hosts.paged(chunk_size=2, strategy='keyset'):
+            if not result:
+                Host.objects.filter(pk=expected[0]).delete()
+            result.append(obj.pk)
+        self.assertEqual(result, expected)
+        self.assertEqual(
+            [obj['id'] for obj in hosts.values('id', 'name').paged(chunk_size=4, strategy='keyset', prefetch=True)],
+            expected[1:]
+        )
+        # Rows of values_list() and descending order are supported.
+        self.assertEqual(
+            [row[1] for row in hosts.values_list('name', 'id').paged(chunk_size=4, strategy='keyset')],
+            expected[1:]
+        )
+        self.assertEqual(list(hosts.values_list('pk', flat=True).paged(chunk_size=4, strategy='keyset')), expected[1:])
+        self.assertEqual(
+            [row.id for row in utils.KeysetPaginator(hosts.values_list(named=True), 4, key='-pk').items()],
+            expected[:0:-1]
+        )
+        self.assertEqual([row['id'] for row in utils.KeysetPaginator(hosts.values(), 4).items()], expected[1:])
+        with self.assertRaisesMessage(ValueError, 'Key "pk" must be selected in values() or values_list()'):
+            utils.KeysetPaginator(hosts.values('name'), 4)
+        # Next chunk is fetched in background thread outside of transactions.
+        content_types = self.get_model_filter('django.contrib.contenttypes.models.ContentType').order_by('pk')
+        with patch('vstutils.utils.KeysetPaginator._can_prefetch', return_value=True):
+            paginator = utils.KeysetPaginator(content_types, chunk_size=2, prefetch=True)
+            self.assertEqual([obj.pk for obj in paginator.items()], [obj.pk for obj in content_types])
+
+        hosts.delete()
+
+    def test_session_serializer(self):
+        import datetime
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.utils import timezone
+        from vstutils.session import JsonSessionSerializer, YamlSessionSerializer
+
+        serializer = JsonSessionSerializer()
+        data = {
+            '_auth_user_id': '1',
+            'date': datetime.date(2021, 1, 2),
+            'time': timezone.now(),
+            'nested': [{'tags': {1, 2}}, frozenset(['a'])],
+            1: 'int key',
+            'keys': {datetime.date(2021, 1, 2): [{None: 1.5, 'str': True}], 2: ('a',)},
+        }
+        dumped = serializer.dumps(data)
+        self.assertTrue(dumped.startswith(b'{'))
+        # Non-string keys keep their types.
+        data['keys'][2] = ['a']
+        self.assertEqual(serializer.loads(dumped), data)
+        self.assertEqual(serializer.loads(serializer.dumps({'key': 'value'})), {'key': 'value'})
+        with self.assertRaises(TypeError):
+            serializer.dumps({'obj': object()})
+
+        # Sessions stored by yaml serializer are still readable.
+        yaml_data = {'_auth_user_id': '1', 'date': datetime.date(2021, 1, 2), 'tags': {'a'}}
+        self.assertEqual(serializer.loads(YamlSessionSerializer().dumps(yaml_data)), yaml_data)
+        self.assertEqual(serializer.loads(b'{a: 1}'), {'a': 1})
+        self.assertEqual(serializer.loads(YamlSessionSerializer().dumps({})), {})
+        with override_settings(SESSION_SERIALIZER='vstutils.session.YamlSessionSerializer'):
+            encoded = SessionStore().encode(yaml_data)
+        self.assertEqual(settings.SESSION_SERIALIZER, 'vstutils.session.JsonSessionSerializer')
+        self.assertEqual(SessionStore().decode(encoded), yaml_data)
+
+    def test_parallel_map(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db.transaction import TransactionManagementError
+
+        Host.objects.bulk_create([Host(name=f'parallel_{i}') for i in range(9)] + [Host(name='parallel_error')])
+        hosts = Host.objects.filter(name__startswith='parallel_')
+        error_pk = hosts.get(name='parallel_error').pk
+        expected = [name.upper() for name in hosts.order_by('pk').values_list('name', flat=True) if name != 'parallel_error']
+
+        self.assertEqual([count for _, _, count in hosts.get_pk_ranges(4)], [4, 4, 2])
+        # Inside transaction chunks are processed in current thread.
+        result = hosts.parallel_map(host_name_upper, chunk_size=4, workers=2, progress_key='parallel_test')
+        self.assertEqual(result.results, expected)
+        self.assertEqual(result.errors, {error_pk: 'ValueError: parallel_error'})
+        progress = utils.ProgressExchanger('parallel_test')
+        self.assertEqual(progress.get(), {'total': 10, 'done': 9, 'failed': 1})
+
+        result = hosts.parallel_map(host_name_upper, chunk_size=3, backend='celery', progress_key='parallel_test')
+        self.assertEqual(len(result.tasks), 4)
+        self.assertEqual(progress.get(), {'total': 10, 'done': 9, 'failed': 1})
+        progress.delete()
+        self.assertEqual(progress.get(), {'total': 0, 'done': 0, 'failed': 0})
+
+        # Threads use own connections, so only committed data is visible for them.
+        content_types = models.BQuerySet(model=self.get_model_class('django.contrib.contenttypes.models.ContentType'))
+        with patch('vstutils.models.queryset.BQuerySet._in_transaction', return_value=False):
+            result = content_types.parallel_map(str, chunk_size=5, workers=3)
+        self.assertEqual(result.results, [str(obj) for obj in content_types.order_by('pk')])
+        self.assertEqual(result.errors, {})
+
+        # Processes close connections of parent, so they are not allowed inside transaction.
+        with self.assertRaises(TransactionManagementError):
+            hosts.parallel_map(host_name_upper, chunk_size=4, workers=2, backend='process')
+        # Processes get pickled query instead of queryset with all rows.
+        with patch('vstutils.models.queryset.BQuerySet._in_any_transaction', return_value=False), \
+                patch('vstutils.models.queryset.BQuerySet._in_transaction', return_value=False), \
+                patch('vstutils.models.queryset.connections.close_all') as close_all, \
+                patch('vstutils.models.queryset.ProcessPoolExecutor', ThreadPoolExecutor), \
+                patch('vstutils.models.queryset.process_chunk', wraps=models.queryset.process_chunk) as chunk_mock:
+            result = content_types.parallel_map(str, chunk_size=5, workers=3, backend='process')
+        close_all.assert_called()
+        self.assertEqual(result.results, [str(obj) for obj in content_types.order_by('pk')])
+        self.assertIsNone(chunk_mock.call_args[0][0]._result_cache)
 
     def test_render_and_file(self):
         err_ini = utils.get_render('configs/config.ini', dict(config=dict(test=[])))
@@ -401,6 +878,95 @@ class VSTUtilsTestCase(BaseTestCase):
         with self.assertRaises(utils.Lock.AcquireLockException):
             method2(pk=123)
 
+        # Expired lock never releases lock of another owner.
+        first_lock = utils.Lock('owned', repeat=0.01, payload='first')
+        first_token = first_lock.fencing_token
+        first_lock.cache.delete(first_lock.key)
+        with patch.object(utils.Lock.cache, 'touch', wraps=utils.Lock.cache.touch) as touch:
+            second_lock = utils.Lock('owned', repeat=0.01, payload='second')
+            # Fencing token is requested only when it is used.
+            touch.assert_not_called()
+            self.assertGreater(second_lock.fencing_token, first_token)
+            self.assertEqual(second_lock.fencing_token, first_token + 1)
+        touch.assert_called_once_with(f'{second_lock.key}_fence', utils.Lock.FENCE_TIMEOUT)
+        self.assertEqual(second_lock.get(), 'second')
+        # Token isn't given to lost lock.
+        lost_lock = utils.Lock('lost', repeat=0.01)
+        lost_lock.cache.delete(lost_lock.key)
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            lost_lock.fencing_token
+        # Value stored as payload only is read too.
+        lost_lock.cache.set(lost_lock.key, 'legacy', 10)
+        self.assertEqual(lost_lock.get(), 'legacy')
+        lost_lock.cache.delete(lost_lock.key)
+        self.assertNotEqual(second_lock.token, first_lock.token)
+        self.assertFalse(first_lock.extend())
+        self.assertFalse(first_lock.release())
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            utils.Lock('owned', repeat=0.01)
+        self.assertTrue(second_lock.extend(10))
+        self.assertTrue(second_lock.release())
+        self.assertFalse(second_lock.release())
+
+        # Lock is prolonged in background while it is held.
+        with utils.Lock('renewed', timeout=0.3, auto_renew=True) as lock:
+            time.sleep(0.6)
+            self.assertTrue(lock.extend())
+        utils.Lock('renewed', repeat=0.01).release()
+
+    def test_semaphore_and_rwlock(self):
+        # Semaphore allows only limited count of holders.
+        first, second = utils.Semaphore('sem', 2, repeat=0.01), utils.Semaphore('sem', 2, repeat=0.01)
+        self.assertNotEqual(first.slot, second.slot)
+        self.assertEqual(first.holders, 2)
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            utils.Semaphore('sem', 2, repeat=0.01)
+        # Slot of crashed holder is freed by timeout.
+        first.cache.delete(first.key)
+        with utils.Semaphore('sem', 2, repeat=0.01) as third:
+            self.assertEqual(third.slot, first.slot)
+            self.assertFalse(first.release())
+        second.release()
+        self.assertEqual(second.holders, 0)
+
+        @utils.semaphore_decorator(lambda pk: f'sem_{pk}', limit=1, repeat=0.01)
+        def method(pk):
+            return pk
+
+        @utils.semaphore_decorator(lambda pk: f'sem_{pk}', limit=1, repeat=0.01)
+        def method2(pk):
+            return method(pk)
+
+        self.assertEqual(method(1), 1)
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            method2(1)
+
+        # Readers share lock, but writer is exclusive.
+        rwlock = utils.RWLock('rw', max_readers=3, repeat=0.01)
+        reader1, reader2 = rwlock.read(), rwlock.read()
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            rwlock.write()
+        reader1.release()
+        reader2.release()
+        with rwlock.write():
+            with self.assertRaises(utils.Lock.AcquireLockException):
+                rwlock.read()
+            with self.assertRaises(utils.Lock.AcquireLockException):
+                rwlock.write()
+        rwlock.read().release()
+
+        @utils.rwlock_decorator('rw_dec', write=True, repeat=0.01)
+        def writer():
+            return reader()
+
+        @utils.rwlock_decorator('rw_dec', repeat=0.01)
+        def reader():
+            return True
+
+        self.assertTrue(reader())
+        with self.assertRaises(utils.Lock.AcquireLockException):
+            writer()
+
     def test_raise_context(self):
         class SomeEx(KeyError):
             pass
@@ -1137,6 +1703,76 @@ class OpenapiEndpointTestCase(BaseTestCase):
         self.assertEqual(mail.outbox[-1].alternatives[0][0], ' ')
         self.assertEqual(mail.outbox[-1].alternatives[0][1], 'text/html')
 
+    def test_bulk_email_sending(self):
+        import smtplib
+        from django.core.mail import get_connection
+        from vstutils.utils import send_template_emails
+
+        recipients = [f'user{i}@fhtagn.deep' for i in range(4)]
+        recipients.append({'email': 'personal@fhtagn.deep', 'context': {'second': 'personal'}})
+        with patch('vstutils.utils.get_connection', wraps=get_connection) as connection_mock, \
+                patch('vstutils.utils.loader.get_template', wraps=utils.loader.get_template) as template_mock:
+            sent = send_template_emails(
+                sync=True,
+                template_name='test_tmplt.html',
+                subject='Test',
+                recipients=recipients,
+                context_data={'first': 1, 'second': 2},
+            )
+        self.assertEqual(sent, 5)
+        self.assertEqual(connection_mock.call_count, 1)
+        self.assertEqual(template_mock.call_count, 1)
+        self.assertCount(mail.outbox, 5)
+        self.assertEqual([m.to for m in mail.outbox], [[r] for r in recipients[:4]] + [['personal@fhtagn.deep']])
+        self.assertEqual(mail.outbox[0].subject, 'Test')
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '1 2')
+        self.assertEqual(mail.outbox[-1].alternatives[0][0], '1 personal')
+
+        # Temporary errors are retried, permanent errors are raised.
+        mail.outbox = []
+        connection = get_connection()
+        with patch.object(connection, 'send_messages', side_effect=[
+                    1,
+                    smtplib.SMTPServerDisconnected(),
+                    smtplib.SMTPResponseException(421, 'Try again later'),
+                    1,
+                    1,
+                ]) as send_mock, \
+                patch('vstutils.utils.get_connection', return_value=connection), \
+                patch('vstutils.utils.time.sleep') as sleep_mock:
+            sent = send_template_emails(
+                sync=True, template_name='test_tmplt.html', subject='Test', recipients=recipients[:3], batch_size=2,
+            )
+        self.assertEqual(sent, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+        # Only undelivered messages are sent again.
+        self.assertEqual(
+            [call[0][0][0].to for call in send_mock.call_args_list],
+            [[recipients[0]], [recipients[1]], [recipients[1]], [recipients[1]], [recipients[2]]]
+        )
+
+        with patch.object(connection, 'send_messages', side_effect=smtplib.SMTPRecipientsRefused({})) as send_mock, \
+                patch('vstutils.utils.get_connection', return_value=connection), \
+                self.assertRaises(smtplib.SMTPRecipientsRefused):
+            send_template_emails(sync=True, template_name='test_tmplt.html', subject='Test', recipients=recipients)
+        self.assertEqual(send_mock.call_count, 1)
+
+        with patch.object(connection, 'send_messages', side_effect=OSError('Connection reset')) as send_mock, \
+                patch('vstutils.utils.get_connection', return_value=connection), \
+                patch('vstutils.utils.time.sleep'), \
+                self.assertRaises(OSError):
+            send_template_emails(
+                sync=True, template_name='test_tmplt.html', subject='Test', recipients=recipients, max_retries=1,
+            )
+        self.assertEqual(send_mock.call_count, 2)
+
+        # Async sending splits recipients to tasks.
+        mail.outbox = []
+        with override_settings(RPC_ENABLED=True, EMAIL_TASK_CHUNK_SIZE=2):
+            results = send_template_emails(template_name='test_tmplt.html', subject='Test', recipients=recipients)
+        self.assertCount(results, 3)
+        self.assertCount(mail.outbox, 5)
+
 
 class EndpointTestCase(BaseTestCase):
 
@@ -1384,9 +2020,9 @@ class EndpointTestCase(BaseTestCase):
         self.assertEqual(response[3]['status'], 200)
         self.assertEqual(response[3]['status'], 200)
         self.assertEqual(response[4]['status'], 200)
-        self.assertEqual(response[4]['data'], {'filter_applied': 1, 'id': 2, 'local_filter_applied': 1, 'name': 5})
+        self.assertEqual(response[4]['data'], {'filter_applied': 1, 'id': 2, 'local_filter_applied': 1, 'name': '5'})
         self.assertEqual(len(response[5]['data']['results']), 5)
-        self.assertEqual(response[6]['data']['headers']['TEST_HEADER'], 5)
+        self.assertEqual(response[6]['data']['headers']['TEST_HEADER'], '5')
         self.assertEqual(response[7]['data'], {
             'integer': 1,
             'float': 1.0,
@@ -1395,6 +2031,51 @@ class EndpointTestCase(BaseTestCase):
             'list': [1, 2.0, '3']
         })
 
+    def test_compiled_templates(self):
+        from vstutils.api.endpoint import _compile_template
+
+        results = self.bulk([
+            {'method': 'post', 'path': 'subhosts', 'data': {'name': '10'}},
+            {'method': 'patch', 'path': ['subhosts', '<<0[data][id]>>'], 'data': {'name': 'x{<<0[data][name]>>}'}},
+            {
+                'method': 'put',
+                'path': 'request_info',
+                'data': {
+                    'name': '<<0[data][name]>>',
+                    'status': '<<1[status]>>',
+                    'host': '<<0[data]>>',
+                    'nested': [{'<<0[data][name]>>': '<<1[data][name]>>'}],
+                    'composite': '[<<0[data][id]>>]',
+                },
+                'version': 'v2',
+            },
+            {'method': 'get', 'path': ['subhosts', '<<0[data][unknown]>>']},
+            {'method': 'get', 'path': ['subhosts', '<<0[data>>']},
+        ])
+        host = results[0]['data']
+        self.assertEqual(results[1]['data']['name'], 'x{10}')
+        self.assertEqual(results[2]['data'], {
+            'name': '10',
+            'status': 200,
+            'host': host,
+            'nested': [{'10': 'x{10}'}],
+            # Strings with other text are not decoded as JSON.
+            'composite': f'[{host["id"]}]',
+        })
+        self.assertEqual(results[3]['status'], 500)
+        self.assertEqual(
+            results[3]['info']['errors']['path'],
+            ['Cannot resolve template reference "<<0[data][unknown]>>": KeyError(\'unknown\').']
+        )
+        self.assertEqual(results[4]['status'], 500)
+        self.assertEqual(results[4]['info']['errors']['path'], ['Invalid template reference "<<0[data>>".'])
+        self.assertIsNone(_compile_template('no templates << here >>'))
+        self.assertIs(_compile_template('<<0[data][id]>>'), _compile_template('<<0[data][id]>>'))
+        # Big strings aren't kept in cache.
+        long_value = 'x' * 2048 + '<<0[data][id]>>'
+        self.assertIsNot(_compile_template(long_value), _compile_template(long_value))
+        self.assertEqual(_compile_template(long_value).render([{'data': {'id': 1}}]), 'x' * 2048 + '1')
+
     def test_threaded_bulk(self):
         request_data = [
             {"method": "get", "path": ['user', self.user.id, 'test_bulk_perf'], 'version': 'v4'}
@@ -1410,6 +2091,64 @@ class EndpointTestCase(BaseTestCase):
         perf_results = '\n'.join(f'{k.upper()}: {v}ms' for k, v in map(iteration, ('post', 'put', 'patch')))
         print(f"\nTimings for different methods:\n{perf_results}\n")
 
+    def test_request_profiling(self):
+        for i in range(3):
+            HostGroup.objects.create(name=f'profiled_{i}')
+
+        def get_timings(response):
+            return dict(
+                (item.split(';', 1) + [''])[:2]
+                for item in response['Server-Timing'].split(', ')
+            )
+
+        self._login()
+        response = self.client.get(self.get_url('hosts'))
+        self.assertRCode(response, 200)
+        self.assertNotIn('db_queries', get_timings(response))
+
+        with override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_LOG=True, REQUEST_PROFILING_SLOW_QUERIES=2):
+            with self.assertLogs(settings.VST_PROJECT, level='INFO') as logs:
+                response = self.client.get(self.get_url('hosts'))
+            self.assertRCode(response, 200)
+            timings = get_timings(response)
+            self.assertIn('total', timings)
+            self.assertIn('db_execution_time', timings)
+            self.assertIn('serializer', timings)
+            self.assertIn('render', timings)
+            self.assertIn('db_slow_0', timings)
+            self.assertIn('db_slow_1', timings)
+            self.assertNotIn('db_slow_2', timings)
+            self.assertGreater(int(timings['db_queries'].split('=')[-1]), 0)
+            self.assertEqual(timings['db_duplicates'], 'desc=0')
+            self.assertIn('Request profile:', logs.output[0])
+            self.assertIn('"db_queries"', logs.output[0])
+
+            # N+1 queries are detected by fingerprint
+            from vstutils.profiling import RequestProfiler
+            profiler = RequestProfiler()
+            for pk in range(3):
+                profiler.handle_query('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s)', 0.001 * pk)
+            timings = profiler.get_timings(lambda x: x)
+            self.assertEqual(timings['db_duplicates'], '2')
+            self.assertEqual(timings['db_top_duplicate'], "3x SELECT * FROM 't' WHERE 't'.'id' IN (...)")
+            self.assertEqual(timings['db_slow_0'][0], 0.002)
+            # SQL is not shown to non-staff clients
+            timings = profiler.get_timings(lambda x: x, with_sql=False)
+            self.assertNotIn('db_top_duplicate', timings)
+            self.assertEqual(timings['db_slow_0'], 0.002)
+
+            # Sub-requests of bulk are profiled too
+            results = self.endpoint_call([{"method": "get", "path": ['hosts']}], method='put')
+            self.assertEqual(results[0]['status'], 200)
+            self.assertIn('db_queries', get_timings(self.last_response))
+
+        with override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=0.0):
+            response = self.client.get(self.get_url('hosts'))
+            self.assertNotIn('db_queries', get_timings(response))
+        from vstutils.settings import ConfigFloatType
+        self.assertEqual(ConfigFloatType('0.25'), 0.25)
+        self.assertIsInstance(settings.REQUEST_PROFILING_SAMPLE_RATE, float)
+
     def test_transactional_bulk(self):
         request = [
             dict(
@@ -1541,6 +2280,55 @@ class ValidatorsTestCase(BaseTestCase):
 
         img_resolution_validator(self.valid_image_content_dict)
 
+    def test_image_validators_chain_decoding(self):
+        import base64
+        from vstutils.api.validators import ImageContext
+
+        content = self.valid_image_content_dict['content']
+        value = dict(self.valid_image_content_dict, content=content[:40] + content[40:])
+        validators = [
+            ImageOpenValidator(extensions=['jpg']),
+            ImageWidthValidator(min_width=1280),
+            ImageResolutionValidator(max_width=1280, max_height=720),
+        ]
+        with patch('vstutils.api.validators.base64.b64decode', wraps=base64.b64decode) as decode_mock:
+            for validator in validators:
+                validator(value)
+            context = ImageContext.get(value)
+            self.assertEqual((context.image.format, context.image.size), ('JPEG', (1280, 720)))
+        # Only header is decoded, once for all validators.
+        self.assertEqual(decode_mock.call_count, 1)
+        self.assertLess(len(decode_mock.call_args[0][0]), len(value['content']))
+
+        self.assertNotIn('image_context', vars(validators[0]))
+        self.assertEqual(validators[0].header_img.size, (1280, 720))
+
+        # Full content is decoded once for pixels access.
+        self.assertIs(validators[0].img, context.full_image)
+        # Subclasses may set image.
+        validators[1].img = context.image
+        self.assertIs(validators[1].img, context.image)
+        thread = threading.Thread(target=lambda: self.assertIsNone(validators[1].img))
+        thread.start()
+        thread.join()
+        validators[1](value)
+        self.assertIs(validators[1].img, context.full_image)
+        context.full_image.load()
+        self.assertEqual(context.full_image.size, (1280, 720))
+        self.assertEqual(context.content, base64.b64decode(value['content']))
+        self.assertEqual(context.get_header(10), context.content[:10])
+
+        # New value gets new context.
+        other_value = dict(self.valid_image_content_dict, content=content[:80] + content[80:])
+        self.assertIsNot(ImageContext.get(other_value), context)
+        # Context isn't kept by validators and is released by thread at the end of request.
+        self.assertIsNotNone(ImageContext.current())
+        request_finished.send(sender=self.__class__)
+        self.assertIsNone(ImageContext.current())
+        self.assertIsNone(validators[0].img)
+        with self.assertRaises(ValidationError):
+            ImageOpenValidator(extensions=['jpg'])(self.invalid_image_content_dict)
+
 
 class LangTestCase(BaseTestCase):
 
@@ -1570,6 +2358,47 @@ class LangTestCase(BaseTestCase):
         self.assertEqual(results[4]['data']['name'], 'Empty list')
         self.assertEqual(results[4]['data']['translations'], {})
 
+    def test_lang_bundle_cache(self):
+        from vstutils.api.models import Language, TranslationBundle
+        from test_proj.translations import ru
+
+        client = self._login()
+        url = '/api/v1/_lang/ru/'
+        languages = client.get('/api/v1/_lang/').json()['results']
+        bundle_hash = {lang['code']: lang['translations_hash'] for lang in languages}['ru']
+        self.assertIs(TranslationBundle.get('ru'), TranslationBundle.get('ru'))
+        self.assertIsNot(TranslationBundle.get('unkn'), TranslationBundle.get('unkn'))
+        self.assertEqual(TranslationBundle.get('../ru').data, {})
+        # Shared bundle is not changed through language.
+        language = Language(code='ru', name='Russian')
+        language.translations['Hello world!'] = 'Changed'
+        self.assertEqual(language.translations['Hello world!'], 'Привет мир!')
+
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['translations']['Hello world!'], 'Привет мир!')
+        self.assertEqual(
+            self.bulk([dict(method='get', path=['_lang', 'ru'])])[0]['data'],
+            response.json()
+        )
+        self.assertEqual(response['ETag'], f'"{bundle_hash}"')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        response = client.get(f'{url}?v={bundle_hash}')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        # Changed modules are reloaded only in debug mode.
+        bundle = TranslationBundle.get('ru')
+        bundle.mtimes = (0,) * len(bundle.mtimes)
+        ru.TRANSLATION['Changed'] = 'Changed'
+        self.assertIs(TranslationBundle.get('ru'), bundle)
+        with override_settings(DEBUG=True):
+            new_bundle = TranslationBundle.get('ru')
+        self.assertIsNot(new_bundle, bundle)
+        self.assertNotIn('Changed', new_bundle.data)
+        self.assertEqual(new_bundle.hash, bundle_hash)
+
 
 class CoreApiTestCase(BaseTestCase):
 
@@ -1681,6 +2510,51 @@ class ProjectTestCase(BaseTestCase):
             name='ba'
         )
 
+    def test_objects_subtree_copy(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from vstutils.api.base import CopyMixin
+
+        class GroupCopyView(CopyMixin):
+            copy_related = ('hosts',)
+            copy_children = {'subgroups': {'related': ['hosts'], 'children': {'subgroups': {}}}}
+
+        hosts = list(Host.objects.all())
+
+        def create_tree(size):
+            root = HostGroup.objects.create(name=f'root{size}')
+            root.hosts.set(hosts[:2])
+            for i in range(size):
+                group = HostGroup.objects.create(name=f'group{i}', parent=root)
+                group.hosts.set(hosts[i:i + 3])
+                for j in range(size):
+                    HostGroup.objects.create(name=f'subgroup{i}-{j}', parent=group)
+            return root
+
+        def get_tree(root):
+            return [
+                (group.name, sorted(group.hosts.values_list('id', flat=True)), sorted(
+                    group.subgroups.values_list('name', flat=True)
+                ))
+                for group in root.subgroups.order_by('name')
+            ]
+
+        queries_count = []
+        for size in (2, 5):
+            root = create_tree(size)
+            with CaptureQueriesContext(connection) as queries:
+                copied = GroupCopyView().copy_instance(root)
+            queries_count.append(len(queries))
+            self.assertEqual(copied.name, f'copy-root{size}')
+            self.assertEqual(list(copied.hosts.all()), list(root.hosts.all()))
+            self.assertEqual(get_tree(copied), get_tree(root))
+            self.assertEqual(len(get_tree(copied)), size)
+            self.assertFalse(set(copied.subgroups.values_list('id', flat=True)) & set(
+                root.subgroups.values_list('id', flat=True)
+            ))
+        # Queries count depends only on depth of subtree.
+        self.assertEqual(queries_count[0], queries_count[1])
+
     def test_insert_into(self):
         size = 10
         bulk_data = [
@@ -1792,7 +2666,10 @@ class ProjectTestCase(BaseTestCase):
         self.assertTrue(Host.objects.filter(pk=results[10]['data']['id']).exists())
         self.assertEqual(results[12]['data']['results'], [])
         self.assertEqual(results[13]['status'], 500)
-        self.assertTrue('IndexError' in results[13]['info']['errors'])
+        self.assertEqual(
+            results[13]['info']['errors']['path'],
+            ['Cannot resolve template reference "<<24[data][id]>>": IndexError(\'list index out of range\').']
+        )
         self.assertEqual(results[15]['status'], 200)
         self.assertEqual(results[15]['data']['detail'], "OK")
         self.assertEqual(results[16]['status'], 201)
@@ -1965,6 +2842,58 @@ class ProjectTestCase(BaseTestCase):
         self.assertEqual(result['short_name'], 'Test_proj')
         self.assertEqual(result['display'], 'fullscreen')
 
+    def test_gui_views_cache(self):
+        from vstutils.gui import views
+
+        cache.clear()
+        client = self._login()
+        with patch('vstutils.gui.views.jsmin', wraps=views.jsmin) as jsmin_mock:
+            response = client.get('/service-worker.js')
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            self.assertEqual(client.get('/service-worker.js').content, response.content)
+            self.assertEqual(client.get('/service-worker.js', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(jsmin_mock.call_count, 1)
+        self.assertCount(response.content.decode('utf-8').split('\n'), 1)
+
+        response = client.get('/manifest.json')
+        self.assertEqual(json.loads(response.content)['name'], 'Example project')
+        self.assertEqual(client.get('/manifest.json', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        from htmlmin import middleware as htmlmin_middleware
+        with patch('htmlmin.middleware.html_minify', wraps=htmlmin_middleware.html_minify) as minify_mock:
+            response = client.get('/')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'window.is_superuser = true', response.content)
+            self.assertEqual(client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(minify_mock.call_count, 1)
+
+            # Page is cached per user.
+            user = self._create_user(is_super_user=False)
+            client.force_login(user)
+            other_response = client.get('/')
+            self.assertIn(b'window.is_superuser = false', other_response.content)
+            self.assertNotEqual(other_response['ETag'], response['ETag'])
+            self.assertEqual(minify_mock.call_count, 2)
+
+            # CSRF cookie is set for page taken from cache.
+            client.cookies.pop(settings.CSRF_COOKIE_NAME, None)
+            cached_response = client.get('/')
+            self.assertEqual(cached_response.content, other_response.content)
+            self.assertIn(settings.CSRF_COOKIE_NAME, cached_response.cookies)
+            self.assertEqual(minify_mock.call_count, 2)
+
+            # Page which uses CSRF token or request headers isn't cached.
+            cache.clear()
+            client.force_login(user)
+            with patch.object(views.GUIView, 'template_name', 'test_gui_request.html'):
+                first = client.get('/', HTTP_X_APP='mobile')
+                second = client.get('/', HTTP_X_APP='desktop')
+            self.assertIn(b'<p>mobile</p>', first.content)
+            self.assertIn(b'<p>desktop</p>', second.content)
+            self.assertNotIn('ETag', second)
+            self.assertEqual(minify_mock.call_count, 4)
+
     def test_model_fk_field(self):
         bulk_data = [
             dict(method='post', path='subhosts', data={'name': 'tt_name'}),
@@ -1974,6 +2903,304 @@ class ProjectTestCase(BaseTestCase):
         self.assertEqual(results[1]['status'], 201)
         self.assertEqual(results[1]['data']['some_fk'], results[0]['data']['id'])
 
+    def test_namedbinfile_blob_storage(self):
+        import base64
+        import tempfile
+        from types import SimpleNamespace
+        from django.core.files.storage import FileSystemStorage
+        from rest_framework import serializers as drf_serializers
+        from vstutils.api import fields
+        from vstutils.blobs import blob_storage
+
+        class BlobSerializer(drf_serializers.Serializer):
+            file = fields.NamedBinaryFileInJsonField(blob_storage=True, required=False)
+            files = fields.MultipleNamedBinaryImageInJsonField(blob_storage=True, required=False)
+
+        content = b'some binary\x00content' * 100
+        encoded = base64.b64encode(content).decode('ascii')
+        with tempfile.TemporaryDirectory() as location, \
+                patch.object(blob_storage, '_storage', FileSystemStorage(location=location, base_url='/blobs/')):
+            serializer = BlobSerializer(data={
+                'file': {'name': 'file.txt', 'content': encoded},
+                'files': [{'name': 'a.png', 'content': encoded}, {'name': 'b.jpg', 'content': encoded}],
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            stored = json.loads(serializer.validated_data['file'])
+            self.assertNotIn('content', stored)
+            blob_hash = stored['hash']
+            self.assertEqual(stored, {'name': 'file.txt', 'hash': blob_hash, 'size': len(content), 'mime': 'text/plain'})
+            stored_files = json.loads(serializer.validated_data['files'])
+            # Same content is stored once.
+            self.assertEqual({f['hash'] for f in stored_files}, {blob_hash})
+            self.assertEqual([f['mime'] for f in stored_files], ['image/png', 'image/jpeg'])
+            self.assertEqual(sum(len(files) for _, _, files in os.walk(location)), 1)
+
+            path = f'/blobs/{blob_hash[:2]}/{blob_hash[2:4]}/{blob_hash}'
+            saved = SimpleNamespace(file=serializer.validated_data['file'], files=serializer.validated_data['files'])
+            with patch('vstutils.blobs.time.time', return_value=7300):
+                representation = BlobSerializer(saved).data
+            url = representation['file']['url']
+            # Url is signed and expires in 1-2 hours.
+            self.assertTrue(url.startswith(f'{path}?expires=14400&signature='), url)
+            self.assertEqual(representation['files'][1]['url'], url)
+
+            # Legacy inline values are still readable.
+            legacy = json.dumps({'name': 'old.txt', 'content': encoded})
+            self.assertEqual(BlobSerializer({'file': legacy}).data['file'], {'name': 'old.txt', 'content': encoded})
+
+            # File of instance may be passed back by hash, but other files could not be referenced.
+            serializer = BlobSerializer(saved, data={'file': representation['file']})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertEqual(json.loads(serializer.validated_data['file']), stored)
+            serializer = BlobSerializer(data={'file': representation['file']})
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('does not exist', str(serializer.errors['file']))
+            serializer = BlobSerializer(data={'file': representation['file']}, context={'blob_hashes': [blob_hash]})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer = BlobSerializer(data={'file': {'name': 'x', 'hash': '0' * 64}})
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('does not exist', str(serializer.errors['file']))
+            serializer = BlobSerializer(data={'file': {'name': 'x', 'content': 'not base64!'}})
+            self.assertFalse(serializer.is_valid())
+
+            # Blobs are served only to authenticated users by signed urls which are not expired.
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self._login()
+            self.assertEqual(self.client.get(url).status_code, 404)
+            url = BlobSerializer(saved).data['file']['url']
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), content)
+            self.assertRegex(response['Cache-Control'], r'^private, max-age=\d+$')
+            self.assertEqual(self.client.get(url.replace(blob_hash, '1' * 64)).status_code, 404)
+            self.assertEqual(self.client.get(path).status_code, 404)
+            self.assertEqual(self.client.get(url[:-1]).status_code, 404)
+
+    def test_image_thumbnails(self):
+        import base64
+        import tempfile
+        from PIL import Image
+        from django.core.files.storage import FileSystemStorage
+        from django.template import Template, Context
+        from vstutils.api import fields, serializers
+        from vstutils.blobs import blob_storage
+
+        class ThumbnailsSerializer(serializers.BaseSerializer):
+            image = fields.NamedBinaryImageInJsonField(thumbnails=True, required=False)
+            images = fields.MultipleNamedBinaryImageInJsonField(thumbnails=True, blob_storage=True, required=False)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (512, 256), (255, 0, 0)).save(buffer, format='PNG')
+        encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+        with tempfile.TemporaryDirectory() as location, \
+                patch('vstutils.blobs.time.time', return_value=7300), \
+                patch.object(blob_storage, '_storage', FileSystemStorage(location=location, base_url='/blobs/')):
+            serializer = ThumbnailsSerializer(data={
+                'image': {'name': 'image.png', 'content': encoded},
+                'images': [{'name': 'image.png', 'content': encoded}],
+            })
+            # Thumbnails are generated on save, not on validation.
+            with patch('vstutils.thumbnails.make_thumbnail') as make_thumbnail:
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                self.assertNotIn('thumbnails', json.loads(serializer.validated_data['image']))
+                make_thumbnail.assert_not_called()
+            saved = serializer.save()
+            stored = json.loads(saved['image'])
+            self.assertEqual(stored['content'], encoded)
+            thumbnail_hash = stored['thumbnails']['128x128']
+            with Image.open(io.BytesIO(blob_storage.read(thumbnail_hash))) as thumbnail:
+                self.assertEqual(thumbnail.size, (128, 64))
+            # Thumbnail of the same image is taken from cache.
+            with patch('vstutils.thumbnails.make_thumbnail') as make_thumbnail:
+                stored_images = json.loads(saved['images'])
+                serializer = ThumbnailsSerializer(data={'images': [{'name': 'copy.png', 'content': encoded}]})
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                serializer.save()
+                make_thumbnail.assert_not_called()
+            self.assertEqual(stored_images[0]['thumbnails'], {'128x128': thumbnail_hash})
+            self.assertNotIn('content', stored_images[0])
+
+            thumbnail_url = blob_storage.url(thumbnail_hash)
+            self.assertTrue(thumbnail_url.startswith(f'/blobs/{thumbnail_hash[:2]}/{thumbnail_hash[2:4]}/{thumbnail_hash}?'))
+            value = {'image': json.dumps(stored), 'images': json.dumps(stored_images)}
+            detail = ThumbnailsSerializer(value).data
+            self.assertEqual(detail['image']['content'], encoded)
+            self.assertEqual(detail['image']['thumbnails'], {'128x128': thumbnail_url})
+            self.assertNotIn('thumbnail', detail['image'])
+            listed = ThumbnailsSerializer([value], many=True).data[0]
+            self.assertNotIn('content', listed['image'])
+            self.assertEqual(listed['image']['thumbnail'], thumbnail_url)
+            self.assertEqual(listed['images'][0]['thumbnail'], thumbnail_url)
+
+            # Representation may be sent back.
+            serializer = ThumbnailsSerializer(data={'image': detail['image']})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer = ThumbnailsSerializer(data={'image': {'name': 'a.png', 'content': 'bm90IGltYWdl'}})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertEqual(json.loads(serializer.save()['image'])['thumbnails'], {})
+            serializer = ThumbnailsSerializer(data={'image': {'name': None, 'content': None}})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertNotIn('thumbnails', json.loads(serializer.save()['image']))
+            serializer = ThumbnailsSerializer(data={'image': {'name': 'a.png', 'content': 'bm90IGltYWdl0'}})
+            self.assertFalse(serializer.is_valid())
+            self.assertEqual(serializer.errors['image'], ['content is not a valid base64 string'])
+
+            template = Template('{% load vst_html_tags %}{% img_from_json data thumbnail=True %}')
+            self.assertEqual(
+                template.render(Context({'data': json.dumps(stored)})),
+                f'<img class="" src="{thumbnail_url.replace("&", "&amp;")}">'
+            )
+
+    def test_binary_files_streaming(self):
+        import base64
+        import tempfile
+        from django.core.files.storage import FileSystemStorage
+        from vstutils.api import fields
+        from vstutils.blobs import blob_storage
+        from .models import ModelWithBinaryFiles
+        from .views import TestBinaryFilesViewSet
+
+        # Temporary files of uploads are checked in own directory.
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        upload_dir_settings = override_settings(FILE_UPLOAD_TEMP_DIR=upload_dir.name)
+        upload_dir_settings.enable()
+        self.addCleanup(upload_dir_settings.disable)
+
+        self._login()
+        instance = ModelWithBinaryFiles.objects.create()
+        url = f'/{settings.API_URL}/{settings.VST_API_VERSION}/testbinaryfiles/{instance.id}/files'
+        content = bytes(range(256)) * 10
+
+        # Whole file upload to inline field is saved by serializer.
+        with patch.object(TestBinaryFilesViewSet, 'perform_update', autospec=True,
+                          side_effect=lambda view, serializer: serializer.save()) as perform_update:
+            response = self.client.put(
+                f'{url}/some_namedbinfile/?name=data.bin', content, content_type='application/octet-stream'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(perform_update.call_count, 1)
+        self.assertEqual(response.json(), {'name': 'data.bin', 'content': base64.b64encode(content).decode('ascii')})
+        instance.refresh_from_db()
+        self.assertEqual(json.loads(instance.some_namedbinfile)['name'], 'data.bin')
+
+        response = self.client.get(f'{url}/some_namedbinfile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('data.bin', response['Content-Disposition'])
+
+        response = self.client.get(f'{url}/some_namedbinfile/', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+        response = self.client.get(f'{url}/some_namedbinfile/', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+        response = self.client.get(f'{url}/some_namedbinfile/', HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(content)}')
+
+        # Inline content is loaded to memory, so size is limited.
+        with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=len(content) - 1):
+            response = self.client.put(
+                f'{url}/some_namedbinfile/?name=big.bin', content, content_type='application/octet-stream'
+            )
+            self.assertEqual(response.status_code, 413)
+            response = self.client.put(
+                f'{url}/some_namedbinfile/?name=big.bin', content[:1000], content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 0-999/{len(content)}'
+            )
+            self.assertEqual(response.status_code, 413)
+        instance.refresh_from_db()
+        self.assertEqual(json.loads(instance.some_namedbinfile)['name'], 'data.bin')
+
+        # Unknown, multiple and empty fields.
+        self.assertEqual(self.client.get(f'{url}/unknown/').status_code, 404)
+        self.assertEqual(self.client.get(f'{url}/some_multiplenamedbinfile/').status_code, 404)
+        self.assertEqual(self.client.get(f'{url}/some_namedbinimage/').status_code, 404)
+
+        serializer_class = TestBinaryFilesViewSet.serializer_class_one
+        blob_field = fields.NamedBinaryImageInJsonField(blob_storage=True, required=False)
+        with tempfile.TemporaryDirectory() as location, \
+                patch.object(blob_storage, '_storage', FileSystemStorage(location=location, base_url='/blobs/')), \
+                patch.dict(serializer_class._declared_fields, some_namedbinimage=blob_field):
+            # Chunked upload to blob storage field.
+            image_url = f'{url}/some_namedbinimage/?name=image.png'
+            total = len(content)
+            abandoned_path = os.path.join(upload_dir.name, 'vst-upload-abandoned.part')
+            with open(abandoned_path, 'wb') as abandoned:
+                abandoned.write(content)
+            os.utime(abandoned_path, (time.time() - 60 * 60 * 25,) * 2)
+            response = self.client.put(
+                image_url, content[:1000], content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 0-999/{total}'
+            )
+            self.assertEqual(response.status_code, 202, response.content)
+            self.assertEqual(response.json(), {'received': 1000})
+            # Abandoned uploads are removed on new upload start.
+            self.assertFalse(os.path.exists(abandoned_path))
+            response = self.client.put(
+                image_url, content[2000:], content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 2000-{total - 1}/{total}'
+            )
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['received'], 1000)
+            response = self.client.put(
+                image_url, content[1000:1500], content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 1000-1999/{total}'
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.put(
+                image_url, content[1000:], content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 1000-'
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.put(
+                image_url, content[1000:], content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes 1000-{total - 1}/{total}'
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            stored = response.json()
+            self.assertEqual(stored['size'], total)
+            self.assertEqual(stored['mime'], 'image/png')
+            self.assertEqual(blob_storage.read(stored['hash']), content)
+            self.assertFalse(os.listdir(upload_dir.name))
+
+            response = self.client.get(f'{url}/some_namedbinimage/', HTTP_RANGE='bytes=100-')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Type'], 'image/png')
+            self.assertEqual(b''.join(response.streaming_content), content[100:])
+
+    def test_binary_files_read_only_view(self):
+        from django.db import models as django_models
+        from vstutils.api import fields
+        from vstutils.api.base import BinaryFilesMixin, UploadBinaryFilesMixin
+        from .models import ModelWithBinaryFiles
+
+        class ReadOnlyBinaryFiles(ModelWithBinaryFiles):
+            class Meta:
+                proxy = True
+                _view_class = 'read_only'
+                _override_detail_fields = dict(some_namedbinfile=fields.NamedBinaryFileInJsonField(required=False))
+
+        class BinaryFilesByModelField(ModelWithBinaryFiles):
+            class Meta:
+                proxy = True
+                _detail_fields = ['some_namedbinfile']
+
+        # Read only views have only download endpoint.
+        view = ReadOnlyBinaryFiles.generated_view
+        self.assertTrue(issubclass(view, BinaryFilesMixin))
+        self.assertFalse(issubclass(view, UploadBinaryFilesMixin))
+        self.assertEqual(set(view.binary_file.mapping), {'get'})
+        self.assertEqual(set(ModelWithBinaryFiles.generated_view.binary_file.mapping), {'get', 'put'})
+        # Fields which are not declared in serializer are found too.
+        serializer_class = BinaryFilesByModelField.generated_view.serializer_class_one
+        field_mapping = {django_models.TextField: fields.NamedBinaryFileInJsonField}
+        with patch.dict(serializer_class.serializer_field_mapping, field_mapping):
+            self.assertTrue(BinaryFilesMixin.has_binary_file_fields(serializer_class))
+        self.assertFalse(BinaryFilesMixin.has_binary_file_fields(serializer_class))
+
     def test_model_namedbinfile_field(self):
         value = {'name': 'abc.png', 'content': '/4sdfsdf/'}
         bulk_data = [
@@ -2215,6 +3442,31 @@ class ProjectTestCase(BaseTestCase):
         self.assertEqual(results[7]['status'], 400, results[7])
         self.assertEqual(results[7]['data'], {'value': ['A valid integer is required.']})
 
+    def test_depend_from_fk_field_cache(self):
+        from .models import Variable, VariableType
+
+        text_type = VariableType.objects.create(name='text', val_type='text')
+        int_type = VariableType.objects.create(name='int', val_type='integer')
+        serializer_class = Variable.generated_view.serializer_class
+        data = [
+            {'key': text_type.id, 'value': f'val{i}'} if i % 2 else {'key': int_type.id, 'value': str(i % 10 + 1)}
+            for i in range(100)
+        ]
+        # One query per related object for the whole list.
+        with self.assertNumQueries(2):
+            serializer = serializer_class(data=data, many=True)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data[0]['value'], '1')
+        self.assertEqual(serializer.validated_data[1]['value'], 'val1')
+        self.assertEqual(serializer.validated_data[1]['key'], text_type)
+
+        # Objects are not shared between serializers without request.
+        text_type.val_type = 'integer'
+        text_type.save()
+        serializer = serializer_class(data={'key': text_type.id, 'value': 'text'})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'value': ['A valid integer is required.']})
+
 
 class CustomModelTestCase(BaseTestCase):
     def test_custom_models(self):
@@ -2268,6 +3520,73 @@ class CustomModelTestCase(BaseTestCase):
         self.assertEqual(results[1]['data']['origin_pos'], 1, results[1]['data'])
         self.assertEqual(results[2]['data']['count'], 5)
 
+    def test_multikeysort(self):
+        from operator import itemgetter
+        from django.db.models import F
+        from vstutils.tools import multikeysort, _get_column_key
+
+        items = [
+            {'id': 1, 'a': 2, 'b': 'x'},
+            {'id': 2, 'a': None, 'b': 'y'},
+            {'id': 3, 'a': 1, 'b': 'y'},
+            {'id': 4, 'a': 'text', 'b': None},
+            {'id': 5, 'a': 1.5, 'b': 'x'},
+            {'id': 6, 'a': 2, 'b': 'z'},
+        ]
+
+        def ids(*args, **kwargs):
+            return [row['id'] for row in multikeysort(list(items), *args, **kwargs)]
+
+        # Numbers before strings, nulls are the greatest.
+        self.assertEqual(ids(['a']), [3, 5, 1, 6, 4, 2])
+        self.assertEqual(ids(['-a']), [2, 4, 1, 6, 5, 3])
+        self.assertEqual(ids(['a', '-b']), [3, 5, 6, 1, 4, 2])
+        self.assertEqual(ids(['a', '-b'], reverse=True), [2, 4, 1, 6, 5, 3])
+        self.assertEqual(ids(['-b', 'id']), [4, 6, 2, 3, 1, 5])
+        self.assertEqual(ids([F('a').asc(nulls_first=True)]), [2, 3, 5, 1, 6, 4])
+        self.assertEqual(ids([F('a').desc(nulls_last=True)]), [4, 1, 6, 5, 3, 2])
+        self.assertEqual(ids([F('a').desc(nulls_last=True)], reverse=True), [2, 3, 5, 1, 6, 4])
+        self.assertEqual(ids(['b', '-id'], limit=3), [5, 1, 3])
+        self.assertEqual(ids(['b'], limit=10), [1, 5, 2, 3, 6, 4])
+
+        qs = File.objects.order_by('-for_order1', 'for_order2')
+        self.assertEqual(list(qs[1:3]), list(qs)[1:3])
+
+        # Columns of one type (or numbers) are sorted by plain values with C-level comparisons.
+        self.assertIsInstance(_get_column_key(items, 'id', True), itemgetter)
+        self.assertIsInstance(_get_column_key([{'a': 1}, {'a': 1.5}], 'a', True), itemgetter)
+        self.assertNotIsInstance(_get_column_key(items, 'b', True), itemgetter)
+        self.assertNotIsInstance(_get_column_key([{'a': 1}, {}], 'a', True), itemgetter)
+        rows = [{'id': i, 'a': i % 7, 'b': str(i % 5)} for i in range(100)]
+        self.assertEqual(
+            [row['id'] for row in multikeysort(list(rows), ['-b', 'a', '-id'])],
+            [row['id'] for row in sorted(rows, key=lambda row: (-int(row['b']), row['a'], -row['id']))]
+        )
+
+    def test_query_clone(self):
+        base_qs = File.objects.filter(name__in=['ToFilter', 'ToExclude']).order_by('for_order1')
+        qs = base_qs.filter(name='ToFilter')
+        excluded_qs = qs.exclude(origin_pos=6)
+
+        # Clones share unchanged parts and don't affect parents.
+        self.assertIs(qs.query['ordering'], base_qs.query['ordering'])
+        self.assertIs(excluded_qs.query['filter'], qs.query['filter'])
+        self.assertEqual(dict(base_qs.query['filter']), {'name__in': ['ToFilter', 'ToExclude']})
+        self.assertNotIn('exclude', qs.query)
+        self.assertEqual(
+            dict(qs.query['filter']),
+            {'name__in': ['ToFilter', 'ToExclude'], 'name': 'ToFilter'}
+        )
+        self.assertIs(excluded_qs.query.queryset, excluded_qs)
+
+        self.assertEqual(base_qs.count(), 6)
+        self.assertEqual(qs.count(), 5)
+        self.assertEqual(excluded_qs.count(), 4)
+        self.assertEqual(excluded_qs.order_by().query['ordering'], ())
+        # Same lookup replaces previous value.
+        self.assertEqual(qs.filter(name='ToExclude').count(), 1)
+        self.assertEqual(qs.count(), 5)
+
     def test_additional_urls(self):
         response = self.client.get('/suburls/admin/login/')
         self.assertEqual(response.status_code, 302)
@@ -2278,6 +3597,7 @@ class CustomModelTestCase(BaseTestCase):
 
 
 class ToolsTestCase(BaseTestCase):
+    @override_settings(HEALTH_CACHE_TIMEOUT=0)
     def test_health_page(self):
         result = self.get_result('get', '/api/health/')
         self.assertIn('db', result)
@@ -2312,6 +3632,131 @@ class ToolsTestCase(BaseTestCase):
             self.assertEqual(result['rpc'], 'disabled')
 
 
+    def test_health_checks_concurrency(self):
+        from vstutils.api.health import BaseBackend
+
+        calls = []
+        # Both checks pass only if they are running at the same time.
+        barrier = threading.Barrier(2, timeout=10)
+        release_hung, release_first = threading.Event(), threading.Event()
+        release_first.set()
+
+        class Backend(BaseBackend):
+            check_timeouts = {'hung': 0.05}
+
+            def check_health_first(self):
+                calls.append('first')
+                barrier.wait()
+                release_first.wait(10)
+
+            def check_health_second(self):
+                calls.append('second')
+                barrier.wait()
+
+            def check_health_hung(self):
+                calls.append('hung')
+                release_hung.wait(10)
+
+        def wait_for(condition):
+            for _ in range(1000):
+                if condition():
+                    return True
+                time.sleep(0.01)
+            return False  # nocv
+
+        backend = Backend()
+        self.addCleanup(release_hung.set)
+        self.addCleanup(release_first.set)
+        with override_settings(HEALTH_CACHE_TIMEOUT=0.01):
+            result, status, durations = backend.get_with_durations()
+            # Checks are executed concurrently and the hung one is reported by its own timeout.
+            self.assertEqual(result, {'first': 'ok', 'second': 'ok', 'hung': 'timeout'})
+            self.assertEqual(status, 503)
+            self.assertEqual(set(durations), {'first', 'second', 'hung'})
+            self.assertEqual(sorted(calls), ['first', 'hung', 'second'])
+
+        with override_settings(HEALTH_CACHE_TIMEOUT=60):
+            # Cached result is returned without running checks.
+            self.assertEqual(backend.get(), (result, status))
+            self.assertEqual(len(calls), 3)
+
+        with override_settings(HEALTH_CACHE_TIMEOUT=0.01):
+            # Stale result is returned without waiting for checks which are refreshed in background.
+            time.sleep(0.02)
+            release_first.clear()
+            self.assertEqual(backend.get(), (result, status))
+            self.assertTrue(wait_for(lambda: calls.count('first') == 2))
+            release_first.set()
+            self.assertTrue(wait_for(lambda: calls.count('second') == 2))
+            # Hung check is not executed again until previous call is finished.
+            self.assertEqual(calls.count('hung'), 1)
+            release_hung.set()
+
+        response = self.client.get('/api/health/live/')
+        self.assertRCode(response, 200)
+        self.assertEqual(self.render_api_response(response), {'status': 'ok'})
+        with override_settings(HEALTH_CACHE_TIMEOUT=0):
+            response = self.client.get('/api/health/ready/')
+            self.assertRCode(response, 200)
+            self.assertEqual(self.render_api_response(response)['db'], 'ok')
+            self.assertIn('health_db;dur=', response['Server-Timing'])
+
+    def test_metrics(self):
+        from vstutils import metrics
+
+        self.assertRCode(self._login().get('/api/metrics/'), 404)
+
+        registry = metrics.default_registry
+        registry.clear()
+        with override_settings(METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL=0, HEALTH_CACHE_TIMEOUT=0):
+            self.get_result('get', '/api/health/')
+            self.get_result('get', self.get_url('hosts'))
+            self.endpoint_call([{"method": "get", "path": ['hosts']}], method='put')
+            with utils.Lock('metrics_test'):
+                pass
+            # Snapshot of another worker process is merged too.
+            cache.set(f'{registry.prefix}otherhost_1', {
+                metrics.bulk_operations.name: {('get', '200'): 3.0}
+            })
+            registry._update_index(add=(f'{registry.prefix}otherhost_1',))
+
+            response = self._login().get('/api/metrics/')
+            self.assertRCode(response, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            content = response.content.decode('utf-8')
+            self.assertIn('# TYPE vstutils_http_request_duration_seconds histogram', content)
+            self.assertIn('vstutils_http_request_duration_seconds_count{method="GET",view="v1:hosts-list",status="200"} 1.0', content)
+            self.assertIn('vstutils_http_request_duration_seconds_bucket{method="GET",view="vstutils.api.views.HealthView",status="200",le="+Inf"}', content)
+            self.assertIn('vstutils_db_queries_total{view="v1:hosts-list"}', content)
+            self.assertIn('vstutils_bulk_operations_total{method="get",status="200"} 4.0', content)
+            self.assertIn('vstutils_bulk_operation_duration_seconds_count{method="get"} 1.0', content)
+            self.assertIn('vstutils_health_check_duration_seconds_count{check="db",status="200"} 1.0', content)
+            self.assertIn('vstutils_lock_wait_seconds_count{kind="Lock",result="acquired"}', content)
+
+            # Expired snapshots are removed from index.
+            cache.delete(f'{registry.prefix}otherhost_1')
+            content = self.client.get('/api/metrics/').content.decode('utf-8')
+            self.assertIn('vstutils_bulk_operations_total{method="get",status="200"} 1.0', content)
+            self.assertNotIn(f'{registry.prefix}otherhost_1', cache.get(registry.index_key))
+
+            with override_settings(METRICS_PUBLIC=True):
+                self.client.logout()
+                self.assertRCode(self.client.get('/api/metrics/'), 200)
+
+            # Metrics are flushed by celery workers after tasks and by all processes at exit.
+            from celery.signals import task_postrun
+            with patch.object(registry, 'flush') as flush:
+                task_postrun.send(sender=None)
+                flush.assert_called_once()
+                registry.clear()
+                registry.flush_at_exit()
+                flush.assert_called_once()
+                metrics.auth_cache.inc(result='hit')
+                registry.flush_at_exit()
+                self.assertEqual(flush.call_count, 2)
+        registry.clear()
+
+
 class ConfigParserCTestCase(BaseTestCase):
     def setUp(self):
         super().setUp()
@@ -2,8 +2,16 @@
 Default ViewSets for web-api.
 """
 
+import os
+import re
+import io
 import sys
+import glob
+import time
+import base64
+import hashlib
 import logging
+import tempfile
 import inspect
 import traceback
 import typing as _t
@@ -12,7 +20,7 @@ from copy import deepcopy
 
 from django.conf import settings
 from django.core import exceptions as djexcs
-from django.http.response import Http404
+from django.http.response import Http404, FileResponse
 from django.db.models.query import QuerySet
 from django.db import transaction, models
 from rest_framework.reverse import reverse
@@ -21,10 +29,14 @@ from rest_framework.response import Response as RestResponse
 from rest_framework.request import Request
 from rest_framework.decorators import action
 from rest_framework.schemas import AutoSchema as DRFAutoSchema
+from rest_framework.utils.field_mapping import ClassLookupDict
+from drf_yasg.utils import swagger_auto_schema
 
+from ..blobs import blob_storage, CHUNK_SIZE
 from ..exceptions import VSTUtilsException
 from ..utils import classproperty, deprecated, get_if_lazy
 from . import responses
+from .fields import NamedBinaryFileInJsonField, MultipleNamedBinaryFileInJsonField
 from .serializers import (
     ErrorSerializer,
     ValidationErrorSerializer,
@@ -52,6 +64,8 @@ detail_actions: _t.Tuple[_t.Text, _t.Text, _t.Text, _t.Text] = (
 )
 main_actions: _t.Tuple[_t.Text, _t.Text, _t.Text, _t.Text, _t.Text] = ('list',) + detail_actions
 logger: logging.Logger = logging.getLogger(settings.VST_PROJECT)
+_content_range_re = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def _get_cleared(qs):
@@ -329,8 +343,24 @@ class GenericViewSet(QuerySetMixin, vsets.GenericViewSet, metaclass=GenericViewS
         return super().as_view(actions, **initkwargs)
 
 
+def _is_many_to_many(opts, name: _t.Text) -> bool:
+    try:
+        return opts.get_field(name).many_to_many
+    except djexcs.FieldDoesNotExist:  # nocv
+        return False
+
+
 class CopyMixin(GenericViewSet):
-    """ Mixin for viewsets which adds `copy` endpoint to view. """
+    """
+    Mixin for viewsets which adds `copy` endpoint to view.
+
+    Subtree of instance may be copied by :attr:`copy_children` specification, e.g.
+    ``{'tasks': {'related': ['tags'], 'children': {'steps': {}}}}``, where keys are reverse relations
+    (related names of foreign keys to copied model) and values are specifications of children with
+    ``related`` (many-to-many relations to copy) and ``children`` keys. Children are cloned with
+    ``bulk_create`` level by level, so number of queries doesn't depend on number of rows
+    (``save()`` and model signals are not called for copied children).
+    """
 
     __slots__ = ()
     #: Value of prefix which will be added to new instance name.
@@ -339,6 +369,8 @@ class CopyMixin(GenericViewSet):
     copy_field_name = 'name'
     #: List of related names which will be copied to new instance.
     copy_related: _t.Iterable[_t.Text] = ()
+    #: Specification of children which will be cloned with new instance.
+    copy_children: _t.Dict[_t.Text, _t.Dict] = {}
 
     def copy_instance(self, instance):
         new_instance = deepcopy(instance)
@@ -348,12 +380,65 @@ class CopyMixin(GenericViewSet):
             name = f'{self.copy_prefix}{name}'
         setattr(new_instance, self.copy_field_name, name)
         new_instance.save()
+        pk_map = {instance.pk: new_instance.pk}
         for related_name in self.copy_related:
+            if _is_many_to_many(instance._meta, related_name):
+                self.copy_many_to_many(type(instance), related_name, pk_map)
+                continue
             new_related_manager = getattr(new_instance, related_name, None)
             if new_related_manager is not None:
                 new_related_manager.set(getattr(instance, related_name).all())
+        self.copy_subtree(type(instance), self.copy_children, pk_map)
         return new_instance
 
+    def copy_many_to_many(self, model: _t.Type[models.Model], related_name: _t.Text, pk_map: _t.Dict):
+        """
+        Copy many-to-many through rows of objects from ``pk_map`` keys to its values.
+        """
+        field = model._meta.get_field(related_name)
+        if field.auto_created and not field.concrete:
+            # Reverse side of many-to-many.
+            field = field.remote_field
+            source_name, target_name = field.m2m_reverse_field_name(), field.m2m_field_name()
+        else:
+            source_name, target_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+        through = field.remote_field.through
+        rows = through.objects.filter(**{f'{source_name}__in': list(pk_map)}).values_list(
+            f'{source_name}_id', f'{target_name}_id'
+        )
+        through.objects.bulk_create([
+            through(**{f'{source_name}_id': pk_map[source_id], f'{target_name}_id': target_id})
+            for source_id, target_id in rows
+        ])
+
+    def copy_subtree(self, model: _t.Type[models.Model], children: _t.Dict[_t.Text, _t.Dict], pk_map: _t.Dict):
+        """
+        Clone children of objects from ``pk_map`` keys to its values by specification.
+        """
+        for related_name, spec in children.items():
+            relation = model._meta.get_field(related_name)
+            child_model, fk_name = relation.related_model, relation.field.attname
+            objects = list(child_model._base_manager.filter(**{f'{fk_name}__in': list(pk_map)}).order_by('pk'))
+            if not objects:
+                continue
+            old_pks = [obj.pk for obj in objects]
+            for obj in objects:
+                obj.pk = None
+                setattr(obj, fk_name, pk_map[getattr(obj, fk_name)])
+            created = child_model._base_manager.bulk_create(objects)
+            if not spec.get('related') and not spec.get('children'):
+                continue
+            if any(obj.pk is None for obj in created):
+                # Database doesn't return ids of inserted rows, but new parents have only copied children,
+                # which were inserted in order.
+                created = list(
+                    child_model._base_manager.filter(**{f'{fk_name}__in': list(pk_map.values())}).order_by('pk')
+                )
+            child_pk_map = dict(zip(old_pks, (obj.pk for obj in created)))
+            for child_related_name in spec.get('related', ()):
+                self.copy_many_to_many(child_model, child_related_name, child_pk_map)
+            self.copy_subtree(child_model, spec.get('children', {}), child_pk_map)
+
     @action(methods=['post'], detail=True)
     @transaction.atomic()
     def copy(self, request: Request, **kwargs) -> responses.BaseResponseClass:
@@ -368,6 +453,266 @@ class CopyMixin(GenericViewSet):
         return responses.HTTP_201_CREATED(serializer.data)
 
 
+def is_binary_file_field(field: _t.Any) -> bool:
+    """
+    Check that serializer field keeps single named binary file and may be streamed by :class:`.BinaryFilesMixin`.
+    """
+    return isinstance(field, NamedBinaryFileInJsonField) and not isinstance(field, MultipleNamedBinaryFileInJsonField)
+
+
+def _copy_stream(source, target, limit: _t.Optional[int] = None) -> int:
+    copied = 0
+    while source is not None and (limit is None or copied < limit):
+        chunk = source.read(CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit - copied))
+        if not chunk:
+            break
+        target.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+class _FileRange:
+    __slots__ = ('file', 'remaining')
+
+    def __init__(self, file, start: int, length: int):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryFilesMixin(GenericViewSet):
+    """
+    Mixin for viewsets which adds ``files/<field_name>`` endpoint to detail view
+    for every :class:`vstutils.api.fields.NamedBinaryFileInJsonField` (or :class:`.NamedBinaryImageInJsonField`)
+    of detail serializer. Generated model views get this mixin automatically
+    (or :class:`.UploadBinaryFilesMixin` if view supports update).
+
+    * ``GET`` returns content of file with ``Range`` requests support.
+    * ``PUT`` (only in :class:`.UploadBinaryFilesMixin`) takes raw bytes of file
+      (name of file is passed in ``name`` query parameter).
+      Large files may be uploaded by chunks in order with ``Content-Range: bytes <start>-<end>/<total>`` header;
+      every not last chunk returns ``202`` with count of received bytes.
+      File is saved by detail serializer as partial update, so its validation and ``update()`` are applied.
+
+    Uploads are written to temporary files (``FILE_UPLOAD_TEMP_DIR``) by chunks, so memory usage doesn't
+    depend on file size when field uses ``blob_storage``. Otherwise content is saved to model as base64,
+    so such files are limited by ``DATA_UPLOAD_MAX_MEMORY_SIZE`` like request body with them.
+    Not finished chunked uploads older than :attr:`upload_part_max_age` are removed when new upload starts.
+    """
+
+    __slots__ = ()
+
+    #: Max age in seconds of temporary file of not finished chunked upload.
+    upload_part_max_age: int = 60 * 60 * 24
+
+    @classmethod
+    def has_binary_file_fields(cls, serializer_class: _t.Type[serializers.Serializer]) -> bool:
+        # pylint: disable=protected-access
+        if any(map(is_binary_file_field, getattr(serializer_class, '_declared_fields', {}).values())):
+            return True
+        # Fields of model serializer are generated by model fields later, so they are checked by mapping.
+        meta = getattr(serializer_class, 'Meta', None)
+        model_fields = getattr(meta, 'fields', None)
+        if getattr(meta, 'model', None) is None or not isinstance(model_fields, (list, tuple)):
+            return False
+        field_mapping = ClassLookupDict(getattr(serializer_class, 'serializer_field_mapping', {}))
+        for field_name in model_fields:
+            try:
+                field_class = field_mapping[meta.model._meta.get_field(field_name)]
+            except (KeyError, djexcs.FieldDoesNotExist):
+                continue
+            if issubclass(field_class, NamedBinaryFileInJsonField) and \
+                    not issubclass(field_class, MultipleNamedBinaryFileInJsonField):
+                return True
+        return False
+
+    def get_binary_file_serializer_class(self) -> _t.Type[serializers.Serializer]:
+        return getattr(self, 'serializer_class_one', None) or self.serializer_class
+
+    def get_binary_file_field(self, field_name: _t.Text) -> NamedBinaryFileInJsonField:
+        serializer_class = self.get_binary_file_serializer_class()
+        field = serializer_class(context=self.get_serializer_context()).fields.get(field_name)
+        if not is_binary_file_field(field):
+            raise Http404
+        return field
+
+    def get_upload_part_path(self, instance: models.Model, field_name: _t.Text) -> _t.Text:
+        """
+        Path of temporary file with already received chunks of upload.
+        """
+        key = f'{instance._meta.label}:{instance.pk}:{field_name}:{getattr(self.request.user, "pk", None)}'
+        return os.path.join(
+            settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(),
+            f'vst-upload-{hashlib.md5(key.encode("utf-8")).hexdigest()}.part'  # nosec
+        )
+
+    def get_upload_max_size(self, field: NamedBinaryFileInJsonField) -> _t.Optional[int]:
+        """
+        Max size of uploaded file. Only files saved to ``blob_storage`` aren't loaded to memory and aren't limited.
+        """
+        if field.blob_storage is not None:
+            return None
+        return settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+    def clean_upload_parts(self):
+        """
+        Remove temporary files of abandoned chunked uploads.
+        """
+        expire_time = time.time() - self.upload_part_max_age
+        pattern = os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), 'vst-upload-*.part')
+        for path in glob.glob(pattern):
+            try:
+                if os.path.getmtime(path) < expire_time:
+                    os.remove(path)
+            except OSError:  # nocv
+                # File is removed by finished upload.
+                pass
+
+    def save_binary_file(self, instance: models.Model, field: NamedBinaryFileInJsonField, fileobj, name: _t.Text):
+        context = self.get_serializer_context()
+        if field.blob_storage is not None:
+            data = {'name': name, 'hash': field.blob_storage.save_file(fileobj)[0]}
+            # Just uploaded file may be referenced by hash.
+            context['blob_hashes'] = [data['hash']]
+        else:
+            data = {'name': name, 'content': base64.b64encode(fileobj.read()).decode('ascii')}
+        serializer = self.get_binary_file_serializer_class()(
+            instance, data={field.field_name: data}, partial=True, context=context
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)  # type: ignore
+        return responses.HTTP_200_OK(serializer.data[field.field_name])
+
+    def upload_binary_file(self, request: Request, instance: models.Model, field: NamedBinaryFileInJsonField):
+        name = request.query_params.get('name') or \
+            field.to_representation(getattr(instance, field.source, None)).get('name') or \
+            field.field_name
+        max_size = self.get_upload_max_size(field)
+        too_large = responses.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        content_range = request.META.get('HTTP_CONTENT_RANGE')
+        if not content_range:
+            with tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR) as upload:
+                size = _copy_stream(request.stream, upload, None if max_size is None else max_size + 1)
+                if max_size is not None and size > max_size:
+                    return too_large({'detail': f'File size exceeds {max_size} bytes.'})
+                upload.seek(0)
+                return self.save_binary_file(instance, field, upload, name)
+
+        match = _content_range_re.match(content_range)
+        start, end, total = map(int, match.groups()) if match else (0, -1, 0)
+        if end < start or end >= total:
+            raise exceptions.ValidationError({'detail': f'Invalid Content-Range header: {content_range}.'})
+        if max_size is not None and total > max_size:
+            return too_large({'detail': f'File size exceeds {max_size} bytes.'})
+        if not start:
+            self.clean_upload_parts()
+        part_path = self.get_upload_part_path(instance, field.field_name)
+        received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # Chunks are appended in order, first chunk restarts upload.
+        if start and start != received:
+            return responses.HTTP_409_CONFLICT({'detail': 'Unexpected chunk start.', 'received': received})
+        with open(part_path, 'r+b' if start else 'wb') as part:
+            part.seek(start)
+            received = start + _copy_stream(request.stream, part, end - start + 1)
+            part.truncate(received if received == end + 1 else start)
+        if received != end + 1:
+            raise exceptions.ValidationError({'detail': 'Chunk size does not match Content-Range header.'})
+        if received < total:
+            return responses.HTTP_202_ACCEPTED({'received': received})
+        try:
+            with open(part_path, 'rb') as part:
+                return self.save_binary_file(instance, field, part, name)
+        finally:
+            os.remove(part_path)
+
+    def download_binary_file(self, request: Request, instance: models.Model, field: NamedBinaryFileInJsonField):
+        data = field.to_representation(getattr(instance, field.source, None))
+        if data.get('hash'):
+            storage = field.blob_storage or blob_storage
+            if not storage.exists(data['hash']):
+                raise Http404
+            fileobj, size = storage.open(data['hash']), storage.size(data['hash'])
+        elif data.get('content'):
+            content = base64.b64decode(data['content'])
+            fileobj, size = io.BytesIO(content), len(content)
+        else:
+            raise Http404
+
+        content_type = data.get('mime') or 'application/octet-stream'
+        start, end = 0, size - 1
+        range_match = _range_re.match(request.META.get('HTTP_RANGE', ''))
+        if range_match and any(range_match.groups()):
+            first, last = range_match.groups()
+            if not first:
+                start = max(size - int(last), 0)
+            else:
+                start = int(first)
+                end = min(int(last), end) if last else end
+            if start > end:
+                fileobj.close()
+                response = FileResponse(io.BytesIO(), status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        length = end - start + 1
+        response = FileResponse(
+            _FileRange(fileobj, start, length),
+            content_type=content_type,
+            as_attachment=True,
+            filename=data.get('name') or field.field_name,
+        )
+        if length != size:
+            response.status_code = status.HTTP_206_PARTIAL_CONTENT
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def handle_binary_file(self, request: Request, field_name: _t.Text):
+        field = self.get_binary_file_field(field_name)
+        instance = self.get_object()
+        if request.method == 'PUT':
+            if field.read_only:
+                raise exceptions.MethodNotAllowed(request.method)
+            return self.upload_binary_file(request, instance, field)
+        return self.download_binary_file(request, instance, field)
+
+    @swagger_auto_schema(methods=['get'], auto_schema=None)
+    @action(methods=['get'], detail=True, url_path=r'files/(?P<field_name>\w+)')
+    def binary_file(self, request: Request, field_name: _t.Text, **kwargs):
+        # pylint: disable=unused-argument
+        """
+        Endpoint which streams content of binary field.
+        """
+        return self.handle_binary_file(request, field_name)
+
+
+class UploadBinaryFilesMixin(BinaryFilesMixin):
+    """
+    Extends :class:`.BinaryFilesMixin` with ``PUT`` method for upload. Requires view with ``perform_update``.
+    """
+
+    __slots__ = ()
+
+    @swagger_auto_schema(methods=['get', 'put'], auto_schema=None)
+    @action(methods=['get', 'put'], detail=True, url_path=r'files/(?P<field_name>\w+)')
+    def binary_file(self, request: Request, field_name: _t.Text, **kwargs):
+        # pylint: disable=unused-argument
+        """
+        Endpoint which streams content of binary field and uploads it.
+        """
+        return self.handle_binary_file(request, field_name)
+
+
 class ModelViewSet(GenericViewSet, vsets.ModelViewSet):
     # pylint: disable=useless-super-delegation
 
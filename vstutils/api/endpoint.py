@@ -1,9 +1,9 @@
+import re
 import typing as _t
 import logging
 import traceback
 import functools
 from concurrent.futures import ThreadPoolExecutor, Executor
-from collections import OrderedDict
 import json
 
 from django.conf import settings
@@ -25,8 +25,9 @@ from . import responses
 from .decorators import cache_method_result
 from .serializers import DataSerializer
 from .validators import UrlQueryStringValidator
-from ..utils import Dict, raise_context
+from ..utils import Dict
 from ..middleware import BaseMiddleware
+from .. import metrics
 
 RequestType = _t.Union[drf_request.Request, HttpRequest]
 logger: logging.Logger = logging.getLogger('vstutils')
@@ -92,6 +93,83 @@ def _join_paths(*args) -> _t.Text:
     return f"/{'/'.join(str(arg).strip('/') for arg in args)}/"
 
 
+class _TemplateError(Exception):
+    pass
+
+
+class _Template:
+    """
+    Compiled string with "<< >>" references to results of previous operations,
+    e.g. ``<<0[data][id]>>`` is lookup of ``results[0]['data']['id']``.
+    """
+    __slots__ = ('parts',)
+
+    def __init__(self, parts: _t.Tuple):
+        #: Literal strings and references as (source, index of result, accessors).
+        self.parts = parts
+
+    @staticmethod
+    def resolve(reference: _t.Tuple, results: _t.Sequence) -> _t.Any:
+        source, index, accessors = reference
+        try:
+            value = results[index]
+            for is_attribute, key in accessors:
+                value = getattr(value, key) if is_attribute else value[key]
+        except (LookupError, TypeError, AttributeError) as err:
+            raise _TemplateError(f'Cannot resolve template reference "<<{source}>>": {err!r}.') from err
+        return value
+
+    def render(self, results: _t.Sequence, native: bool = False) -> _t.Any:
+        if native and len(self.parts) == 1 and isinstance(self.parts[0], tuple):
+            return self.resolve(self.parts[0], results)
+        return ''.join(
+            str(self.resolve(part, results)) if isinstance(part, tuple) else part
+            for part in self.parts
+        )
+
+
+_template_reference_re = re.compile(r'<<(\d[^<>]*)>>')
+_template_source_re = re.compile(r'^(\d+)((?:\[[^\[\]]+\]|\.\w+)*)$')
+_template_accessor_re = re.compile(r'\[([^\[\]]+)\]|\.(\w+)')
+
+
+#: Longer strings aren't cached to not keep big payloads of requests in memory.
+_template_cache_max_length = 1024
+
+
+def _parse_template(value: _t.Text) -> _t.Optional[_Template]:
+    parts: _t.List[_t.Any] = []
+    position = 0
+    for match in _template_reference_re.finditer(value):
+        source = match.group(1)
+        source_match = _template_source_re.match(source)
+        if source_match is None:
+            raise serializers.ValidationError(f'Invalid template reference "<<{source}>>".')
+        accessors = tuple(
+            # Keys are converted like in `str.format`.
+            (False, int(key) if key.isdigit() else key) if key else (True, attribute)
+            for key, attribute in _template_accessor_re.findall(source_match.group(2))
+        )
+        if match.start() > position:
+            parts.append(value[position:match.start()])
+        parts.append((source, int(source_match.group(1)), accessors))
+        position = match.end()
+    if not parts:
+        return None
+    if position < len(value):
+        parts.append(value[position:])
+    return _Template(tuple(parts))
+
+
+_cached_template = functools.lru_cache(maxsize=1024)(_parse_template)
+
+
+def _compile_template(value: _t.Text) -> _t.Optional[_Template]:
+    if len(value) > _template_cache_max_length:
+        return _parse_template(value)
+    return _cached_template(value)
+
+
 class _DummyExecutor(Executor):
     # pylint: disable=abstract-method
 
@@ -178,19 +256,24 @@ class FormatDataFieldMixin:
 
     requires_context: bool = True
     context: _t.Dict
+    #: Return referenced value as is when string is one template.
+    native_templates: bool = False
+
+    def format_templates(self, value: _t.Text, native: bool = False) -> _t.Any:
+        if '<<' not in value or 'results' not in self.context:
+            return value
+        template = _compile_template(value)
+        if template is None:
+            return value
+        try:
+            return template.render(self.context['results'], native)
+        except _TemplateError as err:
+            raise serializers.ValidationError(str(err))
 
     def to_internal_value(self, data) -> _t.Text:
         result = super().to_internal_value(data)  # type: ignore
-
-        if isinstance(result, str) \
-                and '<<' in result \
-                and '>>' in result \
-                and not ('{' in result and '}' in result) \
-                and 'results' in self.context:
-            result = result.replace('<<', '{').replace('>>', '}').format(*self.context['results'])
-            with raise_context():
-                return json.loads(result)
-
+        if isinstance(result, str):
+            result = self.format_templates(result, self.native_templates)
         return result
 
 
@@ -205,20 +288,28 @@ class RequestDataField(FormatDataFieldMixin, DataSerializer):
     Field that can handle basic data types and recursise
     format template strings inside them
     """
+    native_templates = True
 
-    def to_internal_value(self, data):
+    def format_data(self, data):
+        # Containers are rebuilt only when some of items are changed.
         if isinstance(data, str):
-            pass
-
-        elif isinstance(data, (list, tuple)):
-            return [self.to_internal_value(i) for i in data]
-
-        elif isinstance(data, (dict, OrderedDict)):
-            return type(data)(
-                (super(RequestDataField, self).to_internal_value(k), self.to_internal_value(v))
-                for k, v in data.items()
-            )
+            return self.format_templates(data, True)
+        if isinstance(data, (list, tuple)):
+            items = [self.format_data(item) for item in data]
+            if isinstance(data, tuple) or any(new is not old for new, old in zip(items, data)):
+                return items
+        elif isinstance(data, dict):
+            pairs = [
+                (self.format_templates(key) if isinstance(key, str) else key, self.format_data(value))
+                for key, value in data.items()
+            ]
+            if any(new is not old for pair, old_pair in zip(pairs, data.items()) for new, old in zip(pair, old_pair)):
+                return type(data)(pairs)
+        return data
 
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple, dict)):
+            return self.format_data(data)
         return super(RequestDataField, self).to_internal_value(data)
 
 
@@ -421,6 +512,9 @@ class EndpointViewSet(views.APIView):
         for result, timing in _iter_request(request, self.operate, context):
             append_to_list(self.results, result)
             append_to_list(timings, timing)
+            method = str(result.get('method', '')).lower()
+            metrics.bulk_operations.inc(method=method, status=result.get('status', 500))
+            metrics.bulk_operation_duration.observe(float(timing) / 1000, method=method)
             if not allow_fail and not (100 <= result.get('status', 500) < 400):
                 raise Exception(f'Execute transaction stopped. Error message: {str(result)}')
         response = responses.HTTP_200_OK(self.results, timings={f'op{i}': float(j) for i, j in enumerate(timings)})
@@ -5,9 +5,10 @@ Additional serializer fields for generating OpenAPI and GUI.
 import typing as _t
 import json
 import copy
-import functools
+import base64
+import mimetypes
 
-from rest_framework.serializers import CharField, IntegerField, ModelSerializer
+from rest_framework.serializers import CharField, IntegerField, ModelSerializer, ListSerializer
 from rest_framework.fields import empty, SkipField, get_error_detail, Field
 from rest_framework.exceptions import ValidationError
 from django.apps import apps
@@ -270,24 +271,38 @@ class DependFromFkField(DynamicJsonTypeField):
     __slots__ = ('field', 'field_attribute')
 
     default_related_field = VSTCharField(allow_null=True, allow_blank=True, default='')
+    # Copies of mapped fields by serializer class, field name and related type.
+    _related_fields_cache: _t.ClassVar[_t.Dict[_t.Tuple[type, _t.Text, _t.Any], _t.Tuple[Field, Field]]] = {}
 
     def __init__(self, **kwargs):
         self.field = kwargs.pop('field')
         self.field_attribute = kwargs.pop('field_attribute')
         super(DynamicJsonTypeField, self).__init__(**kwargs)  # pylint: disable=bad-super-call
 
-    def get_value(self, dictionary: _t.Any) -> _t.Any:
-        value = super().get_value(dictionary)
-
-        related_object: models.Model = self.parent.fields[self.field].get_value(dictionary)  # type: ignore
+    def get_related_field(self, related_object: models.Model) -> Field:
+        """
+        Returns field for validation of value by type of related object.
+        Mapped field is copied once and reused by all serializers of the same class.
+        """
         related_type = getattr(related_object, self.field_attribute)
-        related_field: Field = getattr(
+        mapped_field: Field = getattr(
             related_object,
             f'{self.field_attribute}_fields_mapping',
             {related_type: self.default_related_field}
         ).get(related_type, self.default_related_field)
-        related_field: Field = copy.deepcopy(related_field)
-        related_field.field_name: _t.Text = self.field_name  # type: ignore
+        cache_key = (self.parent.__class__, self.field_name, related_type)
+        cached = self._related_fields_cache.get(cache_key)
+        if cached is None or cached[0] is not mapped_field:
+            related_field: Field = copy.deepcopy(mapped_field)
+            related_field.field_name: _t.Text = self.field_name  # type: ignore
+            cached = self._related_fields_cache[cache_key] = (mapped_field, related_field)
+        return cached[1]
+
+    def get_value(self, dictionary: _t.Any) -> _t.Any:
+        value = super().get_value(dictionary)
+
+        related_object: models.Model = self.parent.fields[self.field].get_value(dictionary)  # type: ignore
+        related_field = self.get_related_field(related_object)
 
         errors = {}
         primitive_value = related_field.get_value(dictionary)
@@ -445,10 +460,23 @@ class FkModelField(FkField):
             lambda: self.model_class.get_list_serializer_name().split('Serializer')[0]
         )
 
-    @functools.lru_cache()
+    def _get_fk_cache(self) -> _t.Dict:
+        # Objects are cached for current request (or serializer without request),
+        # so sibling fields and rows of list share one query per related object.
+        request = self.context.get('request')
+        holder = getattr(request, '_request', request) if request is not None else self.root
+        fk_cache = getattr(holder, '_vst_fk_cache', None)
+        if fk_cache is None:
+            fk_cache = holder._vst_fk_cache = {}
+        return fk_cache
+
     def _get_data_from_model(self, value):
         self.model_class = get_if_lazy(self.model_class)
-        return self.model_class.objects.get(**{self.autocomplete_property: value})
+        fk_cache = self._get_fk_cache()
+        cache_key = (self.model_class, self.autocomplete_property, str(value))
+        if cache_key not in fk_cache:
+            fk_cache[cache_key] = self.model_class.objects.get(**{self.autocomplete_property: value})
+        return fk_cache[cache_key]
 
     def get_value(self, dictionary: _t.Any) -> _t.Any:
         value = super().get_value(dictionary)
@@ -520,6 +548,15 @@ class NamedBinaryFileInJsonField(VSTCharField):
     or :class:`django.db.models.TextField` model fields. All manipulations with decoding and encoding
     binary content data executes on client. This imposes reasonable limits on file size.
 
+    :param blob_storage: save content to content-addressed :class:`vstutils.blobs.BlobStorage`
+                         (``True`` for default storage) and keep only ``name``, ``hash``, ``size``
+                         and ``mime`` in the model field. Representation contains ``url`` of content
+                         instead of ``content``. Values saved inline are still readable.
+                         File of current value of instance can be passed back with its ``hash``
+                         instead of ``content`` (other hashes are allowed only if they are listed
+                         in ``blob_hashes`` of serializer context).
+    :type blob_storage: bool,vstutils.blobs.BlobStorage
+
     .. note::
         Take effect only in GUI. In API it would be simple :class:`.VSTCharField` with structure of data.
 
@@ -528,42 +565,196 @@ class NamedBinaryFileInJsonField(VSTCharField):
     __slots__ = ()
 
     __valid_keys = ('name', 'content')
+    __blob_keys = ('name', 'hash', 'size', 'mime', 'url')
     default_error_messages = {
         'not a JSON': 'value is not a valid JSON',
         'missing key': 'key {missing_key} is missing',
         'invalid key': 'invalid key {invalid_key}',
+        'invalid content': 'content is not a valid base64 string',
+        'unknown blob': 'file with hash {hash} does not exist',
     }
 
+    def __init__(self, *args, blob_storage: _t.Union[bool, _t.Any] = None, **kwargs):
+        if blob_storage is True:
+            from ..blobs import blob_storage as default_blob_storage  # pylint: disable=import-outside-toplevel
+            blob_storage = default_blob_storage
+        self.blob_storage = blob_storage or None
+        super().__init__(*args, **kwargs)
+
     def validate_value(self, data: _t.Dict):
         if not isinstance(data, dict):
             self.fail('not a JSON')
+        is_blob_reference = self.blob_storage is not None and 'content' not in data and 'hash' in data
+        valid_keys = self.__blob_keys if is_blob_reference else self.__valid_keys
         invalid_keys = [
             k
             for k in data.keys()
-            if k not in self.__valid_keys
+            if k not in valid_keys
         ]
 
         if invalid_keys:
             self.fail('invalid key', invalid_key=invalid_keys[0])
 
-        for key in self.__valid_keys:
+        for key in (('name', 'hash') if is_blob_reference else self.__valid_keys):
             if key not in data:
                 self.fail('missing key', missing_key=key)
 
+    def get_allowed_blob_hashes(self) -> _t.Set[_t.Text]:
+        """
+        Hashes of blobs which may be referenced in value: files of current value of instance
+        and ``blob_hashes`` of serializer context (e.g. just uploaded files).
+        """
+        hashes = set(self.context.get('blob_hashes', ()))
+        instance = getattr(self.parent, 'instance', None)
+        if instance is None or isinstance(instance, (list, models.QuerySet)) or self.source == '*':
+            return hashes
+        value = getattr(instance, self.source, None)
+        try:
+            value = json.loads(value) if isinstance(value, str) else value
+        except ValueError:
+            return hashes
+        for file in (value if isinstance(value, list) else [value]):
+            if isinstance(file, dict) and file.get('hash'):
+                hashes.add(file['hash'])
+        return hashes
+
+    def to_blob_value(self, data: _t.Dict) -> _t.Dict:
+        """
+        Save content of validated value to blob storage and return stored structure.
+        """
+        if 'content' in data:
+            try:
+                content = base64.b64decode(data['content'] or '')
+            except (TypeError, ValueError):
+                self.fail('invalid content')
+            blob_hash, size = self.blob_storage.save(content), len(content)
+        else:
+            blob_hash = data['hash']
+            if blob_hash not in self.get_allowed_blob_hashes() or not self.blob_storage.exists(blob_hash):
+                self.fail('unknown blob', hash=blob_hash)
+            size = self.blob_storage.size(blob_hash)
+        return {
+            'name': data['name'],
+            'hash': blob_hash,
+            'size': size,
+            'mime': mimetypes.guess_type(data['name'] or '')[0] or 'application/octet-stream',
+        }
+
+    def to_stored_value(self, data: _t.Dict) -> _t.Dict:
+        """
+        Convert validated value of one file to structure saved in model field.
+        """
+        if self.blob_storage is not None:
+            data = self.to_blob_value(data)
+        return data
+
+    def blob_representation(self, data: _t.Any) -> _t.Any:
+        if self.blob_storage is not None and isinstance(data, dict) and data.get('hash'):
+            data['url'] = self.blob_storage.url(data['hash'])
+        return data
+
     def to_internal_value(self, data: _t.Dict) -> _t.Text:
         if data is not None:
             self.validate_value(data)
+            data = self.to_stored_value(data)
         return super().to_internal_value(data)
 
     @raise_context_decorator_with_default(default={"name": None, "content": None})
     def to_representation(self, value) -> _t.Dict[_t.Text, _t.Optional[_t.Any]]:
-        return json.loads(value)
+        return self.blob_representation(json.loads(value))
+
+
+class ThumbnailsMixin:
+    """
+    Adds thumbnails generation to image fields.
+
+    :param thumbnails: generate thumbnails at ``THUMBNAIL_SIZES`` on save of vstutils serializers
+                       (:class:`vstutils.api.serializers.BaseSerializer` and
+                       :class:`vstutils.api.serializers.VSTSerializer`) and keep their hashes
+                       in ``thumbnails`` of value. Representation contains urls of thumbnails and,
+                       in list serializers, ``thumbnail`` url instead of ``content``.
+    :type thumbnails: bool
+    """
+    __slots__ = ()
+
+    __thumbnail_keys = ('thumbnail', 'thumbnails')
+    blob_storage: _t.Any
+    parent: _t.Any
+
+    def __init__(self, *args, thumbnails: bool = False, **kwargs):
+        self.thumbnails = thumbnails
+        super().__init__(*args, **kwargs)
 
+    @property
+    def thumbnails_storage(self):
+        from ..blobs import blob_storage  # pylint: disable=import-outside-toplevel
+        return self.blob_storage or blob_storage
 
-class NamedBinaryImageInJsonField(NamedBinaryFileInJsonField):
+    def validate_value(self, data: _t.Dict):
+        if isinstance(data, dict):
+            # Thumbnails from representation are regenerated.
+            for key in self.__thumbnail_keys:
+                data.pop(key, None)
+        super().validate_value(data)  # type: ignore
+
+    def to_stored_value(self, data: _t.Dict) -> _t.Dict:
+        if self.thumbnails and data.get('content'):
+            from .validators import ImageContext  # pylint: disable=import-outside-toplevel
+            try:
+                # Content is decoded for thumbnails on save, so it is checked here
+                # (content decoded by image validators is reused).
+                ImageContext.get(data).content  # pylint: disable=expression-not-assigned
+            except (TypeError, ValueError):
+                self.fail('invalid content')  # type: ignore
+        return super().to_stored_value(data)  # type: ignore
+
+    def add_thumbnails(self, value: _t.Optional[_t.Text]) -> _t.Optional[_t.Text]:
+        """
+        Generate thumbnails of validated value and add their hashes to it.
+        Called by serializers of vstutils on save, so validation doesn't generate thumbnails.
+        """
+        if not self.thumbnails or not value:
+            return value
+        from ..thumbnails import thumbnail_generator  # pylint: disable=import-outside-toplevel
+
+        files = json.loads(value)
+        for file in (files if isinstance(files, list) else [files]):
+            if not isinstance(file, dict):  # nocv
+                continue
+            if file.get('content'):
+                content = file['content']
+                file['thumbnails'] = thumbnail_generator.generate(
+                    lambda: base64.b64decode(content),
+                    storage=self.thumbnails_storage,
+                )
+            elif file.get('hash') and self.blob_storage is not None:
+                blob_hash = file['hash']
+                file['thumbnails'] = thumbnail_generator.generate(
+                    lambda: self.blob_storage.read(blob_hash),
+                    source_hash=blob_hash,
+                    storage=self.thumbnails_storage,
+                )
+        return json.dumps(files)
+
+    def blob_representation(self, data: _t.Any) -> _t.Any:
+        data = super().blob_representation(data)  # type: ignore
+        if isinstance(data, dict) and data.get('thumbnails'):
+            storage = self.thumbnails_storage
+            data['thumbnails'] = {size: storage.url(blob_hash) for size, blob_hash in data['thumbnails'].items()}
+            if isinstance(getattr(self.parent, 'parent', None), ListSerializer):
+                # List views show thumbnails, so original content isn't sent.
+                data.pop('content', None)
+                data['thumbnail'] = next(iter(data['thumbnails'].values()))
+        return data
+
+
+class NamedBinaryImageInJsonField(ThumbnailsMixin, NamedBinaryFileInJsonField):
     """
     Extends :class:`.NamedBinaryFileInJsonField` but in GUI has a different view
     which shows content of image.
+
+    :param thumbnails: generate thumbnails of image (see :class:`.ThumbnailsMixin`).
+    :type thumbnails: bool
     """
 
     __slots__ = ()
@@ -586,17 +777,21 @@ class MultipleNamedBinaryFileInJsonField(NamedBinaryFileInJsonField):
                 self.fail('not a list')
             for file in data:
                 self.validate_value(file)
+            data = [self.to_stored_value(file) for file in data]
         return VSTCharField.to_internal_value(self, data)
 
     @raise_context_decorator_with_default(default=[])
     def to_representation(self, value) -> _t.List[_t.Dict[_t.Text, _t.Any]]:  # type: ignore
-        return json.loads(value)
+        return [self.blob_representation(file) for file in json.loads(value)]
 
 
-class MultipleNamedBinaryImageInJsonField(MultipleNamedBinaryFileInJsonField):
+class MultipleNamedBinaryImageInJsonField(ThumbnailsMixin, MultipleNamedBinaryFileInJsonField):
     """
     Extends :class:`.MultipleNamedBinaryFileInJsonField` but uses list of structures.
     This provide operating with multiple images and works as list of :class:`NamedBinaryImageInJsonField`.
+
+    :param thumbnails: generate thumbnails of images (see :class:`.ThumbnailsMixin`).
+    :type thumbnails: bool
     """
 
     __slots__ = ()
@@ -1,6 +1,8 @@
 from django_filters import rest_framework as filters
 from django_filters import CharFilter
 
+from ..search import get_search_backend
+
 id_help = 'A unique integer value (or comma separated list) identifying this instance.'
 name_help = 'A name string value (or comma separated list) of instance.'
 
@@ -34,7 +36,8 @@ def extra_filter(queryset, field, value):
 
 def name_filter(queryset, field, value):
     """
-    Method for searching by part of name. Uses `LIKE` DB condition or `contains` qs-expression.
+    Method for searching by part of name. Uses `contains` qs-expression with index of search backend
+    for the database (see :mod:`vstutils.search`).
 
     :param queryset: model queryset for filtration.
     :type queryset: django.db.models.query.QuerySet
@@ -46,7 +49,10 @@ def name_filter(queryset, field, value):
     :rtype: django.db.models.query.QuerySet
     """
 
-    return _extra_search(queryset, field, value, "contains")
+    field_name, _, tp = field.partition("__")
+    if tp.upper() == "NOT":
+        return _extra_search(queryset, field, value, "contains")
+    return get_search_backend(queryset.db).filter(queryset, field_name, value)
 
 
 class DefaultIDFilter(filters.FilterSet):
@@ -60,7 +66,7 @@ class DefaultIDFilter(filters.FilterSet):
 
 class DefaultNameFilter(filters.FilterSet):
     """
-    Basic filterset to search by part of name. Uses `LIKE` DB condition by :func:`.name_filter`.
+    Basic filterset to search by part of name. Uses search backend of database by :func:`.name_filter`.
     """
     name = CharFilter(method=name_filter, help_text=name_help)
     name__not = CharFilter(method=name_filter, help_text=name_help)
@@ -1,23 +1,62 @@
-from typing import Text, Iterable, Callable, Dict, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from threading import Lock, Thread
+from typing import Text, Iterable, Callable, Dict, Tuple, Optional, Any
 
 from django.db import connections
 from rest_framework import status as st
 
 from ..utils import BaseVstObject, import_class
+from .. import metrics
+
+
+HealthResultType = Tuple[Dict, int, Dict[Text, float]]
+
+
+def _run_parallel(func: Callable[[Any], Any], items: Iterable):
+    items = tuple(items)
+    if len(items) <= 1:
+        for item in items:
+            func(item)
+        return
+    with ThreadPoolExecutor(len(items)) as executor:
+        for _ in executor.map(func, items):
+            pass
 
 
 class BaseBackend(BaseVstObject):
-    __slots__ = ('__health_methods',)
+    """
+    Health checks backend. Every ``check_health_<name>`` method is a check,
+    which returns description (or ``None`` for "ok") or raises exception.
+
+    Checks are executed concurrently and each check has its own timeout
+    (``check_timeouts`` by name or ``HEALTH_CHECK_TIMEOUT`` setting).
+    Results are cached in-process for ``HEALTH_CACHE_TIMEOUT`` seconds,
+    and stale results are refreshed in background, so probes never wait
+    for slow checks except the very first one.
+    """
+    __slots__ = ('__health_methods', '__result', '__result_time', '__refresh_lock', '__running', '__executor')
+
+    check_timeouts: Dict[Text, float] = {}
 
     def __init__(self):
         self.__health_methods = {}  # typing: Dict
+        self.__result: Optional[HealthResultType] = None
+        self.__result_time = 0.0
+        self.__refresh_lock = Lock()
+        self.__running: Dict[Text, Future] = {}
+        self.__executor: Optional[ThreadPoolExecutor] = None
 
-    def __health_method_wrapper(self, method: Callable):
+    def __health_method_wrapper(self, key: Text, method: Callable):
+        start = time.monotonic()
         try:
-            return method() or 'ok', st.HTTP_200_OK
+            result = method() or 'ok', st.HTTP_200_OK
         except BaseException as exception:
             code = getattr(exception, 'status', st.HTTP_500_INTERNAL_SERVER_ERROR)
-            return str(exception), code
+            result = str(exception), code
+        duration = time.monotonic() - start
+        metrics.health_check_duration.observe(duration, check=key, status=result[1])
+        return result + (duration,)
 
     def __health_types_filter(self, attr_name: Text) -> bool:
         return attr_name.startswith('check_health_')
@@ -29,16 +68,73 @@ class BaseBackend(BaseVstObject):
             if callable(method):
                 yield method_name.replace('check_health_', '', 1), method
 
-    def get(self) -> Tuple[Dict, int]:
+    def get_check_timeout(self, key: Text) -> float:
+        return self.check_timeouts.get(key, self.get_django_settings('HEALTH_CHECK_TIMEOUT', 5))
+
+    def __submit(self, key: Text, method: Callable) -> Future:
+        future = self.__running.get(key)
+        # Hung check is not executed again until previous call is finished.
+        if future is None or future.done():
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(thread_name_prefix='health')
+            future = self.__running[key] = self.__executor.submit(self.__health_method_wrapper, key, method)
+        return future
+
+    def run_checks(self) -> HealthResultType:
+        """
+        Execute all checks concurrently and return results, resulting status and durations of checks.
+        """
         if not self.__health_methods:
             self.__health_methods = dict(self.__get_health_methods_iterator())
-        result, status = {}, st.HTTP_200_OK
-        for key, method in self.__health_methods.items():
-            method_result, method_status = self.__health_method_wrapper(method)
+        start = time.monotonic()
+        futures = {key: self.__submit(key, method) for key, method in self.__health_methods.items()}
+        result, status, durations = {}, st.HTTP_200_OK, {}
+        for key, future in futures.items():
+            wait((future,), timeout=max(self.get_check_timeout(key) - (time.monotonic() - start), 0))
+            if future.done():
+                method_result, method_status, durations[key] = future.result()
+            else:
+                method_result, method_status = 'timeout', st.HTTP_503_SERVICE_UNAVAILABLE
+                durations[key] = time.monotonic() - start
             result[key] = method_result
             if method_status > status:
                 status = method_status
-        return result, status
+        return result, status, durations
+
+    def __refresh(self) -> HealthResultType:
+        try:
+            self.__result = self.run_checks()
+            self.__result_time = time.monotonic()
+            return self.__result
+        finally:
+            self.__refresh_lock.release()
+
+    def get_with_durations(self) -> HealthResultType:
+        """
+        Returns cached checks results with durations of checks in seconds.
+        """
+        cache_timeout = self.get_django_settings('HEALTH_CACHE_TIMEOUT', 0)
+        result = self.__result
+        if cache_timeout and result is not None:
+            if time.monotonic() - self.__result_time >= cache_timeout and self.__refresh_lock.acquire(False):
+                Thread(target=self.__refresh, daemon=True).start()
+            return result
+        self.__refresh_lock.acquire()
+        if cache_timeout and self.__result is not None:
+            # Result was calculated while waiting for lock.
+            self.__refresh_lock.release()
+            return self.__result
+        return self.__refresh()
+
+    def get(self) -> Tuple[Dict, int]:
+        return self.get_with_durations()[:2]
+
+    def get_liveness(self) -> Tuple[Dict, int]:
+        """
+        Cheap check that application process is able to handle requests.
+        Doesn't check any external services.
+        """
+        return {'status': 'ok'}, st.HTTP_200_OK
 
 
 class DefaultBackend(BaseBackend):
@@ -46,15 +142,24 @@ class DefaultBackend(BaseBackend):
         """
         Checking if some database server is unavailable.
         """
-        for db_name in self.get_django_settings('DATABASES', {}).keys():
-            connections[db_name].ensure_connection()
+        def check_connection(db_name):
+            connection = connections[db_name]
+            try:
+                connection.ensure_connection()
+            finally:
+                # Checks are executed in worker threads, so connection is never reused.
+                connection.close()
+
+        _run_parallel(check_connection, self.get_django_settings('DATABASES', {}).keys())
 
     def check_health_cache(self):
         """
         Checking ig some cache server is unavailable.
         """
-        for cache_name in self.get_django_settings('CACHES', {}).keys():
-            self.get_django_cache(cache_name).get('test', 0)
+        _run_parallel(
+            lambda cache_name: self.get_django_cache(cache_name).get('test', 0),
+            self.get_django_settings('CACHES', {}).keys()
+        )
 
     def check_health_rpc(self):
         """
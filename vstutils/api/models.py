@@ -1,7 +1,14 @@
+import os
+import hashlib
+import importlib
+import typing as _t
+from threading import Lock
+
+import orjson
 from django.conf import settings
-from django.utils.module_loading import import_string as import_class
 
 from ..custom_model import ListModel, CharField
+from ..utils import raise_context
 
 
 lib_names = []
@@ -11,29 +18,98 @@ for __attr_name in ['VST_PROJECT', 'VST_PROJECT_LIB_NAME']:
         lib_names.append(__lib_name)
 
 
+def _get_module_mtime(module) -> _t.Optional[float]:
+    try:
+        return os.stat(module.__file__).st_mtime
+    except (AttributeError, TypeError, OSError):  # nocv
+        return None
+
+
+class TranslationBundle:
+    """
+    Merged translations of ``vstutils`` and project libs for one language.
+    Bundles are built once per language on first use and serialized
+    to bytes with content hash, which is used as ETag and version of immutable urls.
+    In debug mode bundle is rebuilt when translation modules are changed.
+    """
+    __slots__ = ('code', 'modules', 'mtimes', 'data', 'content', 'hash')
+
+    _bundles: _t.ClassVar[_t.Dict[_t.Text, 'TranslationBundle']] = {}
+    _lock: _t.ClassVar[Lock] = Lock()
+
+    def __init__(self, code: _t.Text):
+        self.code = code
+        self.modules = [
+            module
+            for module in map(self._get_module, ['vstutils'] + [name for name in lib_names if name != 'vstutils'])
+            if module is not None
+        ]
+        self.mtimes = tuple(map(_get_module_mtime, self.modules))
+        self.data: _t.Dict[_t.Text, _t.Text] = {}
+        for module in self.modules:
+            translation_data = getattr(module, 'TRANSLATION', None)
+            if isinstance(translation_data, dict):
+                self.data.update(translation_data)
+        self.content = orjson.dumps(self.data, option=orjson.OPT_SORT_KEYS)
+        self.hash = hashlib.md5(self.content).hexdigest()  # nosec
+
+    def _get_module(self, lib_name: _t.Text):
+        if not self.code.isidentifier():
+            return None
+        try:
+            return importlib.import_module(f'{lib_name}.translations.{self.code}')
+        except ImportError:
+            return None
+
+    def is_outdated(self) -> bool:
+        return tuple(map(_get_module_mtime, self.modules)) != self.mtimes
+
+    @classmethod
+    def get(cls, code: _t.Text) -> 'TranslationBundle':
+        code = code.replace('-', '_')
+        bundle = cls._bundles.get(code)
+        if bundle is not None and settings.DEBUG and bundle.is_outdated():
+            for module in bundle.modules:
+                with raise_context():
+                    importlib.reload(module)
+            bundle = None
+        if bundle is None:
+            with cls._lock:
+                bundle = cls(code)
+                # Only known languages are stored to avoid growing by arbitrary codes.
+                if code in Language.codes:
+                    cls._bundles[code] = bundle
+        return bundle
+
+
 class Language(ListModel):
     data = [
         {'code': code, 'name': name}
         for code, name in settings.LANGUAGES
     ]
+    codes = frozenset(code.replace('-', '_') for code, _ in settings.LANGUAGES)
     code = CharField(primary_key=True, max_length=5)
     name = CharField(max_length=128)
 
-    def _get_translation_data(self, module_path_string, code):
-        try:
-            translation_data = import_class(module_path_string + '.translations.' + code + '.TRANSLATION')
-            if not isinstance(translation_data, dict):
-                raise Exception
-            return translation_data.copy()
-        except:
-            return {}
+    @property
+    def translations_bundle(self) -> TranslationBundle:
+        return TranslationBundle.get(self.code)
 
     @property
     def translations(self):
-        code = self.code.replace('-', '_')
-        translation_data = self._get_translation_data('vstutils', code)
-        for attr_name in lib_names:
-            translation_data.update(
-                self._get_translation_data(attr_name, code)
-            )
-        return translation_data
+        # Bundle data is shared between requests, so it is copied.
+        return dict(self.translations_bundle.data)
+
+    @property
+    def translations_content(self) -> bytes:
+        """
+        JSON of language with translations (same as detail view) built from serialized bundle.
+        """
+        return b''.join((
+            b'{"code":', orjson.dumps(self.code), b',"name":', orjson.dumps(self.name),
+            b',"translations":', self.translations_bundle.content, b'}',
+        ))
+
+    @property
+    def translations_hash(self) -> _t.Text:
+        return self.translations_bundle.hash
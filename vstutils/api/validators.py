@@ -1,4 +1,5 @@
 import base64
+import threading
 import typing as _t
 import re
 import warnings
@@ -12,6 +13,8 @@ try:
 except ImportError:  # nocv
     has_pillow = False
 
+from django.core.signals import request_finished
+from django.dispatch import receiver
 from rest_framework import serializers
 
 
@@ -43,6 +46,100 @@ class UrlQueryStringValidator(RegularExpressionValidator):
     regexp = re.compile(r'^[^&?=].+=.*$')
 
 
+_image_context_storage = threading.local()
+_not_base64_chars_re = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+class ImageContext:
+    """
+    Lazily decoded image of ``NamedBinaryImageInJsonField`` value, shared by all validators in chain
+    (context is reused while the same value is validated in current thread).
+    Only current thread keeps context, until other value is validated or request is finished,
+    so validators don't hold decoded content between requests.
+
+    :attr:`image` is opened from incrementally decoded header bytes, which is enough
+    for format and size checks. Full content is decoded only by :attr:`content`
+    and :attr:`full_image` for validators that need pixels.
+    """
+    __slots__ = ('source', '_content', '_image', '_full_image')
+
+    # Sizes of decoded header in bytes tried before full decoding.
+    header_sizes: _t.ClassVar[_t.Tuple[int, ...]] = (1024, 16384, 131072)
+
+    def __init__(self, source: _t.Text):
+        self.source = source
+        self._content: _t.Optional[bytes] = None
+        self._image = None
+        self._full_image = None
+
+    @classmethod
+    def get(cls, value: _t.Dict) -> 'ImageContext':
+        content = value['content']
+        context = cls.current()
+        if context is None or context.source is not content:
+            context = _image_context_storage.context = cls(content)
+        return context
+
+    @staticmethod
+    def current() -> _t.Optional['ImageContext']:
+        """
+        Context of value validated last in current thread.
+        """
+        return getattr(_image_context_storage, 'context', None)
+
+    @staticmethod
+    def release() -> None:
+        """
+        Release context of current thread.
+        """
+        _image_context_storage.context = None
+
+    def get_header(self, size: int) -> bytes:
+        """
+        Decode only first ``size`` bytes (rounded up to base64 quantum) of content.
+        """
+        if self._content is not None:
+            return self._content[:size]
+        # Skip non-alphabet characters (line breaks, etc.) like b64decode does.
+        encoded = _not_base64_chars_re.sub('', self.source[:-(-size // 3) * 4 + 128])
+        return base64.b64decode(encoded[:len(encoded) // 4 * 4])[:size]
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = base64.b64decode(self.source)
+        return self._content
+
+    @property
+    def image(self):
+        """
+        Image object with format, mode and size. Pixels may be not available.
+        """
+        if self._image is None:
+            self._image = self._open_header()
+        return self._image
+
+    @property
+    def full_image(self):
+        """
+        Image object opened from full content.
+        """
+        if self._full_image is None:
+            self._full_image = Image.open(BytesIO(self.content))
+        return self._full_image
+
+    def _open_header(self):
+        for size in self.header_sizes:
+            if self._content is not None or len(self.source) <= size * 4 // 3:
+                break
+            try:
+                return Image.open(BytesIO(self.get_header(size)))
+            except (SyntaxError, OSError, ValueError):
+                # Header is too short for format or content isn't plain base64.
+                continue
+        return self.full_image
+
+
 class ImageValidator:
     """
     Base Image Validation class
@@ -86,21 +183,51 @@ class ImageValidator:
         return has_pillow
 
 
+@receiver(request_finished)
+def _release_image_context(*args, **kwargs):
+    ImageContext.release()
+
+
 class ImageOpenValidator(ImageValidator):
     """
-    Image validator that checks if image can be unpacked from b64 to PIL Image obj
+    Image validator that checks if image can be unpacked from b64 to PIL Image obj.
+    Opened image of value validated last in current thread is available as ``img``
+    (decoded from full content on first access) and as ``header_img`` (decoded from header only, without pixels).
 
     Raises rest_framework.exceptions.ValidationError: in case PIL throws error when trying to open given file
     """
     error_msg = 'for some reason, this image file cannot be opened'
 
+    def __init__(self, *args, **kwargs):
+        # Validator is shared between threads, so images are kept per thread.
+        self._images = threading.local()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def img(self):
+        img = getattr(self._images, 'img', None)
+        if img is None:
+            context = ImageContext.current()
+            img = context.full_image if context is not None else None
+        return img
+
+    @img.setter
+    def img(self, value):
+        self._images.img = value
+
+    @property
+    def header_img(self):
+        context = ImageContext.current()
+        return context.image if context is not None else None
+
     def __call__(self, value):
         if not self.has_pillow:
             warnings.warn(self.warning_msg, ImportWarning)
             return
         super().__call__(value)
+        self.img = None
         try:
-            self.img = Image.open(BytesIO(base64.b64decode(value['content'])))
+            ImageContext.get(value).image  # pylint: disable=expression-not-assigned
         except UnidentifiedImageError:
             raise serializers.ValidationError(self.error_msg)
 
@@ -125,7 +252,7 @@ class ImageBaseSizeValidator(ImageOpenValidator):
         for orientation in self.orientation:
             min_value = getattr(self, f'min_{orientation}', 1)
             max_value = getattr(self, f'max_{orientation}', float('inf'))
-            value = getattr(self.img, orientation)
+            value = getattr(self.header_img, orientation)
             if not (min_value <= value <= max_value):
                 raise serializers.ValidationError(f'Invalid image {orientation}. Expected from {min_value}'
                                                   f' to {max_value}, got {value}')
@@ -5,21 +5,26 @@ import json
 
 from django.conf import settings
 from django.db import transaction
-from django.http import Http404
+from django.http import Http404, HttpResponse
+from django.utils.http import parse_etags
 from django.test import Client
 from rest_framework import permissions as rest_permissions, throttling, request as drf_request
 from rest_framework.exceptions import ValidationError, NotFound, UnsupportedMediaType
 
 from . import base, serializers, decorators as deco, responses, models
 from ..utils import Dict, import_class, deprecated
+from .. import metrics
 
 
 class LanguageSerializer(serializers.VSTSerializer):
+    translations_hash = serializers.serializers.CharField(read_only=True)
+
     class Meta:
         model: _t.Type[models.Language] = models.Language
         fields: _t.Tuple = (
             'code',
-            'name'
+            'name',
+            'translations_hash',
         )
 
 
@@ -305,13 +310,54 @@ class HealthThrottle(throttling.AnonRateThrottle):
 
 
 class HealthView(base.ListNonModelViewSet):
+    """
+    Health checks of application services.
+    ``list`` returns the full report (``/api/health/`` and readiness probe ``/api/health/ready/``)
+    with checks durations in `Server-Timing` header and ``live`` is a cheap liveness probe
+    (``/api/health/live/``) which doesn't touch any external service.
+    """
     permission_classes = (rest_permissions.AllowAny,)
     authentication_classes = ()
     throttle_classes = (HealthThrottle,)
     health_backend = import_class(settings.HEALTH_BACKEND_CLASS)()
 
     def list(self, request, *args, **kwargs):
-        return responses.HTTP_200_OK(*self.health_backend.get())
+        result, status, durations = self.health_backend.get_with_durations()
+        return responses.HTTP_200_OK(
+            result,
+            status,
+            timings={f'health_{key}': round(value * 1000, 2) for key, value in durations.items()}
+        )
+
+    def live(self, request, *args, **kwargs):
+        return responses.HTTP_200_OK(*self.health_backend.get_liveness())
+
+
+class HealthProbeView(HealthView):
+    """
+    Health view for load balancers and orchestrators probes, which are not throttled.
+    """
+    throttle_classes = ()
+
+
+class MetricsView(base.ListNonModelViewSet):
+    """
+    Metrics of all application processes in Prometheus text format.
+    Available only for staff users unless ``metrics_public`` is enabled.
+    """
+    schema = None
+    permission_classes = (rest_permissions.IsAdminUser,)
+    registry = metrics.default_registry
+
+    def get_permissions(self):
+        if settings.METRICS_PUBLIC:
+            return [rest_permissions.AllowAny()]
+        return super().get_permissions()
+
+    def list(self, request, *args, **kwargs):
+        if not self.registry.enabled:
+            raise NotFound
+        return HttpResponse(self.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 class LangViewSet(base.ReadOnlyModelViewSet):
@@ -340,3 +386,22 @@ class LangViewSet(base.ReadOnlyModelViewSet):
                 'name': self.kwargs[lookup_url_kwarg],
             }
             return self.model(**obj_kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        bundle = instance.translations_bundle
+        etag = f'"{bundle.hash}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = responses.HTTP_304_NOT_MODIFIED()
+        elif getattr(request, 'is_bulk', False) or request.accepted_renderer.format != 'json':
+            response = responses.HTTP_200_OK(self.get_serializer(instance).data)
+        else:
+            # Translations are already serialized in bundle.
+            response = HttpResponse(instance.translations_content, content_type='application/json')
+        response['ETag'] = etag
+        # Urls with current hash of bundle never change.
+        if request.query_params.get('v') == bundle.hash:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'no-cache'
+        return response
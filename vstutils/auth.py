@@ -96,6 +96,7 @@ class LdapBackend(BaseAuthBackend):  # nocv
         # pylint: disable=protected-access,unused-argument
         if not self.server or not HAS_LDAP:
             return
+        backend = None
         try:
             backend = LDAP(self.server, username, password, self.domain)
             if not backend.isAuth():
@@ -106,6 +107,9 @@ class LdapBackend(BaseAuthBackend):  # nocv
         except:
             logger.debug(traceback.format_exc())
             return
+        finally:
+            if backend is not None:
+                backend.close()
 
 
 class AuthPluginsBackend(BaseAuthBackend):
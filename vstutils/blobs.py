@@ -0,0 +1,142 @@
+"""
+Content-addressed storage of binary files.
+
+Blobs are saved to Django :class:`django.core.files.storage.Storage`
+(``[blobs]`` section of config, local filesystem by default) under the name
+derived from SHA-256 hash of content, so equal files are stored only once.
+Blobs are never removed automatically, because the same blob may be used by many rows.
+
+Urls of blobs are signed and expire in ``BLOB_URL_TIMEOUT`` seconds, so blob of local storage
+is served only to authenticated users which got its url from representation of readable object.
+"""
+import os
+import time
+import hashlib
+import tempfile
+import typing as _t
+from urllib.parse import urlencode
+
+from django.core import signing
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+
+from .utils import BaseVstObject, import_class
+
+
+HASH_NAME = 'sha256'
+CHUNK_SIZE = 64 * 1024
+
+
+def is_blob_hash(value: _t.Any) -> bool:
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+class BlobStorage(BaseVstObject):
+    """
+    Content-addressed blob storage over Django storage.
+
+    :param storage: Django storage instance. Default is built from ``BLOB_STORAGE`` setting.
+    """
+    __slots__ = ('_storage',)
+
+    def __init__(self, storage: _t.Optional[Storage] = None):
+        self._storage = storage
+
+    def __deepcopy__(self, memo):
+        # Storage is shared by copies of serializer fields.
+        return self
+
+    @property
+    def storage(self) -> Storage:
+        if self._storage is None:
+            config = self.get_django_settings('BLOB_STORAGE')
+            self._storage = import_class(config['BACKEND'])(**config.get('OPTIONS', {}))
+        return self._storage
+
+    def get_name(self, blob_hash: _t.Text) -> _t.Text:
+        """
+        Returns name of blob in storage, e.g. ``ab/cd/abcd...``.
+        """
+        if not is_blob_hash(blob_hash):
+            raise ValueError(f'Invalid blob hash: {blob_hash!r}.')
+        return f'{blob_hash[:2]}/{blob_hash[2:4]}/{blob_hash}'
+
+    def exists(self, blob_hash: _t.Text) -> bool:
+        return is_blob_hash(blob_hash) and self.storage.exists(self.get_name(blob_hash))
+
+    def save(self, content: bytes) -> _t.Text:
+        """
+        Save content (if it isn't already stored) and return its hash.
+        """
+        blob_hash = hashlib.new(HASH_NAME, content).hexdigest()
+        name = self.get_name(blob_hash)
+        if not self.storage.exists(name):
+            self.storage.save(name, ContentFile(content))
+        return blob_hash
+
+    def save_file(self, fileobj: _t.BinaryIO) -> _t.Tuple[_t.Text, int]:
+        """
+        Save content of file-like object by chunks (memory usage doesn't depend on file size).
+
+        :return: hash and size of blob.
+        """
+        digest, size = hashlib.new(HASH_NAME), 0
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+            blob_hash = digest.hexdigest()
+            name = self.get_name(blob_hash)
+            if not self.storage.exists(name):
+                tmp.seek(0)
+                self.storage.save(name, File(tmp, name=os.path.basename(name)))
+        return blob_hash, size
+
+    def open(self, blob_hash: _t.Text, mode: _t.Text = 'rb') -> File:
+        return self.storage.open(self.get_name(blob_hash), mode)
+
+    def read(self, blob_hash: _t.Text) -> bytes:
+        with self.open(blob_hash) as blob:
+            return blob.read()
+
+    def size(self, blob_hash: _t.Text) -> int:
+        return self.storage.size(self.get_name(blob_hash))
+
+    def get_signature(self, blob_hash: _t.Text, expires: int) -> _t.Text:
+        return signing.Signer(salt='vstutils.blobs').signature(f'{blob_hash}:{expires}')
+
+    def check_signature(self, blob_hash: _t.Text, expires: _t.Text, signature: _t.Text) -> bool:
+        """
+        Check that url of blob is signed and isn't expired.
+        """
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return signing.constant_time_compare(self.get_signature(blob_hash, int(expires)), signature)
+
+    def url(self, blob_hash: _t.Text) -> _t.Text:
+        """
+        Signed url of blob. Expiration time is rounded, so url of blob is the same
+        for ``BLOB_URL_TIMEOUT`` seconds and could be cached by clients.
+        """
+        timeout = self.get_django_settings('BLOB_URL_TIMEOUT')
+        expires = (int(time.time()) // timeout + 2) * timeout
+        url = self.storage.url(self.get_name(blob_hash))
+        query = urlencode({'expires': expires, 'signature': self.get_signature(blob_hash, expires)})
+        return f'{url}{"&" if "?" in url else "?"}{query}'
+
+    def path(self, blob_hash: _t.Text) -> _t.Optional[_t.Text]:
+        """
+        Local path of blob or ``None`` if storage is not local.
+        """
+        try:
+            return self.storage.path(self.get_name(blob_hash))
+        except NotImplementedError:  # nocv
+            return None
+
+    def delete(self, blob_hash: _t.Text):
+        self.storage.delete(self.get_name(blob_hash))
+
+
+blob_storage = BlobStorage()
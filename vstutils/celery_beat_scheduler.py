@@ -8,12 +8,14 @@ class SingletonDatabaseScheduler(DatabaseScheduler):
     scheduler_lock = None
 
     def tick(self, *args, **kwargs):
+        if self.scheduler_lock is not None and not self.scheduler_lock.extend():
+            # Lock was expired and could be taken by another scheduler.
+            self.scheduler_lock = None
         if self.scheduler_lock is None:
             try:
                 self.scheduler_lock = Lock(Lock.SCHEDULER, timeout=120.0)
             except Lock.AcquireLockException:
                 return 60.0
-        self.scheduler_lock.prolong()
         return super().tick(*args, **kwargs)
 
     def close(self):
@@ -1,5 +1,5 @@
 # pylint: disable=unused-import
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from yaml import load
 try:
@@ -14,6 +14,10 @@ from .tools import get_file_value, multikeysort  # pylint: disable=import-error
 
 
 class Query(dict):
+    """
+    Query of custom models. Filters and ordering are stored as immutable tuples,
+    so clones share them and cloning costs a shallow copy.
+    """
     distinct_fields = False
 
     def __init__(self, queryset, *args, **kwargs):
@@ -41,17 +45,17 @@ class Query(dict):
         return self.clone()
 
     def clone(self):
-        return deepcopy(self)
+        return copy(self)
 
     def _check_data(self, check_type, data):
         # pylint: disable=protected-access
         if getattr(self, 'empty', False):
             return False
-        check_data = self.get(check_type, {})
+        check_data = self.get(check_type, ())
         if check_type == 'exclude' and not check_data:
             return False
         meta = self.model._meta
-        for filter_name, filter_data in check_data.items():
+        for filter_name, filter_data in check_data:
             filter_name = filter_name.replace('__exact', '')
             filter_name__cleared = filter_name.split('__')[0]
             if filter_name__cleared == 'pk':
@@ -77,6 +81,10 @@ class Query(dict):
     def check_in_query(self, data):
         return self._check_data('filter', data) and not self._check_data('exclude', data)
 
+    def add_filter_data(self, check_type, data):
+        # Later values of the same lookups replace previous.
+        self[check_type] = tuple({**dict(self.get(check_type, ())), **data}.items())
+
     def set_empty(self):
         self.empty = True
 
@@ -97,7 +105,7 @@ class Query(dict):
 
     def clear_ordering(self, *args, **kwargs):
         # pylint: disable=unused-argument
-        self['ordering'] = []
+        self['ordering'] = ()
 
     def add_ordering(self, *ordering):
         self['ordering'] = ordering
@@ -111,13 +119,14 @@ class CustomModelIterable(ModelIterable):
         query = queryset.query
         model_data = model._get_data(chunked_fetch=self.chunked_fetch)
         model_data = list(filter(query.check_in_query, model_data))
-        ordering = query.get('ordering', [])
+        ordering = query.get('ordering', ())
+        low = query.get('low_mark', 0)
+        high = query.get('high_mark', None)
         if ordering:
-            model_data = multikeysort(model_data, ordering, not query.standard_ordering)
+            # Only first rows are sorted for sliced queries.
+            model_data = multikeysort(model_data, ordering, not query.standard_ordering, high)
         elif not query.standard_ordering:
             model_data.reverse()
-        low = query.get('low_mark', 0)
-        high = query.get('high_mark', len(model_data))
         for data in model_data[low:high]:
             yield model(**data)
 
@@ -129,6 +138,9 @@ class CustomQuerySet(BQuerySet):
     def __init__(self, model=None, query=None, using=None, hints=None):
         if query is None:
             query = self.custom_query_class(self)
+        elif isinstance(query, Query):
+            # Cloned query is bound to new queryset.
+            query.queryset = self
         super().__init__(model=model, query=query, using=using, hints=hints)
 
     def _filter_or_exclude(self, is_exclude, *args, **kwargs):
@@ -137,8 +149,7 @@ class CustomQuerySet(BQuerySet):
             filter_type = 'exclude'
         else:
             filter_type = 'filter'
-        clone.query[filter_type] = clone.query.get(filter_type, {})
-        clone.query[filter_type].update(kwargs)
+        clone.query.add_filter_data(filter_type, kwargs)
         return clone
 
     def last(self):
@@ -67,8 +67,43 @@ def pwa_context(request: HttpRequest) -> Dict:
     }
 
 
+class RequestMetadata(dict):
+    """
+    Headers of request for templates. Page which reads them depends on request,
+    so it isn't cached by GUI views.
+    """
+    __slots__ = ('request',)
+
+    def __init__(self, request: HttpRequest, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request = request
+
+    def _mark_used(self):
+        self.request.request_metadata_used = True
+
+    def __getitem__(self, key):
+        self._mark_used()
+        return super().__getitem__(key)
+
+    def __iter__(self):
+        self._mark_used()
+        return super().__iter__()
+
+    def get(self, *args):
+        self._mark_used()
+        return super().get(*args)
+
+    def items(self):
+        self._mark_used()
+        return super().items()
+
+    def values(self):
+        self._mark_used()
+        return super().values()
+
+
 @lazy_decorator
 def headers_context(request: HttpRequest) -> Dict:
-    result = dict(request.META)
-    result['HTTP_X_APP'] = result.get('HTTP_X_APP', 'browser')
+    result = RequestMetadata(request, request.META)
+    result.setdefault('HTTP_X_APP', 'browser')
     return {'metadata': result}
@@ -1,4 +1,8 @@
 #  pylint: disable=bad-super-call,unused-argument
+import mimetypes
+import hashlib
+import time
+
 from django.contrib.auth.decorators import login_required
 from django.views.generic.edit import FormView
 from django.views.generic import TemplateView
@@ -7,9 +11,21 @@ from django.contrib.auth import views as auth, login
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse_lazy
+from django.http import FileResponse, Http404, HttpResponse
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.utils import translation
+from django.utils.cache import patch_vary_headers, get_conditional_response
+from django.middleware.csrf import get_token
+from django.contrib.staticfiles.views import serve
+from django.views.generic.base import View
 from jsmin import jsmin
+from htmlmin.middleware import HtmlMinifyMiddleware
 
 from .forms import RegistrationForm
+from .context import gui_version, debug_enabled
+from ..static_files import static_manifest
+from ..blobs import blob_storage
 
 UserModel = get_user_model()
 
@@ -17,8 +33,60 @@ UserModel = get_user_model()
 class BaseView(TemplateView):
     login_required = False
     minify_response = True
+    # Rendered (and minified) content is cached by `get_cache_key_parts`
+    # and served with ETag. Content which uses CSRF token or request metadata isn't cached.
+    cache_response = False
+    cache_timeout = 86400
+    # CSRF cookie is set (or rotated) on every response, even if page is taken from cache.
+    set_csrf_cookie = False
+
+    def get_cache_key_parts(self):
+        return type(self).__name__, gui_version, translation.get_language(), static_manifest.version
+
+    def get_cache_key(self):
+        key = '_'.join(map(str, self.get_cache_key_parts()))
+        return f'{settings.VST_PROJECT}_gui_view_{hashlib.md5(key.encode("utf-8")).hexdigest()}'  # nosec
+
+    def render_to_cache(self, request, *args, **kwargs):
+        # Rendering is tracked to find out if content depends on current request.
+        csrf_used, request.META['CSRF_COOKIE_USED'] = request.META.get('CSRF_COOKIE_USED', False), False
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'render'):  # nocv
+                return None, response
+            response.render()
+            if self.minify_response and 'htmlmin.middleware.HtmlMinifyMiddleware' in settings.MIDDLEWARE:
+                HtmlMinifyMiddleware().process_response(request, response)
+            # Content with token of current session or with headers of request is valid only for this request.
+            if request.META['CSRF_COOKIE_USED'] or getattr(request, 'request_metadata_used', False):
+                return None, response
+        finally:
+            request.META['CSRF_COOKIE_USED'] |= csrf_used
+        content = response.content
+        return (content, response['Content-Type'], f'"{hashlib.md5(content).hexdigest()}"'), response  # nosec
+
+    def get_cached_response(self, request, *args, **kwargs):
+        if self.set_csrf_cookie:
+            get_token(request)
+        cache = caches['default']
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is None:
+            cached, response = self.render_to_cache(request, *args, **kwargs)
+            if cached is None:
+                return response
+            cache.set(key, cached, self.cache_timeout)
+        content, content_type, etag = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response) or response
 
     def dispatch(self, request, *args, **kwargs):
+        if self.cache_response and not debug_enabled and request.method in ('GET', 'HEAD'):
+            response = self.get_cached_response(request, *args, **kwargs)
+            # Content is already minified.
+            response.minify_response = False
+            return response
         response = super().dispatch(request, *args, **kwargs)
         if not self.minify_response:
             response.minify_response = False
@@ -32,8 +100,19 @@ class BaseView(TemplateView):
 
 class GUIView(BaseView):
     login_required = True
+    cache_response = True
+    set_csrf_cookie = True
     template_name = "gui/gui.html"
 
+    def get_cache_key_parts(self):
+        user = self.request.user
+        return super().get_cache_key_parts() + (
+            self.request.build_absolute_uri('/'),
+            user.id,
+            user.is_superuser,
+            user.is_staff,
+        )
+
 
 class OfflineView(BaseView):
     login_required = False
@@ -42,6 +121,7 @@ class OfflineView(BaseView):
 
 class ManifestView(BaseView):
     minify_response = False
+    cache_response = True
     login_required = False
     template_name = "gui/manifest.json"
 
@@ -56,6 +136,7 @@ class JSMinTemplateResponse(TemplateResponse):
 class SWView(BaseView):
     login_required = False
     minify_response = False
+    cache_response = True
     content_type = 'text/javascript'
     template_name = "gui/service-worker.js"
     response_class = JSMinTemplateResponse
@@ -81,3 +162,60 @@ class Registration(FormView, BaseView):
         if settings.AUTHENTICATE_AFTER_REGISTRATION and user.id is not None:
             login(self.request, user)
         return super().form_valid(form)
+
+
+class StaticFilesView(View):
+    """
+    Serves fingerprinted files built by `buildstatic` command.
+    Precompressed variant is selected by `Accept-Encoding` header
+    and files are cached by clients forever.
+    """
+    cache_control = 'public, max-age=31536000, immutable'
+
+    def get_accepted_encodings(self):
+        encodings = set()
+        for item in self.request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            encoding, _, params = item.partition(';')
+            try:
+                if float(params.partition('q=')[2] or 1) <= 0:
+                    continue
+            except ValueError:
+                continue
+            encodings.add(encoding.strip().lower())
+        return encodings
+
+    def get(self, request, path):
+        variants = static_manifest.get_variants(path)
+        if variants is None:
+            if settings.DEBUG:  # nocv
+                return serve(request, path, insecure=True)
+            raise Http404
+        accepted = self.get_accepted_encodings()
+        encoding = next((e for e in variants if e and e in accepted), '')
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(open(variants[encoding], 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Cache-Control'] = self.cache_control
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class BlobView(View):
+    """
+    Serves blobs of local blob storage by signed url to authenticated users.
+    Response is cached by client until url expires.
+    """
+
+    def get(self, request, blob_hash):
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        expires = request.GET.get('expires', '')
+        if not blob_storage.check_signature(blob_hash, expires, request.GET.get('signature', '')):
+            raise Http404
+        if not blob_storage.exists(blob_hash):
+            raise Http404
+        response = FileResponse(blob_storage.open(blob_hash), content_type='application/octet-stream')
+        response['Cache-Control'] = f'private, max-age={max(int(expires) - int(time.time()), 0)}'
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
@@ -1,11 +1,18 @@
-from typing import Text
-from collections import OrderedDict as odict
+from typing import Text, Optional, Dict
+from collections import OrderedDict as odict, deque
+from threading import BoundedSemaphore, Lock
 import traceback
 import logging
+import hashlib
+import hmac
 import json
+import time
 
 import ldap
 from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
 
 
 def json_default(obj):  # nocv
@@ -18,7 +25,124 @@ def json_default(obj):  # nocv
         raise error_obj
 
 
+class PoolExhausted(ldap.LDAPError):
+    pass
+
+
+class LDAPConnectionPool:
+    '''
+    Bounded thread-safe pool of LDAP connections to one server.
+
+    Connections are handed out in LIFO order so the warmest one is reused first.
+    Idle connections older than ``max_idle`` seconds are considered unhealthy
+    and closed on next acquire. Connections failed with ``SERVER_DOWN`` should
+    be returned with :meth:`discard` instead of :meth:`release`.
+    '''
+    __slots__ = (
+        'connection_string',
+        'size',
+        'timeout',
+        'max_idle',
+        '_idle',
+        '_semaphore',
+        '_lock',
+    )
+    _pools: Dict[Text, 'LDAPConnectionPool'] = {}
+    _pools_lock = Lock()
+
+    def __init__(self, connection_string: Text, size: int = 10, timeout: float = 5, max_idle: float = 60):
+        '''
+        :param connection_string: LDAP connection string ('ldap://server')
+        :param size: max count of opened connections to server.
+        :param timeout: seconds to wait free connection when pool is exhausted.
+        :param max_idle: seconds after which idle connection should be reopened.
+        '''
+        self.connection_string = connection_string
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: deque = deque()
+        self._semaphore = BoundedSemaphore(size)
+        self._lock = Lock()
+
+    @classmethod
+    def get(cls, connection_string: Text) -> 'LDAPConnectionPool':
+        '''
+        Get shared pool for server configured by ``LDAP_POOL_*`` settings.
+        '''
+        with cls._pools_lock:
+            if connection_string not in cls._pools:
+                cls._pools[connection_string] = cls(
+                    connection_string,
+                    size=settings.LDAP_POOL_SIZE,
+                    timeout=settings.LDAP_POOL_TIMEOUT,
+                    max_idle=settings.LDAP_POOL_MAX_IDLE,
+                )
+            return cls._pools[connection_string]
+
+    @classmethod
+    def clear_all(cls) -> None:
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.clear()
+            cls._pools.clear()
+
+    def _connect(self):
+        conn = ldap.initialize(self.connection_string)
+        conn.protocol_version = 3
+        conn.set_option(ldap.OPT_REFERRALS, 0)
+        return conn
+
+    def _close(self, conn) -> None:
+        try:
+            conn.unbind_s()
+        except Exception:  # nocv
+            pass
+
+    def acquire(self):
+        '''
+        Get healthy connection from pool or open new one.
+
+        :raises PoolExhausted: when all connections are busy longer than timeout.
+        '''
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise PoolExhausted(f"All {self.size} connections to {self.connection_string} are busy.")
+        deadline = time.monotonic() - self.max_idle
+        with self._lock:
+            while self._idle and self._idle[0][1] < deadline:
+                self._close(self._idle.popleft()[0])
+            if self._idle:
+                return self._idle.pop()[0]
+        try:
+            return self._connect()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def release(self, conn) -> None:
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+        self._semaphore.release()
+
+    def discard(self, conn) -> None:
+        self._close(conn)
+        self._semaphore.release()
+
+    def clear(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop()[0])
+
+
 class LDAP:
+    '''
+    Connection to LDAP server authorized as user.
+
+    Connections are taken from shared :class:`.LDAPConnectionPool` and returned back by :meth:`close`.
+    Results of authorization and groups search are cached for short time in default cache
+    (``LDAP_AUTH_CACHE_TIMEOUT``, ``LDAP_NEGATIVE_AUTH_CACHE_TIMEOUT`` and ``LDAP_GROUP_CACHE_TIMEOUT``).
+    Credentials are never stored in cache, only their HMAC digest salted with ``SECRET_KEY``.
+    '''
     # pylint: disable=no-member
     __slots__ = (
         'settings',
@@ -28,10 +152,15 @@ class LDAP:
         'password',
         'domain',
         '__conn',
+        '__authorized',
+        '__bound',
+        '__pool',
         'user_format',
     )
     fields = ['cn', 'sAMAccountName', 'accountExpires', 'name', 'memberOf']
+    cache_prefix = 'ldap_auth'
     LdapError = ldap.LDAPError
+    PoolExhausted = PoolExhausted
 
     class NotAuth(ldap.INVALID_CREDENTIALS):
         pass
@@ -55,6 +184,10 @@ class LDAP:
         self.connection_string = connection_string
         self.username = username
         self.password = password
+        self.__conn = None
+        self.__authorized: Optional[bool] = None
+        self.__bound = False
+        self.__pool = LDAPConnectionPool.get(connection_string)
         if domain:
             self.domain = domain
         else:
@@ -72,11 +205,54 @@ class LDAP:
         self.auth(self.username, self.password)
 
     def auth(self, username: Text = None, password: Text = None) -> None:
-        self.__conn = self.__authenticate(
-            self.connection_string,
-            str(username or self.username),
-            str(password or self.password)
-        )
+        username = str(username or self.username)
+        password = str(password or self.password)
+        cache_key = self.__cache_key(self.__prepare_user_with_domain(username), password)
+        cached = cache.get(cache_key)
+        metrics.auth_cache.inc(result='miss' if cached is None else 'hit')
+        if cached is None:
+            self.__authorized = self.__authenticate(self.connection_string, username, password)
+            if self.__authorized is not None:
+                timeout = settings.LDAP_AUTH_CACHE_TIMEOUT
+                if not self.__authorized:
+                    timeout = settings.LDAP_NEGATIVE_AUTH_CACHE_TIMEOUT
+                cache.set(cache_key, self.__authorized, timeout)
+        elif cached:
+            # Connection will be bound lazily when it will be really needed.
+            self.username, self.password = username, password
+            self.__authorized, self.__bound = True, False
+            self.logger.debug(f"Successfull login as {username} (cached)")
+        else:
+            self.__authorized = False
+            self.logger.debug("Invalid ldap-creds (cached).")
+
+    def __cache_key(self, *values) -> Text:
+        digest = hmac.new(
+            str(self.settings.SECRET_KEY).encode('utf-8'),
+            '\n'.join((self.connection_string,) + values).encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        return f'{self.cache_prefix}_{digest}'
+
+    def __get_connection(self):
+        if self.__conn is None:
+            self.__conn = self.__pool.acquire()
+        return self.__conn
+
+    def __drop_connection(self) -> None:
+        self.__bound = False
+        if self.__conn is not None:
+            self.__pool.discard(self.__conn)
+            self.__conn = None
+
+    def close(self) -> None:
+        '''
+        Return connection to pool.
+        '''
+        self.__bound = False
+        if self.__conn is not None:
+            self.__pool.release(self.__conn)
+            self.__conn = None
 
     def __prepare_user_with_domain(self, username: Text) -> Text:
         user = str(username).split('@')[0]
@@ -90,24 +266,31 @@ class LDAP:
         self.logger.debug(f'Trying auth in ldap with user "{user}"')
         return user
 
-    def __authenticate(self, ad: Text, username: Text, password: Text) -> ldap.functions.LDAPObject:
+    def __bind(self, user: Text, password: Text) -> None:
+        self.__bound = False
+        try:
+            self.__get_connection().simple_bind_s(user, password)
+        except ldap.SERVER_DOWN:
+            # Pooled connection may be closed by server, so retry once with new one.
+            self.__drop_connection()
+            self.__get_connection().simple_bind_s(user, password)
+        self.__bound = True
+
+    def __authenticate(self, ad: Text, username: Text, password: Text) -> Optional[bool]:
         '''
         Active Directory auth function
 
         :param ad: LDAP connection string ('ldap://server')
         :param username: username with domain ('user@domain.name')
         :param password: auth password
-        :return: ldap connection or None if error
+        :return: auth result or None if error
         '''
         result = None
-        conn = ldap.initialize(ad)
-        conn.protocol_version = 3
-        conn.set_option(ldap.OPT_REFERRALS, 0)
         user = self.__prepare_user_with_domain(username)
         self.logger.debug(f"Trying to auth with user '{user}' to {ad}")
         try:
-            conn.simple_bind_s(user, password)
-            result = conn
+            self.__bind(user, password)
+            result = True
             self.username, self.password = username, password
             self.logger.debug(f"Successfull login as {username}")
         except ldap.INVALID_CREDENTIALS:
@@ -115,11 +298,24 @@ class LDAP:
             self.logger.debug(traceback.format_exc())
             self.logger.debug("Invalid ldap-creds.")
         except Exception as ex:  # nocv
+            self.__drop_connection()
             self.logger.debug(traceback.format_exc())
             self.logger.debug(f"Unknown error: {str(ex)}")
 
         return result
 
+    def __bound_connection(self):
+        if not self.__bound:
+            # Auth result was taken from cache.
+            user = self.__prepare_user_with_domain(self.username)
+            try:
+                self.__bind(user, self.password)
+            except ldap.INVALID_CREDENTIALS:
+                cache.delete(self.__cache_key(user, self.password))
+                self.__authorized = False
+                raise self.NotAuth("Invalid auth.")
+        return self.__conn
+
     def __get_user_data(self):
         data_list = self.username.split("@")
         if len(data_list) < 2:
@@ -139,9 +335,7 @@ class LDAP:
         Indicates that object auth worked
         :return: True or False
         '''
-        if isinstance(self.__conn, ldap.ldapobject.LDAPObject) or self.__conn:
-            return True
-        return False
+        return bool(self.__authorized)
 
     def __ldap_filter(self, *filters):
         dc_list = [f"dc={i}" for i in self.domain_name.split('.') if i]
@@ -153,17 +347,30 @@ class LDAP:
         )
         return base_dn, ldap.SCOPE_SUBTREE, s_filter, self.fields
 
+    def __search(self, *args):
+        try:
+            return self.__bound_connection().search_s(*args)
+        except ldap.SERVER_DOWN:  # nocv
+            self.__drop_connection()
+            return self.__bound_connection().search_s(*args)
+
     def group_list(self, *args) -> Text:
         if not self.isAuth():
             raise self.NotAuth("Invalid auth.")
+        cache_key = self.__cache_key('groups', self.domain_user, self.domain_name, *args)
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
         try:
             data = {
-                k: v for k, v in self.__conn.search_s(*self.__ldap_filter(*args)) if k
+                k: v for k, v in self.__search(*self.__ldap_filter(*args)) if k
             }
-            return json.dumps(data, indent=4, ensure_ascii=False, default=json_default)
+            result = json.dumps(data, indent=4, ensure_ascii=False, default=json_default)
         except Exception:  # nocv
             self.logger.debug(traceback.format_exc())
             raise
+        cache.set(cache_key, result, settings.LDAP_GROUP_CACHE_TIMEOUT)
+        return result
 
     def __repr__(self):  # nocv
         return str(self)
@@ -176,5 +383,5 @@ class LDAP:
         return f'[ {msg} {self.connection_string} -> {self.username} ]'
 
     def __del__(self):
-        if isinstance(getattr(self, '__conn', None), ldap.ldapobject.LDAPObject):
-            self.__conn.unbind_s()  # nocv
+        if getattr(self, '_LDAP__conn', None) is not None:
+            self.close()
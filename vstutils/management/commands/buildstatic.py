@@ -0,0 +1,47 @@
+import shutil
+
+from ._base import BaseCommand
+from ...static_files import build_static
+
+
+class Command(BaseCommand):
+    help = "Build fingerprinted and precompressed static files with manifest."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--output', '-o',
+            default=None,
+            dest='output', help='Directory for built files. Default is STATIC_BUILD_DIR setting.',
+        )
+        parser.add_argument(
+            '--min-size',
+            default=None, type=int,
+            dest='min_size', help='Minimal size of file in bytes to be compressed.',
+        )
+        parser.add_argument(
+            '--no-compress',
+            action='store_false', default=True,
+            dest='compress', help='Do not write compressed files.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true', default=False,
+            dest='clear', help='Remove previously built files.',
+        )
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        output = options['output'] or self._settings('STATIC_BUILD_DIR')
+        if options['clear']:
+            shutil.rmtree(output, ignore_errors=True)
+        manifest = build_static(
+            self._settings('STATIC_FILES_FOLDERS'),
+            output,
+            min_size=self._settings('STATIC_COMPRESS_MIN_SIZE') if options['min_size'] is None else options['min_size'],
+            compress=options['compress'],
+        )
+        self._print(
+            f'Built {len(manifest["files"])} files ({len(manifest["encodings"])} compressed) to {output}.',
+            'SUCCESS'
+        )
@@ -0,0 +1,73 @@
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS
+
+from ._base import BaseCommand
+from ...api.filters import DefaultNameFilter
+from ...custom_model import ListModel
+from ...models.base import ModelBaseClass
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Create indexes for search by name in models which have `name` in filterset."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            dest='database', help='Database alias to create indexes in.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true', default=False,
+            dest='dry_run', help='Print SQL statements without executing.',
+        )
+
+    def get_models(self):
+        result = {}
+        for model in apps.get_models():
+            if not isinstance(model, ModelBaseClass) or model._meta.proxy or not model._meta.managed:
+                continue
+            if issubclass(model, ListModel):
+                # Custom models have no tables.
+                continue
+            filterset_class = getattr(model.generated_view, 'filterset_class', None)
+            if filterset_class is not None and issubclass(filterset_class, DefaultNameFilter):
+                result.setdefault(model._meta.db_table, model)
+        return result.values()
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        backend = get_search_backend(options['database'])
+        backend.clear_cache()
+        fields = {}
+        for model in self.get_models():
+            field = backend.get_search_field(model, 'name')
+            if field is None:
+                self._print(f'Skip {model._meta.label}.name: search index is not supported.', 'WARNING')
+                continue
+            # Inherited field is indexed in table of parent model.
+            fields.setdefault((field.model._meta.db_table, field.column), field)
+        failed = []
+        for field in fields.values():
+            label = f'{field.model._meta.label}.name'
+            try:
+                self.create_index(backend, field, label, options['dry_run'])
+            except Exception as err:
+                failed.append(label)
+                self._print(f'Failed to create search index for {label}: {err}', 'ERROR')
+        if failed:
+            raise self.CommandError(f'Search indexes are not created for: {", ".join(failed)}.')
+
+    def create_index(self, backend, field, label, dry_run):
+        model = field.model
+        if not backend.is_supported(model, field):
+            self._print(f'Skip {label}: search index is not supported.', 'WARNING')
+        elif backend.index_exists(model, field):
+            self._print(f'Skip {label}: search index already exists.')
+        elif dry_run:
+            self._print(';\n'.join(backend.get_index_sql(model, field)) + ';')
+        else:
+            backend.create_index(model, field)
+            self._print(f'Created search index for {label}.', 'SUCCESS')
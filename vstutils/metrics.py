@@ -0,0 +1,305 @@
+"""
+Built-in metrics in `Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`_.
+
+Every worker process collects metrics in memory and periodically flushes
+a snapshot of them to the cache (web workers after requests, celery workers
+after tasks, and every process at exit). The ``/api/metrics/`` view merges snapshots
+of all workers (e.g. uwsgi processes on all nodes using the same cache),
+so any worker can be scraped.
+"""
+import os
+import time
+import atexit
+import socket
+import typing as _t
+from threading import Lock as ThreadLock
+
+try:
+    from celery.signals import task_postrun
+except ImportError:  # nocv
+    task_postrun = None
+
+from .utils import BaseVstObject, Lock, raise_context
+
+
+LabelsType = _t.Tuple[_t.Text, ...]
+DEFAULT_BUCKETS: _t.Tuple[float, ...] = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def _escape(value: _t.Any) -> _t.Text:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> _t.Text:
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base metric class. Metrics are registered in :class:`MetricsRegistry`
+    and values are stored by labels values tuple.
+    """
+    __slots__ = ('name', 'documentation', 'labelnames', 'registry')
+
+    metric_type: _t.ClassVar[_t.Text] = 'untyped'
+
+    def __init__(self, name: _t.Text, documentation: _t.Text, labelnames: _t.Sequence[_t.Text] = (),
+                 registry: 'MetricsRegistry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or default_registry
+        self.registry.register(self)
+
+    def _labels(self, labels: _t.Dict[_t.Text, _t.Any]) -> LabelsType:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def empty_value(self) -> _t.Any:
+        return 0.0
+
+    def merge(self, first: _t.Any, second: _t.Any) -> _t.Any:
+        return first + second
+
+    def samples(self, labels: LabelsType, value: _t.Any) -> _t.Iterable[_t.Tuple[_t.Text, LabelsType, float]]:
+        yield self.name, labels, value
+
+    def render(self, values: _t.Dict[LabelsType, _t.Any]) -> _t.Iterable[_t.Text]:
+        yield f'# HELP {self.name} {_escape(self.documentation)}'
+        yield f'# TYPE {self.name} {self.metric_type}'
+        for labels in sorted(values):
+            for name, sample_labels, value in self.samples(labels, values[labels]):
+                names = self.labelnames + ('le',) * (len(sample_labels) - len(labels))
+                labels_str = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(names, sample_labels))
+                if labels_str:
+                    name = f'{name}{{{labels_str}}}'
+                yield f'{name} {_format_value(value)}'
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter.
+    """
+    __slots__ = ()
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry.update(self, self._labels(labels), amount)
+
+
+class Histogram(Metric):
+    """
+    Histogram of observed values with cumulative buckets, sum and count.
+    """
+    __slots__ = ('buckets',)
+    metric_type = 'histogram'
+
+    def __init__(self, *args, buckets: _t.Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    def empty_value(self) -> _t.List[float]:
+        # Buckets counters, sum and count.
+        return [0.0] * (len(self.buckets) + 2)
+
+    def merge(self, first: _t.List[float], second: _t.List[float]) -> _t.List[float]:
+        return [a + b for a, b in zip(first, second)]
+
+    def observe(self, value: float, **labels):
+        self.registry.update(self, self._labels(labels), value)
+
+    def add_observation(self, current: _t.List[float], value: float):
+        for num, bound in enumerate(self.buckets):
+            if value <= bound:
+                current[num] += 1
+                break
+        current[-2] += value
+        current[-1] += 1
+
+    def samples(self, labels: LabelsType, value: _t.List[float]):
+        cumulative = 0.0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            yield f'{self.name}_bucket', labels + (_format_value(bound),), cumulative
+        yield f'{self.name}_bucket', labels + ('+Inf',), value[-1]
+        yield f'{self.name}_sum', labels, value[-2]
+        yield f'{self.name}_count', labels, value[-1]
+
+
+class MetricsRegistry(BaseVstObject):
+    """
+    Storage of process metrics. Flushes process snapshot to the cache
+    every ``METRICS_FLUSH_INTERVAL`` seconds and merges snapshots of all
+    processes on :meth:`collect`.
+    """
+    __slots__ = ('metrics', 'values', '_lock', '_last_flush', '_indexed')
+
+    def __init__(self):
+        self.metrics: _t.Dict[_t.Text, Metric] = {}
+        self.values: _t.Dict[_t.Text, _t.Dict[LabelsType, _t.Any]] = {}
+        self._lock = ThreadLock()
+        self._last_flush = time.monotonic()
+        self._indexed = None
+        atexit.register(self.flush_at_exit)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.get_django_settings('METRICS_ENABLED', False))
+
+    @property
+    def cache(self):
+        return self.get_django_cache(self.get_django_settings('METRICS_CACHE', 'default'))
+
+    @property
+    def prefix(self) -> _t.Text:
+        return f"{self.get_django_settings('VST_PROJECT_LIB')}_metrics_"
+
+    @property
+    def index_key(self) -> _t.Text:
+        return f'{self.prefix}index'
+
+    @property
+    def process_key(self) -> _t.Text:
+        return f'{self.prefix}{socket.gethostname()}_{os.getpid()}'
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+
+    def update(self, metric: Metric, labels: LabelsType, value: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            values = self.values[metric.name]
+            if isinstance(metric, Histogram):
+                current = values.get(labels)
+                if current is None:
+                    current = values[labels] = metric.empty_value()
+                metric.add_observation(current, value)
+            else:
+                values[labels] = values.get(labels, 0.0) + value
+
+    def snapshot(self) -> _t.Dict[_t.Text, _t.Dict[LabelsType, _t.Any]]:
+        with self._lock:
+            return {
+                name: {labels: list(value) if isinstance(value, list) else value for labels, value in values.items()}
+                for name, values in self.values.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            for values in self.values.values():
+                values.clear()
+
+    def _update_index(self, add: _t.Iterable[_t.Text] = (), remove: _t.Iterable[_t.Text] = ()):
+        with Lock(self.index_key, repeat=5, timeout=10):
+            index = set(self.cache.get(self.index_key) or ())
+            index.update(add)
+            index.difference_update(remove)
+            self.cache.set(self.index_key, sorted(index), None)
+
+    def flush(self):
+        """
+        Store current process snapshot to the cache.
+        """
+        self._last_flush = time.monotonic()
+        process_key = self.process_key
+        self.cache.set(process_key, self.snapshot(), self.get_django_settings('METRICS_TTL'))
+        if self._indexed != process_key or process_key not in (self.cache.get(self.index_key) or ()):
+            self._update_index(add=(process_key,))
+            self._indexed = process_key
+
+    def maybe_flush(self):
+        if self.enabled and time.monotonic() - self._last_flush >= self.get_django_settings('METRICS_FLUSH_INTERVAL'):
+            self.flush()
+
+    def flush_at_exit(self):
+        """
+        Store metrics collected since last flush (e.g. by management command) before process exit.
+        """
+        if self.enabled and any(self.values.values()):
+            with raise_context():
+                self.flush()
+
+    def collect(self) -> _t.Dict[_t.Text, _t.Dict[LabelsType, _t.Any]]:
+        """
+        Merge snapshots of all processes.
+        """
+        self.flush()
+        keys = self.cache.get(self.index_key) or ()
+        snapshots = self.cache.get_many(keys)
+        expired = set(keys) - set(snapshots)
+        if expired:
+            self._update_index(remove=expired)
+        result: _t.Dict[_t.Text, _t.Dict[LabelsType, _t.Any]] = {name: {} for name in self.metrics}
+        for snapshot in snapshots.values():
+            for name, values in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:  # nocv
+                    continue
+                merged = result[name]
+                for labels, value in values.items():
+                    merged[labels] = metric.merge(merged.get(labels, metric.empty_value()), value)
+        return result
+
+    def render(self) -> _t.Text:
+        """
+        Render merged metrics in Prometheus text format.
+        """
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.extend(metric.render(collected[name]))
+        return '\n'.join(lines) + '\n'
+
+
+default_registry = MetricsRegistry()
+
+
+def _flush_after_task(*args, **kwargs):
+    default_registry.maybe_flush()
+
+
+if task_postrun is not None:
+    # Celery workers don't handle requests, so metrics are flushed after tasks.
+    task_postrun.connect(_flush_after_task, weak=False)
+
+http_request_duration = Histogram(
+    'vstutils_http_request_duration_seconds',
+    'HTTP request latency by view.',
+    ('method', 'view', 'status'),
+)
+db_execution_time = Counter(
+    'vstutils_db_execution_seconds_total',
+    'Time spent in database queries by view.',
+    ('view',),
+)
+db_queries = Counter(
+    'vstutils_db_queries_total',
+    'Number of database queries by view.',
+    ('view',),
+)
+bulk_operations = Counter(
+    'vstutils_bulk_operations_total',
+    'Number of bulk operations by method and status.',
+    ('method', 'status'),
+)
+bulk_operation_duration = Histogram(
+    'vstutils_bulk_operation_duration_seconds',
+    'Bulk operation latency by method.',
+    ('method',),
+)
+auth_cache = Counter(
+    'vstutils_auth_cache_total',
+    'LDAP authentication cache lookups by result (hit or miss).',
+    ('result',),
+)
+lock_wait_time = Histogram(
+    'vstutils_lock_wait_seconds',
+    'Time spent waiting for locks by lock class and result.',
+    ('kind', 'result'),
+)
+health_check_duration = Histogram(
+    'vstutils_health_check_duration_seconds',
+    'Health checks durations by check and status.',
+    ('check', 'status'),
+)
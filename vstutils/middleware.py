@@ -1,4 +1,6 @@
 import time
+import json
+import random
 import logging
 import typing as _t
 
@@ -8,24 +10,19 @@ from django.http.request import HttpRequest
 from django.http.response import HttpResponse
 
 from .utils import BaseVstObject
+from .profiling import (  # noqa: F401
+    QueryTimingLogger,
+    RequestProfiler,
+    get_request_profiler,
+    profile_section,
+    _profiler_storage,
+)
+from . import metrics
 
 
 logger = logging.getLogger(settings.VST_PROJECT)
 
 
-class QueryTimingLogger:
-
-    def __init__(self):
-        self.queries_time = 0
-
-    def __call__(self, execute, sql, params, many, context):
-        start = time.time()
-        try:
-            return execute(sql, params, many, context)
-        finally:
-            self.queries_time += time.time() - start
-
-
 class BaseMiddleware(BaseVstObject):
     """
     Middleware base class for handling:
@@ -153,27 +150,78 @@ class ExecuteTimeHeadersMiddleware(BaseMiddleware):
     def _round_time(self, seconds: _t.Union[int, float]):
         return round(seconds * 1000, 2)
 
+    def _get_profiler(self) -> _t.Optional[RequestProfiler]:
+        if not self.get_setting('REQUEST_PROFILING'):
+            return None
+        sample_rate = self.get_setting('REQUEST_PROFILING_SAMPLE_RATE')
+        if sample_rate < 1 and random.random() >= sample_rate:  # nosec
+            return None
+        return RequestProfiler(self.get_setting('REQUEST_PROFILING_SLOW_QUERIES'))
+
+    def _observe_metrics(self, request: HttpRequest, response: HttpResponse, duration: float, ql: QueryTimingLogger):
+        registry = metrics.default_registry
+        if not registry.enabled:
+            return
+        view = getattr(getattr(request, 'resolver_match', None), 'view_name', None) or 'unknown'
+        metrics.http_request_duration.observe(duration, method=request.method, view=view, status=response.status_code)
+        metrics.db_execution_time.inc(ql.queries_time, view=view)
+        metrics.db_queries.inc(ql.queries_count, view=view)
+        registry.maybe_flush()
+
+    def process_template_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        # pylint: disable=unused-argument
+        profiler = get_request_profiler()
+        if profiler is not None:
+            start = profiler.section_start('render')
+            response.add_post_render_callback(lambda r: profiler.section_stop('render', start))  # type: ignore
+        return response
+
     def get_response_handler(self, request: HttpRequest) -> HttpResponse:
         start_time = time.time()
         get_response_handler = super().get_response_handler
-        ql = QueryTimingLogger()
+        is_bulk = getattr(request, 'is_bulk', False)
+        profiler = self._get_profiler()
+        ql = profiler or QueryTimingLogger()
+        parent_profiler, _profiler_storage.profiler = get_request_profiler(), profiler
 
-        if not getattr(request, 'is_bulk', False):
-            with connection.execute_wrapper(ql):
+        try:
+            # Bulk sub-requests in worker threads use their own connections,
+            # so they have to be wrapped separately from the parent request.
+            if not is_bulk or profiler is not None:
+                with connection.execute_wrapper(ql):
+                    response = get_response_handler(request)
+            else:
                 response = get_response_handler(request)
-        else:
-            response = get_response_handler(request)
+        finally:
+            _profiler_storage.profiler = parent_profiler
 
         response_durations = getattr(response, 'timings', None)  # type: ignore
-        total_time = self._round_time(time.time() - start_time)
+        duration = time.time() - start_time
+        total_time = self._round_time(duration)
+        if not is_bulk:
+            self._observe_metrics(request, response, duration, ql)
 
-        if getattr(request, 'is_bulk', False):
+        if is_bulk:
             response['Response-Time'] = str(total_time)
-        else:
-            if response_durations:
-                response_durations = f', {", ".join(map(self.__duration_handler, response_durations.items()))}'
-            else:
-                response_durations = ""
-            response_durations += f', db_execution_time;dur={self._round_time(ql.queries_time)}'
-            response['Server-Timing'] = f'total;dur={total_time}{response_durations or ""}'
+            if profiler is None:
+                return response
+
+        response_durations = dict(response_durations or {})
+        if profiler is not None:
+            with_sql = settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False)
+            response_durations.update(profiler.get_timings(self._round_time, with_sql))
+            if self.get_setting('REQUEST_PROFILING_LOG'):
+                self.logger.info('Request profile: %s', json.dumps({
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'total': total_time,
+                    'bulk': is_bulk,
+                    **profiler.as_dict(),
+                }, default=str))
+        response_durations['db_execution_time'] = self._round_time(ql.queries_time)
+        response['Server-Timing'] = ', '.join(map(
+            self.__duration_handler,
+            (('total', total_time), *response_durations.items())
+        ))
         return response
@@ -135,6 +135,8 @@ class BModel(BaseModel):
         - ``_override_permission_classes`` - boolean flag indicates that ``_permission_classes`` override default
           viewset (otherwise appends). Default is ``False``.
         - ``_copy_attrs`` - list of model-instance attributes indicates that object is copiable with this attrs.
+          Keys are attributes of :class:`vstutils.api.base.CopyMixin` without ``copy_`` prefix
+          (e.g. ``related`` or ``children`` for deep copy of subtree).
         - ``_nested`` - key-value mapping with nested views (key - nested name,
           kwargs for :class:`vstutils.api.decorators.nested_view` decorator but supports
           ``model`` attribute as nested). ``model`` can be string for import.
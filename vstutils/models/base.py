@@ -6,6 +6,7 @@ from django_filters import rest_framework as filters, filterset
 from django.db.models.base import ModelBase
 from django.db.models.fields.related import ManyToManyField, OneToOneField
 from django.utils.functional import SimpleLazyObject
+from rest_framework.mixins import UpdateModelMixin
 
 from ..utils import import_class, apply_decorators, classproperty, get_if_lazy
 from ..api import (
@@ -271,6 +272,12 @@ class ModelBaseClass(ModelBase, metaclass=classproperty.meta):
             view_attributes.update(map(lambda r: (f'copy_{r[0]}', r[1]), metadata['copy_attrs'].items()))
             view_class.append(api_base.CopyMixin)
 
+        if api_base.BinaryFilesMixin.has_binary_file_fields(serializers['serializer_class_one']):
+            if any(issubclass(v, UpdateModelMixin) for v in view_class):
+                view_class.append(api_base.UploadBinaryFilesMixin)
+            else:
+                view_class.append(api_base.BinaryFilesMixin)
+
         filterset_fields = metadata['filterset_fields']
         if filterset_fields == 'serializer':
             filterset_fields = serializers['serializer_class'].Meta.fields
@@ -1,7 +1,69 @@
 # pylint: disable=no-member,no-classmethod-decorator,protected-access
-from django.db import models
+import pickle  # nosec
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from ..utils import Paginator
+from django.apps import apps
+from django.db import models, connections
+from django.db.transaction import TransactionManagementError
+
+from ..utils import Paginator, KeysetPaginator, ProgressExchanger
+
+
+logger = logging.getLogger('vstutils')
+
+
+def process_chunk(queryset, func, first, last, progress_key=None, close_connections=True):
+    """
+    Apply ``func`` to every object of ``queryset`` with primary key in ``[first, last]`` range.
+    Returns list of results and dict of errors by primary key.
+    """
+    results, errors = [], {}
+    try:
+        for obj in queryset.filter(pk__gte=first, pk__lte=last).order_by('pk'):
+            try:
+                results.append(func(obj))
+            except Exception as err:  # pylint: disable=broad-except
+                logger.debug(traceback.format_exc())
+                errors[obj.pk] = f'{err.__class__.__name__}: {err}'
+    finally:
+        if close_connections:
+            # Workers have own connections, which must not be left open.
+            connections.close_all()
+    if progress_key is not None:
+        ProgressExchanger(progress_key).add(done=len(results), failed=len(errors))
+    return results, errors
+
+
+def process_query_chunk(query, model_label, func, first, last, progress_key=None, close_connections=True):
+    """
+    Same as :func:`process_chunk` but queryset is built from pickled query of model with ``model_label``.
+    Pickled query is much smaller than queryset, which is pickled with all its rows.
+    """
+    queryset = apps.get_model(model_label)._default_manager.all()
+    queryset.query = pickle.loads(query)  # nosec
+    return process_chunk(queryset, func, first, last, progress_key, close_connections)
+
+
+class ParallelResult:
+    """
+    Aggregated result of :meth:`BQuerySet.parallel_map`.
+
+    :ivar results: results of function calls in order of primary keys.
+    :ivar errors: errors messages by primary keys of failed objects.
+    :ivar tasks: ids of sent celery tasks (for ``backend='celery'``).
+    """
+    __slots__ = ('results', 'errors', 'tasks')
+
+    def __init__(self):
+        self.results = []
+        self.errors = {}
+        self.tasks = []
+
+    def add(self, results, errors):
+        self.results.extend(results)
+        self.errors.update(errors)
 
 
 class BQuerySet(models.QuerySet):
@@ -33,12 +95,101 @@ class BQuerySet(models.QuerySet):
         """
         Returns paginated data with custom Paginator-class.
         By default, uses `PAGE_LIMIT` from global settings.
+        Use ``strategy='keyset'`` for iterating over big tables
+        with :class:`vstutils.utils.KeysetPaginator`.
         """
         return self.get_paginator(*args, **kwargs).items()
 
-    def get_paginator(self, *args, **kwargs):
+    def get_paginator(self, *args, strategy='offset', **kwargs):
+        if strategy == 'keyset':
+            return KeysetPaginator(self.filter(), *args, **kwargs)
         return Paginator(self.filter(), *args, **kwargs)
 
+    def get_pk_ranges(self, chunk_size=None):
+        """
+        Split queryset to ranges of primary keys with ``chunk_size`` objects in every range.
+        Uses only primary key index without ``OFFSET`` queries.
+
+        :return: list of ``(first_pk, last_pk, count)`` tuples.
+        """
+        attname = self.model._meta.pk.attname
+        return [
+            (chunk[0][attname], chunk[-1][attname], len(chunk))
+            for chunk in KeysetPaginator(self.values(attname), chunk_size)
+        ]
+
+    def _in_transaction(self):
+        return connections[self.db].in_atomic_block
+
+    @staticmethod
+    def _in_any_transaction():
+        return any(connection.in_atomic_block for connection in connections.all())
+
+    def parallel_map(self, func, chunk_size=None, workers=None, backend='thread', progress_key=None):
+        """
+        Apply ``func`` to every object of queryset in parallel chunks split by primary key ranges.
+
+        :param func: function which receives model instance. For ``process`` and ``celery``
+                     backends it must be importable module-level function.
+        :param chunk_size: count of objects in chunk. By default, uses `PAGE_LIMIT` from global settings.
+        :param workers: count of threads or processes.
+        :param backend: ``thread``, ``process`` or ``celery`` (chunks are sent as tasks
+                        and processed by celery workers, results are not collected).
+        :param progress_key: key of :class:`vstutils.utils.ProgressExchanger` for progress reporting.
+        :rtype: ParallelResult
+
+        Threads and processes use their own database connections, so they can't see uncommitted changes.
+        Therefore, inside transactions chunks are processed in current thread.
+        ``process`` backend closes connections before fork, so it raises
+        :class:`django.db.TransactionManagementError` inside transaction.
+
+        Example:
+            .. sourcecode:: python
+
+                result = Host.objects.filter(kind='vm').parallel_map(refresh_host, chunk_size=500, workers=8)
+                failed_hosts = result.errors
+        """
+        if backend == 'process' and self._in_any_transaction():
+            raise TransactionManagementError('Process backend could not be used inside transaction.')
+        queryset = self.filter()
+        ranges = queryset.get_pk_ranges(chunk_size)
+        if progress_key is not None:
+            ProgressExchanger(progress_key).start(total=sum(count for _, _, count in ranges))
+        result = ParallelResult()
+
+        if backend == 'celery':
+            from ..tasks import ProcessQuerySetChunk  # pylint: disable=import-outside-toplevel
+            for first, last, _ in ranges:
+                result.tasks.append(ProcessQuerySetChunk.send(queryset, func, first, last, progress_key).id)
+            return result
+
+        if len(ranges) <= 1 or workers == 1 or self._in_transaction():
+            for first, last, _ in ranges:
+                result.add(*process_chunk(queryset, func, first, last, progress_key, close_connections=False))
+            return result
+
+        if backend == 'process':
+            # Forked processes must not share connections with parent.
+            connections.close_all()
+            # Queryset is pickled with all rows, so workers get only query.
+            query, model_label = pickle.dumps(queryset.query), queryset.model._meta.label
+            with ProcessPoolExecutor(workers) as executor:
+                futures = [
+                    executor.submit(process_query_chunk, query, model_label, func, first, last, progress_key)
+                    for first, last, _ in ranges
+                ]
+                for future in futures:
+                    result.add(*future.result())
+            return result
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(process_chunk, queryset, func, first, last, progress_key)
+                for first, last, _ in ranges
+            ]
+            for future in futures:
+                result.add(*future.result())
+        return result
+
     def cleared(self):
         """
         Filter queryset for models with attribute 'hidden' and
@@ -1,16 +1,45 @@
 import typing as _t
 from django.db import models
-from ..utils import Paginator
+from ..utils import Paginator, KeysetPaginator
+
+
+def process_chunk(queryset: models.QuerySet,
+                  func: _t.Callable,
+                  first: _t.Any,
+                  last: _t.Any,
+                  progress_key: _t.Optional[_t.Text] = ...,
+                  close_connections: bool = ...) -> _t.Tuple[_t.List, _t.Dict[_t.Any, _t.Text]]:
+    ...
+
+
+class ParallelResult:
+    results: _t.List
+    errors: _t.Dict[_t.Any, _t.Text]
+    tasks: _t.List[_t.Text]
+
+    def add(self, results: _t.List, errors: _t.Dict[_t.Any, _t.Text]) -> None:
+        ...
 
 
 class BQuerySet(models.QuerySet):
     use_for_related_fields: _t.ClassVar[bool] = True
     custom_iterable_class: _t.ClassVar[_t.Any]
 
-    def paged(self, *args, **kwargs) -> _t.Iterable:
+    def paged(self, *args, strategy: _t.Text = ..., **kwargs) -> _t.Iterable:
+        ...
+
+    def get_paginator(self, *args, strategy: _t.Text = ..., **kwargs) -> _t.Union[Paginator, KeysetPaginator]:
+        ...
+
+    def get_pk_ranges(self, chunk_size: _t.Optional[int] = ...) -> _t.List[_t.Tuple[_t.Any, _t.Any, int]]:
         ...
 
-    def get_paginator(self, *args, **kwargs) -> Paginator:
+    def parallel_map(self,
+                     func: _t.Callable,
+                     chunk_size: _t.Optional[int] = ...,
+                     workers: _t.Optional[int] = ...,
+                     backend: _t.Text = ...,
+                     progress_key: _t.Optional[_t.Text] = ...) -> ParallelResult:
         ...
 
     def cleared(self) -> BQuerySet:
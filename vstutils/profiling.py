@@ -0,0 +1,149 @@
+"""
+Profiling of handled requests: SQL queries and named sections of request handling.
+Profiler is activated by middleware for sampled requests when ``request_profiling`` is enabled.
+"""
+import re
+import time
+import heapq
+import typing as _t
+from collections import Counter
+from threading import local
+
+
+class QueryTimingLogger:
+
+    def __init__(self):
+        self.queries_time = 0
+        self.queries_count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries_count += 1
+            self.handle_query(sql, time.time() - start)
+
+    def handle_query(self, sql: _t.Text, duration: float):
+        self.queries_time += duration
+
+
+class RequestProfiler(QueryTimingLogger):
+    """
+    Query logger which additionally collects per-request profile:
+    query fingerprints (to detect N+1 patterns), the slowest statements
+    and time spent in named sections like serialization and rendering.
+    Active profiler is available through :func:`get_request_profiler`.
+    """
+    in_list_regex = re.compile(r'IN \((?:%s, )*%s\)')
+    spaces_regex = re.compile(r'\s+')
+
+    def __init__(self, slow_limit: int = 3):
+        super().__init__()
+        self.fingerprints: _t.Counter[_t.Text] = Counter()
+        self.slowest: _t.List[_t.Tuple[float, _t.Text]] = []
+        self.slow_limit = slow_limit
+        self.sections: _t.Dict[_t.Text, float] = {}
+        self._depth: _t.Dict[_t.Text, int] = {}
+
+    def fingerprint(self, sql: _t.Text) -> _t.Text:
+        if 'IN (' in sql:
+            sql = self.in_list_regex.sub('IN (...)', sql)
+        return sql
+
+    def handle_query(self, sql: _t.Text, duration: float):
+        super().handle_query(sql, duration)
+        self.fingerprints[self.fingerprint(sql)] += 1
+        if self.slow_limit <= 0:
+            return
+        if len(self.slowest) < self.slow_limit:
+            heapq.heappush(self.slowest, (duration, sql))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, sql))
+
+    @property
+    def duplicates(self) -> _t.List[_t.Tuple[_t.Text, int]]:
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+    def section_start(self, name: _t.Text) -> _t.Optional[float]:
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        # Nested sections of the same name are already covered by the outer one.
+        return time.time() if not depth else None
+
+    def section_stop(self, name: _t.Text, start: _t.Optional[float]):
+        self._depth[name] -= 1
+        if start is not None:
+            self.sections[name] = self.sections.get(name, 0) + time.time() - start
+
+    def get_timings(self, round_time: _t.Callable, with_sql: bool = True) -> _t.Dict[_t.Text, _t.Any]:
+        duplicates = self.duplicates
+        timings: _t.Dict[_t.Text, _t.Any] = {
+            name: round_time(value)
+            for name, value in self.sections.items()
+        }
+        timings['db_queries'] = str(self.queries_count)
+        timings['db_duplicates'] = str(sum(count - 1 for _, count in duplicates))
+        if duplicates and with_sql:
+            sql, count = duplicates[0]
+            timings['db_top_duplicate'] = f'{count}x {self.short_sql(sql)}'
+        for num, (duration, sql) in enumerate(sorted(self.slowest, reverse=True)):
+            # Statements reveal schema, so they are shown only to trusted clients.
+            timings[f'db_slow_{num}'] = round_time(duration)
+            if with_sql:
+                timings[f'db_slow_{num}'] = [timings[f'db_slow_{num}'], self.short_sql(sql)]
+        return timings
+
+    def short_sql(self, sql: _t.Text, length: int = 100) -> _t.Text:
+        sql = self.spaces_regex.sub(' ', self.fingerprint(sql)).replace('"', "'").replace('\\', '')
+        return sql if len(sql) <= length else f'{sql[:length - 3]}...'
+
+    def as_dict(self) -> _t.Dict[_t.Text, _t.Any]:
+        return {
+            'db_queries': self.queries_count,
+            'db_execution_time': self.queries_time,
+            'db_duplicates': dict(self.duplicates),
+            'db_slowest': [{'sql': sql, 'time': duration} for duration, sql in sorted(self.slowest, reverse=True)],
+            **self.sections,
+        }
+
+
+_profiler_storage = local()
+
+
+def get_request_profiler() -> _t.Optional[RequestProfiler]:
+    """
+    Returns profiler of currently handled request or `None`
+    if request profiling is disabled or request is not sampled.
+    """
+    return getattr(_profiler_storage, 'profiler', None)
+
+
+class profile_section:  # pylint: disable=invalid-name
+    """
+    Context manager which adds execution time of the block to the named
+    `Server-Timing` entry of current request. Does nothing when request
+    is not profiled.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.profiling import profile_section
+
+            with profile_section('report'):
+                build_report()
+    """
+    __slots__ = ('name', 'profiler', 'start')
+
+    def __init__(self, name: _t.Text):
+        self.name = name
+
+    def __enter__(self):
+        self.profiler = get_request_profiler()
+        if self.profiler is not None:
+            self.start = self.profiler.section_start(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.profiler is not None:
+            self.profiler.section_stop(self.name, self.start)
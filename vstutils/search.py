@@ -0,0 +1,265 @@
+"""
+Backends of search by part of name for :func:`vstutils.api.filters.name_filter`.
+
+Plain ``contains`` lookup is ``LIKE '%value%'`` condition which scans the whole table.
+Backend is selected by database vendor from ``SEARCH_BACKENDS`` setting
+and uses index for the search: trigram index on PostgreSQL, ``FULLTEXT`` index with ngram parser
+on MySQL and FTS5 table with trigram tokenizer on SQLite.
+Indexes are created by ``searchindexes`` command for models which have ``name`` in filterset.
+Result is always checked by ``contains``, so it doesn't depend on backend,
+and search falls back to ``contains`` when index doesn't exist.
+Inherited fields (multi-table inheritance) are indexed in table of parent model.
+"""
+import time
+import typing as _t
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models.sql import Query
+from django.db.backends.utils import truncate_name
+
+from .utils import BaseVstObject, import_class
+
+
+class ContainsSearchBackend(BaseVstObject):
+    """
+    Backend which searches by ``contains`` lookup without indexes.
+    Base class for other backends.
+
+    :param using: database alias.
+    """
+    __slots__ = ('using', '_indexes')
+
+    #: Index is used only for values of this length or longer.
+    min_length: int = 0
+    #: Seconds while result of index check is cached, so created or broken index is noticed without restart.
+    index_check_timeout: int = 60
+
+    def __init__(self, using: _t.Text):
+        self.using = using
+        self._indexes: _t.Dict[_t.Tuple[_t.Text, _t.Text], _t.Tuple[bool, float]] = {}
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def quote_name(self, name: _t.Text) -> _t.Text:
+        return self.connection.ops.quote_name(name)
+
+    def get_index_name(self, model, field: models.Field, suffix: _t.Text = 'search') -> _t.Text:
+        return truncate_name(
+            f'{model._meta.db_table}_{field.column}_{suffix}',
+            self.connection.ops.max_name_length()
+        )
+
+    def get_search_field(self, model, field_name: _t.Text) -> _t.Optional[models.Field]:
+        """
+        Returns text field of model which could be indexed.
+        Index of field should be created for ``field.model``, which is parent model for inherited field.
+        """
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:  # nocv
+            return None
+        if getattr(field, 'concrete', False) and isinstance(field, (models.CharField, models.TextField)):
+            return field
+        return None
+
+    def is_supported(self, model, field: models.Field) -> bool:
+        # pylint: disable=unused-argument
+        return False
+
+    def index_exists(self, model, field: models.Field) -> bool:
+        with self.connection.cursor() as cursor:
+            constraints = self.connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return self.get_index_name(model, field) in constraints
+
+    def has_index(self, model, field: models.Field) -> bool:
+        """
+        Cached check that index for field exists.
+        """
+        key = (model._meta.db_table, field.column)
+        exists, checked = self._indexes.get(key, (False, 0.0))
+        if checked + self.index_check_timeout <= time.time():
+            exists = self.is_supported(model, field) and self.index_exists(model, field)
+            self._indexes[key] = (exists, time.time())
+        return exists
+
+    def clear_cache(self):
+        self._indexes.clear()
+
+    def can_use_index(self, value: _t.Text) -> bool:
+        """
+        Check that index could find value.
+        """
+        return len(value) >= self.min_length
+
+    def get_index_where(self, model, field: models.Field, value: _t.Text) -> _t.Tuple[_t.Text, _t.Tuple]:
+        """
+        SQL condition with params which selects rows by index. It may select more rows than ``contains``.
+        """
+        raise NotImplementedError  # nocv
+
+    def filter(self, queryset, field_name: _t.Text, value: _t.Text):
+        """
+        Filter queryset by rows which contain value in field.
+        """
+        queryset = queryset.filter(**{f'{field_name}__contains': value})
+        if not self.can_use_index(value) or not isinstance(queryset.query, Query):
+            return queryset
+        field = self.get_search_field(queryset.model, field_name)
+        if field is None or not self.has_index(field.model, field):
+            return queryset
+        model = field.model
+        where, params = self.get_index_where(model, field, value)
+        return queryset.extra(where=[where], params=params)
+
+    def get_index_sql(self, model, field: models.Field) -> _t.List[_t.Text]:
+        """
+        SQL statements which create index for field.
+        """
+        # pylint: disable=unused-argument
+        return []
+
+    def create_index(self, model, field: models.Field) -> _t.List[_t.Text]:
+        """
+        Create index for field if it doesn't exist.
+
+        :return: executed SQL statements.
+        """
+        if not self.is_supported(model, field) or self.index_exists(model, field):
+            return []
+        statements = self.get_index_sql(model, field)
+        with self.connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        self.clear_cache()
+        return statements
+
+
+class PostgreSQLSearchBackend(ContainsSearchBackend):
+    """
+    Backend for PostgreSQL with GIN trigram index from ``pg_trgm`` extension.
+    Such index is used by ``LIKE`` conditions, so ``contains`` lookup is enough to use it.
+    """
+    __slots__ = ()
+
+    def is_supported(self, model, field: models.Field) -> bool:
+        return True
+
+    def filter(self, queryset, field_name: _t.Text, value: _t.Text):
+        return queryset.filter(**{f'{field_name}__contains': value})
+
+    def get_index_sql(self, model, field: models.Field) -> _t.List[_t.Text]:
+        return [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            f'CREATE INDEX IF NOT EXISTS {self.quote_name(self.get_index_name(model, field))} '
+            f'ON {self.quote_name(model._meta.db_table)} USING gin ({self.quote_name(field.column)} gin_trgm_ops)',
+        ]
+
+
+class MySQLSearchBackend(ContainsSearchBackend):
+    """
+    Backend for MySQL with ``FULLTEXT`` index with ngram parser.
+    Index is created without stopwords, because ngrams with them are not indexed.
+    """
+    __slots__ = ()
+
+    #: Should be equal to ``ngram_token_size`` server option.
+    min_length = 2
+
+    def is_supported(self, model, field: models.Field) -> bool:
+        return True
+
+    def can_use_index(self, value: _t.Text) -> bool:
+        # Phrase is split by spaces and shorter words have no ngrams.
+        words = value.replace('"', ' ').split()
+        return bool(words) and all(len(word) >= self.min_length for word in words)
+
+    def filter(self, queryset, field_name: _t.Text, value: _t.Text):
+        if self.connection.in_atomic_block:
+            # Uncommitted rows are not in FULLTEXT index yet.
+            return queryset.filter(**{f'{field_name}__contains': value})
+        return super().filter(queryset, field_name, value)
+
+    def get_index_where(self, model, field: models.Field, value: _t.Text) -> _t.Tuple[_t.Text, _t.Tuple]:
+        column = f'{self.quote_name(model._meta.db_table)}.{self.quote_name(field.column)}'
+        # Phrase could not contain quotes.
+        return f'MATCH ({column}) AGAINST (%s IN BOOLEAN MODE)', ('"{}"'.format(value.replace('"', ' ')),)
+
+    def get_index_sql(self, model, field: models.Field) -> _t.List[_t.Text]:
+        return [
+            'SET SESSION innodb_ft_enable_stopword = 0',
+            f'CREATE FULLTEXT INDEX {self.quote_name(self.get_index_name(model, field))} '
+            f'ON {self.quote_name(model._meta.db_table)} ({self.quote_name(field.column)}) WITH PARSER ngram',
+        ]
+
+
+class SQLiteSearchBackend(ContainsSearchBackend):
+    """
+    Backend for SQLite with external content FTS5 table with trigram tokenizer (SQLite 3.34+).
+    Table is kept in sync with model table by triggers.
+    Migrations which alter model table recreate it without triggers, so index isn't used
+    until it is recreated by ``searchindexes`` command.
+    Only models with integer primary key are supported, because it is used as ``rowid``.
+    """
+    __slots__ = ()
+
+    min_length = 3
+    trigger_suffixes = ('_ai', '_ad', '_au')
+
+    def get_index_name(self, model, field: models.Field, suffix: _t.Text = 'fts') -> _t.Text:
+        return super().get_index_name(model, field, suffix)
+
+    def is_supported(self, model, field: models.Field) -> bool:
+        pk_type = model._meta.pk.get_internal_type()
+        return pk_type.endswith('AutoField') or isinstance(model._meta.pk, models.IntegerField)
+
+    def index_exists(self, model, field: models.Field) -> bool:
+        name = self.get_index_name(model, field)
+        with self.connection.cursor() as cursor:
+            tables = self.connection.introspection.table_names(cursor)
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                (model._meta.db_table,)
+            )
+            triggers = {row[0] for row in cursor.fetchall()}
+        return name in tables and all(name + suffix in triggers for suffix in self.trigger_suffixes)
+
+    def get_index_where(self, model, field: models.Field, value: _t.Text) -> _t.Tuple[_t.Text, _t.Tuple]:
+        fts = self.quote_name(self.get_index_name(model, field))
+        pk = f'{self.quote_name(model._meta.db_table)}.{self.quote_name(model._meta.pk.column)}'
+        return f'{pk} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)', ('"{}"'.format(value.replace('"', '""')),)
+
+    def get_index_sql(self, model, field: models.Field) -> _t.List[_t.Text]:
+        name = self.get_index_name(model, field)
+        fts, table = self.quote_name(name), self.quote_name(model._meta.db_table)
+        column, pk = self.quote_name(field.column), self.quote_name(model._meta.pk.column)
+        insert = f'INSERT INTO {fts}(rowid, {column}) VALUES (new.{pk}, new.{column});'
+        delete = f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.{pk}, old.{column});"
+        return [
+            # Triggers of existing index are recreated and index is rebuilt.
+            *(f'DROP TRIGGER IF EXISTS {self.quote_name(name + suffix)}' for suffix in self.trigger_suffixes),
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{model._meta.db_table}', "
+            f"content_rowid='{model._meta.pk.column}', tokenize='trigram')",
+            f'CREATE TRIGGER {self.quote_name(name + "_ai")} AFTER INSERT ON {table} BEGIN {insert} END',
+            f'CREATE TRIGGER {self.quote_name(name + "_ad")} AFTER DELETE ON {table} BEGIN {delete} END',
+            f'CREATE TRIGGER {self.quote_name(name + "_au")} AFTER UPDATE ON {table} BEGIN {delete} {insert} END',
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+
+
+_search_backends: _t.Dict[_t.Text, ContainsSearchBackend] = {}
+
+
+def get_search_backend(using: _t.Text = 'default') -> ContainsSearchBackend:
+    """
+    Returns search backend for database alias.
+    """
+    if using not in _search_backends:
+        backends = BaseVstObject.get_django_settings('SEARCH_BACKENDS', {})
+        backend_class = backends.get(connections[using].vendor, ContainsSearchBackend)
+        if isinstance(backend_class, str):
+            backend_class = import_class(backend_class)
+        _search_backends[using] = backend_class(using)
+    return _search_backends[using]
@@ -1,4 +1,8 @@
+import datetime
+
+import orjson
 import yaml
+from django.utils.dateparse import parse_datetime, parse_date, parse_time
 
 
 Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
@@ -16,3 +20,76 @@ class YamlSessionSerializer:
 
     def loads(self, data):
         return yaml.load(data.decode('latin-1'), Loader=Loader)
+
+
+class JsonSessionSerializer(YamlSessionSerializer):
+    """
+    Fast session serializer based on orjson.
+    Supports the same types as :class:`.YamlSessionSerializer` (including
+    datetimes and sets), which are stored as tagged objects.
+    Dicts with non-string keys are stored as tagged lists of pairs, so keys keep their types.
+    Sessions stored by :class:`.YamlSessionSerializer` are still readable,
+    so switching serializer doesn't log out users.
+    """
+    type_key = '__vst_type__'
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    encoders = {
+        datetime.datetime: ('datetime', datetime.datetime.isoformat),
+        datetime.date: ('date', datetime.date.isoformat),
+        datetime.time: ('time', datetime.time.isoformat),
+        set: ('set', list),
+        frozenset: ('frozenset', list),
+    }
+    decoders = {
+        'datetime': parse_datetime,
+        'date': parse_date,
+        'time': parse_time,
+        'set': set,
+        'frozenset': frozenset,
+        'dict': dict,
+    }
+
+    def default(self, obj):
+        encoder = self.encoders.get(type(obj))
+        if encoder is None:
+            raise TypeError(f'Type {type(obj).__name__} is not session serializable.')
+        return {self.type_key: encoder[0], 'value': encoder[1](obj)}
+
+    def encode_keys(self, obj):
+        if isinstance(obj, dict):
+            if all(isinstance(key, str) for key in obj):
+                return {key: self.encode_keys(value) for key, value in obj.items()}
+            return {self.type_key: 'dict', 'value': [[key, self.encode_keys(value)] for key, value in obj.items()]}
+        if isinstance(obj, (list, tuple)):
+            return [self.encode_keys(value) for value in obj]
+        return obj
+
+    def decode_types(self, obj):
+        if isinstance(obj, dict):
+            if self.type_key in obj:
+                return self.decoders[obj[self.type_key]](self.decode_types(obj['value']))
+            return {key: self.decode_types(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self.decode_types(value) for value in obj]
+        return obj
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self.options)
+        except TypeError:
+            # orjson supports only string keys, so session is walked only when it has other keys.
+            return orjson.dumps(self.encode_keys(obj), default=self.default, option=self.options)
+
+    def loads(self, data):
+        if data[:1] != b'{':
+            return super().loads(data)
+        try:
+            result = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Flow style yaml mapping.
+            return super().loads(data)
+        # Skip walking through session when there is no tagged values.
+        if self.type_key.encode('utf-8') in data:
+            result = self.decode_types(result)
+        return result
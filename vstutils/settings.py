@@ -76,6 +76,14 @@ ConfigIntType = cconfig.IntType()
 ConfigIntSecondsType = cconfig.IntSecondsType()
 
 
+class FloatType(cconfig.BaseType):
+    def convert(self, value) -> float:
+        return float(value)
+
+
+ConfigFloatType = FloatType()
+
+
 class BackendSection(cconfig.Section):
 
     def key_handler_to_all(self, key):
@@ -92,6 +100,12 @@ class MainSection(BaseAppendSection):
         'enable_admin_panel': ConfigBoolType,
         'allowed_hosts': cconfig.ListType(),
         'first_day_of_week': ConfigIntType,
+        'ldap-pool_size': ConfigIntType,
+        'ldap-pool_timeout': ConfigIntSecondsType,
+        'ldap-pool_max_idle': ConfigIntSecondsType,
+        'ldap-auth_cache_timeout': ConfigIntSecondsType,
+        'ldap-negative_auth_cache_timeout': ConfigIntSecondsType,
+        'ldap-group_cache_timeout': ConfigIntSecondsType,
     }
 
 
@@ -115,7 +129,19 @@ class WebSection(BaseAppendSection):
         'secure_hsts_preload': ConfigBoolType,
         'secure_hsts_seconds': ConfigIntType,
         'health_throttle_rate': ConfigIntType,
+        'health_cache_timeout': ConfigIntSecondsType,
+        'health_check_timeout': ConfigIntSecondsType,
         'bulk_threads': ConfigIntType,
+        'request_profiling': ConfigBoolType,
+        'request_profiling_sample_rate': ConfigFloatType,
+        'request_profiling_log': ConfigBoolType,
+        'request_profiling_slow_queries': ConfigIntType,
+        'metrics': ConfigBoolType,
+        'metrics_public': ConfigBoolType,
+        'metrics_flush_interval': ConfigIntSecondsType,
+        'metrics_ttl': ConfigIntSecondsType,
+        'metrics_cache': cconfig.StrType(),
+        'static_compress_min_size': cconfig.BytesSizeType(),
     }
 
 
@@ -157,6 +183,9 @@ class MailSection(BaseAppendSection):
         'ssl': ConfigBoolType,
         'send_confirmation': ConfigBoolType,
         'authenticate_after_registration': ConfigBoolType,
+        'batch_size': ConfigIntType,
+        'task_chunk_size': ConfigIntType,
+        'max_retries': ConfigIntType,
     }
 
 
@@ -189,6 +218,19 @@ class WorkerSection(BaseAppendSection):
     }
 
 
+class BlobsSection(cconfig.Section):
+    types_map = {
+        'url_timeout': ConfigIntSecondsType,
+    }
+
+
+class ThumbnailsSection(cconfig.Section):
+    types_map = {
+        'sizes': cconfig.ListType(),
+        'workers': ConfigIntType,
+    }
+
+
 class CentrifugoSection(cconfig.Section):
     type_address = cconfig.StrType()
     type_api_key = cconfig.StrType()
@@ -209,6 +251,12 @@ config: cconfig.ConfigParserC = cconfig.ConfigParserC(
             'ldap-server': None,
             'ldap-default-domain': '',
             'ldap-auth_format': 'cn=<username>,<domain>',
+            'ldap-pool_size': 10,
+            'ldap-pool_timeout': 5,
+            'ldap-pool_max_idle': '1m',
+            'ldap-auth_cache_timeout': '1m',
+            'ldap-negative_auth_cache_timeout': 10,
+            'ldap-group_cache_timeout': '5m',
         },
         'web': {
             'allow_cors': False,
@@ -230,7 +278,20 @@ config: cconfig.ConfigParserC = cconfig.ConfigParserC(
             'secure_hsts_preload': False,
             'secure_hsts_seconds': 0,
             'health_throttle_rate': 60,
-            'bulk_threads': 3
+            'health_cache_timeout': 5,
+            'health_check_timeout': 5,
+            'bulk_threads': 3,
+            'request_profiling': False,
+            'request_profiling_sample_rate': 1.0,
+            'request_profiling_log': False,
+            'request_profiling_slow_queries': 3,
+            'metrics': False,
+            'metrics_public': False,
+            'metrics_flush_interval': 5,
+            'metrics_ttl': '1d',
+            'metrics_cache': 'default',
+            'static_build_dir': '{PROG}/static_build',
+            'static_compress_min_size': 1024,
         },
         'database': {
             'engine': 'django.db.backends.sqlite3',
@@ -252,10 +313,24 @@ config: cconfig.ConfigParserC = cconfig.ConfigParserC(
             'host': None,
             'send_confirmation': os.getenv(f'{ENV_NAME}_SEND_CONFIRMATION_EMAIL', False),
             'authenticate_after_registration': os.getenv(f'{ENV_NAME}_AUTHENTICATE_AFTER_REGISTRATION', False),
+            'batch_size': 100,
+            'task_chunk_size': 500,
+            'max_retries': 3,
+            'retry_delay': 1,
         },
         'contact': {
             'name': 'System Administrator'
         },
+        'blobs': {
+            'backend': 'django.core.files.storage.FileSystemStorage',
+            'location': '{PROG}/blobs',
+            'base_url': '/blobs/',
+            'url_timeout': '1h',
+        },
+        'thumbnails': {
+            'sizes': '128x128',
+            'workers': 0,
+        },
         'uwsgi': {
             'daemon': True
         },
@@ -290,6 +365,8 @@ config: cconfig.ConfigParserC = cconfig.ConfigParserC(
         'uwsgi': UWSGISection,
         'rpc': RPCSection,
         'centrifugo': CentrifugoSection,
+        'blobs': BlobsSection,
+        'thumbnails': ThumbnailsSection,
     }
 )
 
@@ -428,6 +505,12 @@ CORS_ORIGIN_ALLOW_ALL: bool = web['allow_cors']
 LDAP_SERVER: _t.Optional[_t.Text] = main["ldap-server"]
 LDAP_DOMAIN: _t.Optional[_t.Text] = main["ldap-default-domain"]
 LDAP_FORMAT: _t.Text = main["ldap-auth_format"]
+LDAP_POOL_SIZE: int = main["ldap-pool_size"]
+LDAP_POOL_TIMEOUT: int = main["ldap-pool_timeout"]
+LDAP_POOL_MAX_IDLE: int = main["ldap-pool_max_idle"]
+LDAP_AUTH_CACHE_TIMEOUT: int = main["ldap-auth_cache_timeout"]
+LDAP_NEGATIVE_AUTH_CACHE_TIMEOUT: int = main["ldap-negative_auth_cache_timeout"]
+LDAP_GROUP_CACHE_TIMEOUT: int = main["ldap-group_cache_timeout"]
 
 DEFAULT_AUTH_PLUGINS: SIMPLE_OBJECT_SETTINGS_TYPE = {
     'LDAP': {
@@ -471,7 +554,7 @@ SESSION_COOKIE_DOMAIN: _t.Optional[_t.Text] = os.getenv(
     'DJANGO_SESSION_COOKIE_DOMAIN',
     _t.cast(_t.Any, web.get('session_cookie_domain', fallback=None))
 )
-SESSION_SERIALIZER = 'vstutils.session.YamlSessionSerializer'
+SESSION_SERIALIZER = 'vstutils.session.JsonSessionSerializer'
 
 CSRF_COOKIE_AGE: int = SESSION_COOKIE_AGE
 CSRF_COOKIE_DOMAIN: _t.Optional[_t.Text] = SESSION_COOKIE_DOMAIN
@@ -589,6 +672,32 @@ STATICFILES_FINDERS: _t.Tuple[_t.Text, _t.Text] = (
 if not LOCALRUN:
     STATIC_ROOT = os.path.join(VST_PROJECT_DIR, 'static')  # nocv
 
+# Fingerprinted and precompressed files are built by `buildstatic` command.
+STATIC_BUILD_DIR: _t.Text = web['static_build_dir']
+STATIC_COMPRESS_MIN_SIZE: int = web['static_compress_min_size']
+
+# Content-addressed storage for binary fields in blob storage mode.
+blobs_options = config['blobs'].all()
+# Lifetime of signed urls of blobs.
+BLOB_URL_TIMEOUT: int = blobs_options.pop('url_timeout')
+BLOB_STORAGE: _t.Dict[_t.Text, _t.Any] = {
+    'BACKEND': blobs_options.pop('backend'),
+    'OPTIONS': blobs_options,
+}
+
+# Thumbnails of image fields with `thumbnails=True` (sizes as `<width>x<height>`).
+thumbnails = config['thumbnails']
+THUMBNAIL_SIZES: _t.Tuple[_t.Text, ...] = tuple(thumbnails['sizes'])
+THUMBNAIL_WORKERS: int = thumbnails['workers']
+
+# Backends of search by name for database vendors (see `vstutils.search`).
+# Other vendors use `vstutils.search.ContainsSearchBackend`.
+SEARCH_BACKENDS: _t.Dict[_t.Text, _t.Text] = {
+    'postgresql': 'vstutils.search.PostgreSQLSearchBackend',
+    'mysql': 'vstutils.search.MySQLSearchBackend',
+    'sqlite': 'vstutils.search.SQLiteSearchBackend',
+}
+
 
 # Documentation files
 # http://django-docs.readthedocs.io/en/latest/#docs-access-optional
@@ -653,6 +762,11 @@ if mail.get('tls', None) is not None:
 if mail.get('ssl', None) is not None:
     EMAIL_USE_SSL = mail['ssl']  # nocv
 EMAIL_HOST = mail["host"]
+# Bulk emails delivery options
+EMAIL_BATCH_SIZE: int = mail['batch_size']
+EMAIL_TASK_CHUNK_SIZE: int = mail['task_chunk_size']
+EMAIL_MAX_RETRIES: int = mail['max_retries']
+EMAIL_RETRY_DELAY: float = float(mail['retry_delay'])
 if EMAIL_HOST is None:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 SEND_CONFIRMATION_EMAIL: bool = mail["send_confirmation"]
@@ -677,8 +791,19 @@ CONTACT: _t.Dict = config['contact'].all()
 OPENAPI_PUBLIC: bool = web['public_openapi']
 SCHEMA_CACHE_TIMEOUT = web['openapi_cache_timeout']
 HEALTH_THROTTLE_RATE: _t.Text = f"{web['health_throttle_rate']}/minute"
+HEALTH_CACHE_TIMEOUT: int = web['health_cache_timeout']
+HEALTH_CHECK_TIMEOUT: int = web['health_check_timeout']
 OPENAPI_VIEW_CLASS: _t.Text = 'vstutils.api.schema.views.OpenApiView'
 BULK_THREADS = web['bulk_threads']
+REQUEST_PROFILING: bool = web['request_profiling']
+REQUEST_PROFILING_SAMPLE_RATE: float = web['request_profiling_sample_rate']
+REQUEST_PROFILING_LOG: bool = web['request_profiling_log']
+REQUEST_PROFILING_SLOW_QUERIES: int = web['request_profiling_slow_queries']
+METRICS_ENABLED: bool = web['metrics']
+METRICS_PUBLIC: bool = web['metrics_public']
+METRICS_FLUSH_INTERVAL: int = web['metrics_flush_interval']
+METRICS_TTL: int = web['metrics_ttl']
+METRICS_CACHE: _t.Text = web['metrics_cache']
 
 OPENAPI_EXTRA_LINKS: SIMPLE_OBJECT_SETTINGS_TYPE = {
     'vstutils': {
@@ -0,0 +1,183 @@
+"""
+Build of fingerprinted and precompressed static files.
+
+:func:`build_static` copies files from ``STATIC_FILES_FOLDERS`` to ``STATIC_BUILD_DIR``
+with content hash in the file name, writes gzip (and brotli, if ``brotli`` package is installed)
+siblings for compressible files and emits ``manifest.json``.
+Template tags ``static`` and ``static_path`` resolve names through the manifest
+and built files are served with immutable cache headers.
+"""
+import os
+import io
+import gzip
+import json
+import hashlib
+import typing as _t
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # nocv
+    brotli = None
+
+from .utils import BaseVstObject
+
+
+HASH_LENGTH = 12
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIBLE_EXTENSIONS = (
+    '.js', '.mjs', '.css', '.map', '.json', '.html', '.htm', '.svg', '.txt', '.xml', '.ttf', '.otf', '.eot', '.ico',
+)
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    # Zero mtime makes output reproducible.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as gzip_file:
+        gzip_file.write(data)
+    return buffer.getvalue()
+
+
+def get_compressors() -> _t.Dict[_t.Text, _t.Tuple[_t.Text, _t.Callable[[bytes], bytes]]]:
+    """
+    Available compressions as ``{encoding: (file suffix, compress function)}`` in preference order.
+    """
+    compressors = {}
+    if brotli is not None:  # nocv
+        compressors['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+    compressors['gzip'] = ('.gz', _gzip_compress)
+    return compressors
+
+
+def get_hashed_name(name: _t.Text, content: bytes) -> _t.Text:
+    """
+    Returns name with content hash before extension, e.g. ``bundle/spa.js`` -> ``bundle/spa.5d41402abc4b.js``.
+    """
+    path, ext = os.path.splitext(name)
+    return f'{path}.{hashlib.md5(content).hexdigest()[:HASH_LENGTH]}{ext}'  # nosec
+
+
+def _iter_static_files(folders: _t.Iterable[_t.Text]) -> _t.Iterator[_t.Tuple[_t.Text, Path]]:
+    seen = set()
+    for folder in map(Path, folders):
+        if not folder.is_dir():
+            continue
+        for file_path in sorted(folder.rglob('*')):
+            name = file_path.relative_to(folder).as_posix()
+            # First found file wins like in FileSystemFinder.
+            if name not in seen and file_path.is_file():
+                seen.add(name)
+                yield name, file_path
+
+
+def build_static(
+        folders: _t.Iterable[_t.Text],
+        output_dir: _t.Text,
+        min_size: int = 1024,
+        compress: bool = True,
+) -> _t.Dict[_t.Text, _t.Dict]:
+    """
+    Build fingerprinted and precompressed copies of static files and write manifest.
+    Files with unchanged content are not rewritten.
+
+    :param folders: static folders in priority order.
+    :param output_dir: directory for built files and manifest.
+    :param min_size: minimal size of file in bytes to be compressed.
+    :param compress: write compressed siblings of compressible files.
+    :return: manifest data.
+    """
+    output = Path(output_dir)
+    compressors = get_compressors() if compress else {}
+    files, encodings = {}, {}
+    for name, file_path in _iter_static_files(folders):
+        content = file_path.read_bytes()
+        hashed_name = files[name] = get_hashed_name(name, content)
+        target = output / hashed_name
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+        if len(content) < min_size or file_path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        for encoding, (suffix, compressor) in compressors.items():
+            compressed_target = target.with_name(target.name + suffix)
+            if not compressed_target.exists():
+                compressed = compressor(content)
+                if len(compressed) >= len(content):
+                    continue
+                compressed_target.write_bytes(compressed)
+            encodings.setdefault(hashed_name, []).append(encoding)
+    manifest = {'files': files, 'encodings': encodings}
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_tmp = output / f'.{MANIFEST_NAME}.tmp'
+    manifest_tmp.write_text(json.dumps(manifest, sort_keys=True))
+    os.replace(str(manifest_tmp), str(output / MANIFEST_NAME))
+    return manifest
+
+
+class StaticManifest(BaseVstObject):
+    """
+    Reader of static files manifest built by :func:`build_static`.
+    Manifest is reloaded when file is changed.
+    """
+    __slots__ = ('_mtime', 'files', 'encodings', 'hashed_files')
+
+    def __init__(self):
+        self._mtime: _t.Optional[float] = None
+        self.files: _t.Dict[_t.Text, _t.Text] = {}
+        self.encodings: _t.Dict[_t.Text, _t.List[_t.Text]] = {}
+        self.hashed_files: _t.Set[_t.Text] = set()
+
+    @property
+    def build_dir(self) -> _t.Optional[_t.Text]:
+        return self.get_django_settings('STATIC_BUILD_DIR')
+
+    def load(self) -> 'StaticManifest':
+        build_dir = self.build_dir
+        try:
+            mtime = os.stat(os.path.join(build_dir, MANIFEST_NAME)).st_mtime if build_dir else None
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            data = {}
+            if mtime is not None:
+                with open(os.path.join(build_dir, MANIFEST_NAME)) as manifest_file:
+                    data = json.load(manifest_file)
+            self.files = data.get('files', {})
+            self.encodings = data.get('encodings', {})
+            self.hashed_files = set(self.files.values())
+            self._mtime = mtime
+        return self
+
+    @property
+    def version(self) -> _t.Text:
+        """
+        Identifier of current manifest build.
+        """
+        return str(self.load()._mtime or '')
+
+    def get_name(self, name: _t.Text) -> _t.Text:
+        """
+        Returns fingerprinted name of file or original name if file is not in manifest.
+        """
+        return self.load().files.get(name.lstrip('/'), name)
+
+    def get_variants(self, hashed_name: _t.Text) -> _t.Optional[_t.Dict[_t.Text, _t.Text]]:
+        """
+        Returns paths of built file by content encoding
+        (empty string key is uncompressed file) or ``None`` if file is not built.
+        """
+        self.load()
+        if hashed_name not in self.hashed_files:
+            return None
+        path = os.path.join(self.build_dir, hashed_name)
+        compressors = get_compressors()
+        variants = {
+            encoding: path + compressors[encoding][0]
+            for encoding in self.encodings.get(hashed_name, ())
+            if encoding in compressors
+        }
+        variants[''] = path
+        return variants
+
+
+static_manifest = StaticManifest()
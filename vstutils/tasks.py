@@ -1,8 +1,9 @@
 from celery.app.task import BaseTask
 from celery.result import AsyncResult
+from django.apps import apps
 from django.conf import settings
 
-from .utils import import_class, send_template_email_handler
+from .utils import import_class, send_template_email_handler, send_template_emails_handler, SecurePickling
 
 
 celery_app = import_class(
@@ -32,4 +33,41 @@ class SendEmailMessage(TaskClass):
         send_template_email_handler(*args, **kwargs)
 
 
+class SendEmailMessages(TaskClass):
+    """
+    Task for sending chunk of emails by :func:`vstutils.utils.send_template_emails_handler`.
+    """
+
+    def run(self, *args, **kwargs):
+        return send_template_emails_handler(*args, **kwargs)
+
+
+class ProcessQuerySetChunk(TaskClass):
+    """
+    Task for processing chunk of queryset by :meth:`vstutils.models.BQuerySet.parallel_map`.
+    Query is sent signed by ``SECRET_KEY``, function is sent as import path.
+    """
+
+    @classmethod
+    def send(cls, queryset, func, first, last, progress_key=None) -> AsyncResult:
+        return cls.do(
+            SecurePickling().dumps(queryset.query),
+            queryset.model._meta.label,
+            f'{func.__module__}.{func.__qualname__}',
+            first,
+            last,
+            progress_key,
+        )
+
+    def run(self, query, model_label, func_path, first, last, progress_key=None):
+        # pylint: disable=arguments-differ,too-many-arguments
+        from .models.queryset import process_chunk  # pylint: disable=import-outside-toplevel
+
+        queryset = apps.get_model(model_label)._default_manager.all()
+        queryset.query = SecurePickling().loads(query)
+        return process_chunk(queryset, import_class(func_path), first, last, progress_key, close_connections=False)
+
+
 celery_app.register_task(SendEmailMessage())
+celery_app.register_task(SendEmailMessages())
+celery_app.register_task(ProcessQuerySetChunk())
@@ -3,10 +3,19 @@ import json
 from django import template
 from django.templatetags.static import StaticNode
 
+from ..static_files import static_manifest
+
 register = template.Library()
 
 
-class StaticTag(StaticNode):
+class ManifestStaticNode(StaticNode):
+    @classmethod
+    def handle_simple(cls, path):
+        # Resolve fingerprinted name built by `buildstatic` command.
+        return super().handle_simple(static_manifest.get_name(path))
+
+
+class StaticTag(ManifestStaticNode):
     def render(self, context):
         original_static = super().render(context)
         host = context.get('host_url', '')
@@ -50,7 +59,7 @@ def do_static_origin(parser, token):
         {% static "myapp/css/base.css" as admin_base_css %}
         {% static variable_with_path as varname %}
     """
-    return StaticNode.handle_token(parser, token)  # nocv
+    return ManifestStaticNode.handle_token(parser, token)
 
 
 @register.filter(is_safe=True)
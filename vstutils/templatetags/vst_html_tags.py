@@ -2,6 +2,8 @@ import json
 
 from django import template
 
+from ..blobs import blob_storage
+
 register = template.Library()
 
 
@@ -10,13 +12,26 @@ def img_from_json(json_string, **kwargs):
     media_type = kwargs.get('media_type', 'image/png')
     tag_classes = kwargs.get('tag_classes', '')
     content_attribute = kwargs.get('content_attribute', 'content')
+    thumbnail = kwargs.get('thumbnail', None)
 
     try:
-        content = json.loads(json_string)[content_attribute]
+        data = json.loads(json_string)
+    except Exception:
+        data = {}
+    url = ''
+    if thumbnail and isinstance(data, dict) and data.get('thumbnails'):
+        # Thumbnail is linked instead of embedding full image.
+        thumbnails = data['thumbnails']
+        thumbnail_hash = next(iter(thumbnails.values())) if thumbnail is True else thumbnails.get(thumbnail)
+        if thumbnail_hash:
+            url = blob_storage.url(thumbnail_hash)
+    try:
+        content = data[content_attribute] if not url else ''
     except Exception:
         content = ''
     return {
         'media_type': media_type,
         'tag_classes': tag_classes,
-        'content': content
+        'content': content,
+        'url': url,
     }
@@ -0,0 +1,138 @@
+"""
+Thumbnails of images in binary fields.
+
+Thumbnails are generated with Pillow at sizes from ``[thumbnails]`` section of config
+(in process pool when ``workers`` is set) and saved to :mod:`vstutils.blobs` storage,
+so they are served by hash with immutable cache. Generated thumbnails are remembered
+in default cache by hash of source image and size.
+"""
+import os
+import atexit
+import hashlib
+import typing as _t
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # nocv
+    Image = None
+
+from .blobs import BlobStorage, blob_storage as default_blob_storage
+from .utils import BaseVstObject
+
+
+CACHE_TIMEOUT = 86400 * 30
+
+
+def parse_size(size: _t.Text) -> _t.Tuple[int, int]:
+    """
+    Parse size like ``128x128`` to width and height.
+    """
+    width, _, height = size.lower().partition('x')
+    return int(width), int(height or width)
+
+
+def make_thumbnail(content: bytes, size: _t.Text) -> bytes:
+    """
+    Resize image to fit size with aspect ratio kept.
+    Images with transparency are saved as PNG, other as JPEG.
+    """
+    with Image.open(BytesIO(content)) as image:
+        image.thumbnail(parse_size(size))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image_format = 'PNG'
+        else:
+            image_format = 'JPEG'
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, format=image_format)
+    return output.getvalue()
+
+
+class ThumbnailGenerator(BaseVstObject):
+    """
+    Generator of image thumbnails at configured sizes.
+    """
+    __slots__ = ('_executor', '_executor_pid')
+
+    def __init__(self):
+        self._executor: _t.Optional[ProcessPoolExecutor] = None
+        self._executor_pid: _t.Optional[int] = None
+        atexit.register(self.shutdown)
+
+    @property
+    def sizes(self) -> _t.Tuple[_t.Text, ...]:
+        return self.get_django_settings('THUMBNAIL_SIZES', ())
+
+    @property
+    def executor(self) -> _t.Optional[ProcessPoolExecutor]:
+        """
+        Process pool of ``THUMBNAIL_WORKERS`` workers. Pool is created on first use in each
+        process (pool of parent is not usable in forked web or celery workers)
+        and is shut down at process exit.
+        """
+        workers = self.get_django_settings('THUMBNAIL_WORKERS', 0)
+        if not workers:
+            return None
+        if self._executor is None or self._executor_pid != os.getpid():  # nocv
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def shutdown(self) -> None:
+        """
+        Shut down process pool of current process.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():  # nocv
+            executor.shutdown()
+
+    def get_cache_key(self, source_hash: _t.Text, size: _t.Text) -> _t.Text:
+        return f'vst-thumbnail:{source_hash}:{size}'
+
+    def generate(
+            self,
+            load_content: _t.Callable[[], bytes],
+            source_hash: _t.Optional[_t.Text] = None,
+            storage: _t.Optional[BlobStorage] = None,
+    ) -> _t.Dict[_t.Text, _t.Text]:
+        """
+        Returns hashes of thumbnails by size. Only missing thumbnails are generated.
+
+        :param load_content: callable which returns content of source image.
+        :param source_hash: hash of source image content (calculated from content if not set).
+        :param storage: blob storage for thumbnails.
+        """
+        if Image is None or not self.sizes:  # nocv
+            return {}
+        storage = storage or default_blob_storage
+        content = None
+        if source_hash is None:
+            content = load_content()
+            source_hash = hashlib.sha256(content).hexdigest()
+        cache = self.get_django_cache('default')
+        keys = {size: self.get_cache_key(source_hash, size) for size in self.sizes}
+        cached = cache.get_many(keys.values())
+        # Thumbnails are immutable blobs, so cached hashes are trusted.
+        result = {size: cached[key] for size, key in keys.items() if key in cached}
+        missing = [size for size in self.sizes if size not in result]
+        if missing:
+            content = load_content() if content is None else content
+            executor = self.executor
+            try:
+                if executor is None:
+                    thumbnails = [make_thumbnail(content, size) for size in missing]
+                else:  # nocv
+                    thumbnails = list(executor.map(make_thumbnail, [content] * len(missing), missing))
+            except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+                # Content is not an image, so there is nothing to show.
+                return {}
+            generated = {size: storage.save(thumbnail) for size, thumbnail in zip(missing, thumbnails)}
+            cache.set_many({keys[size]: thumbnail_hash for size, thumbnail_hash in generated.items()}, CACHE_TIMEOUT)
+            result.update(generated)
+        return {size: result[size] for size in self.sizes}
+
+
+thumbnail_generator = ThumbnailGenerator()
@@ -1,23 +1,99 @@
+import heapq
+import typing as _t
+from operator import itemgetter
+from numbers import Number
+
 from configparserc import tools
 
 
-def multikeysort(items, columns, reverse=False):
-    if not isinstance(items, list):
-        items = list(items)  # nocv
-    if not isinstance(columns, list):
-        columns = list(columns)
-    columns.reverse()
+def _get_column_spec(column, reverse: bool) -> _t.Tuple[_t.Text, bool, bool]:
+    """
+    Returns name, descending flag and flag that nulls are sorted as the largest values.
+    """
+    nulls_first = nulls_last = False
+    if isinstance(column, str):
+        descending = column.startswith('-')
+        name = column[1:] if descending else column
+    else:
+        # Expressions like `F('name').desc(nulls_last=True)`.
+        descending = column.descending
+        nulls_first, nulls_last = column.nulls_first, column.nulls_last
+        name = column.expression.name
+    descending = descending != reverse
+    if nulls_first or nulls_last:
+        nulls_largest = nulls_first == descending
+        if reverse:
+            nulls_largest = not nulls_largest
+    else:
+        # By default nulls are greater than any value like in PostgreSQL.
+        nulls_largest = True
+    return name, descending, nulls_largest
+
+
+def _is_number(value_type: type) -> bool:
+    return issubclass(value_type, Number) and not issubclass(value_type, complex)
+
+
+def _get_value_key(value) -> _t.Tuple:
+    # Values of different types are grouped by type to be comparable.
+    if _is_number(type(value)):
+        return 0, '', value
+    if isinstance(value, str):
+        return 1, '', value
+    return 2, type(value).__name__, value
 
-    for column in columns:
-        # pylint: disable=cell-var-from-loop
-        is_reverse = column.startswith('-')
-        if is_reverse:
-            column = column[1:]
-        items.sort(key=lambda row: row[column], reverse=is_reverse)
 
-    if reverse:
-        items.reverse()
+def _get_column_key(items: _t.List, name: _t.Text, nulls_largest: bool) -> _t.Callable:
+    """
+    Returns sort key function of column. Values are compared as is (by C-level item getter)
+    if all of them have the same type or are numbers, otherwise they are grouped by type.
+    """
+    getter = itemgetter(name)
+    try:
+        types = set(map(type, map(getter, items)))
+    except KeyError:
+        # Missing values are nulls.
+        types = {type(None)}
+    if type(None) not in types and (len(types) == 1 or all(map(_is_number, types))):
+        return getter
+    null_key, value_group = ((1,), 0) if nulls_largest else ((0,), 1)
 
+    def key(row):
+        value = row.get(name)
+        if value is None:
+            return null_key
+        return (value_group,) + _get_value_key(value)
+
+    return key
+
+
+def multikeysort(items, columns, reverse=False, limit=None):
+    """
+    Sort list of dicts by columns.
+
+    :param items: iterable of dicts.
+    :param columns: column names (with ``-`` prefix for descending order) or ordering
+                    expressions like ``F('name').asc(nulls_first=True)``.
+                    Nulls are the greatest values if placement isn't set.
+    :param reverse: reverse order of all columns.
+    :param limit: count of first items which are only needed.
+    :return: sorted list.
+    """
+    # List is sorted by stable pass per column from the last one, because sort of plain values
+    # uses type-specialized comparisons, which are faster than comparisons of key tuples in one pass.
+    # 200k rows by int and str columns: 0.25-0.3s for two passes (like plain sort per column),
+    # 0.51s for one pass with flat key tuples and 1.5-2.5s for one pass with tuples of typed keys.
+    # The most significant column is only selected by heap when limit is set.
+    if not isinstance(items, list):
+        items = list(items)  # nocv
+    specs = [_get_column_spec(column, reverse) for column in columns]
+    for index, (name, descending, nulls_largest) in enumerate(reversed(specs)):
+        key = _get_column_key(items, name, nulls_largest)
+        if index == len(specs) - 1 and limit is not None and limit < len(items):
+            # Both functions are stable like sort.
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return select(max(limit, 0), items, key=key)
+        items.sort(key=key, reverse=descending)
     return items
 
 
@@ -1,4 +1,6 @@
 # pylint: disable=invalid-name
+import re
+
 from django.conf import settings
 from django.urls.conf import include, re_path
 from django.contrib import admin
@@ -8,7 +10,9 @@ from rest_framework import permissions
 
 from .api.routers import MainRouter
 from .utils import URLHandlers
-from .api.views import HealthView
+from .api.views import HealthView, HealthProbeView, MetricsView
+from .gui.views import StaticFilesView, BlobView
+from .static_files import HASH_LENGTH
 
 
 class AdminLoginLogoutRedirectView(RedirectView):
@@ -19,6 +23,9 @@ class AdminLoginLogoutRedirectView(RedirectView):
 router = MainRouter(perms=(permissions.IsAuthenticated,))
 router.generate_routers(settings.API)
 router.register_view('health', HealthView.as_view({'get': 'list'}), 'health')
+router.register_view('health/live', HealthProbeView.as_view({'get': 'live'}), 'health_live')
+router.register_view('health/ready', HealthProbeView.as_view({'get': 'list'}), 'health_ready')
+router.register_view('metrics', MetricsView.as_view({'get': 'list'}), 'metrics')
 
 
 admin.site.site_header = 'Admin panel'
@@ -36,6 +43,21 @@ urlpatterns += [
 ] if getattr(settings, 'ENABLE_ADMIN_PANEL', False) else []
 
 urlpatterns += [re_path(rf'^{settings.API_URL}/', include(router.urls))]
+if settings.STATIC_URL.startswith('/'):
+    # Fingerprinted files built by `buildstatic` command.
+    urlpatterns += [re_path(
+        rf'^{re.escape(settings.STATIC_URL[1:])}(?P<path>.+\.[0-9a-f]{{{HASH_LENGTH}}}\.[^/.]+)$',
+        StaticFilesView.as_view(),
+        name='static_build'
+    )]
 urlpatterns += staticfiles_urlpatterns(settings.STATIC_URL)
+blobs_url = str(settings.BLOB_STORAGE.get('OPTIONS', {}).get('base_url', ''))
+if blobs_url.startswith('/'):
+    # Blobs of local storage, e.g. from binary fields in blob storage mode.
+    urlpatterns += [re_path(
+        rf'^{re.escape(blobs_url[1:])}[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<blob_hash>[0-9a-f]{{64}})$',
+        BlobView.as_view(),
+        name='blob'
+    )]
 if 'docs' in settings.INSTALLED_APPS:  # nocv
     urlpatterns += [re_path(rf'^{doc_url}', include(('docs.urls', settings.VST_PROJECT), namespace='docs'))]
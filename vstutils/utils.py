@@ -1,10 +1,19 @@
 # pylint: disable=django-not-available,invalid-name,import-outside-toplevel,too-many-lines
+import asyncio
 import base64
 import codecs
+import collections
 import io
+import itertools
 import logging
+import operator
 import os
 import pickle
+import random
+import re
+import selectors
+import smtplib
+import socket
 import subprocess
 import sys
 import tempfile
@@ -12,14 +21,19 @@ import time
 import traceback
 import types
 import typing as tp
+import uuid
 import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from threading import Thread
+from threading import Thread, Event, Lock as ThreadLock, current_thread, main_thread
 import json
 
 from django.urls import re_path, include
-from django.core.mail import send_mail
+from django.core.mail import send_mail, get_connection, EmailMultiAlternatives
 from django.core.cache import caches, InvalidCacheBackendError
+from django.db import connections
+from django.db.models.query import ValuesIterable, ValuesListIterable, FlatValuesListIterable
 from django.core.paginator import Paginator as BasePaginator
 from django.template import loader
 from django.utils import translation, functional
@@ -178,6 +192,143 @@ def send_template_email(sync: bool = False, **kwargs):
         SendEmailMessage.do(email_from=settings.EMAIL_FROM_ADDRESS, **kwargs)
 
 
+def _is_transient_smtp_error(error: BaseException) -> bool:
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 4xx codes are temporary failures by RFC 5321.
+        return 400 <= error.smtp_code < 500
+    # Other smtp errors are subclasses of OSError too, but they are permanent.
+    return not isinstance(error, smtplib.SMTPException) and isinstance(error, socket.error)
+
+
+def _get_recipient(recipient: tp.Union[tp.Text, tp.Dict]) -> tp.Tuple[tp.Text, tp.Dict, tp.Optional[tp.Text]]:
+    if isinstance(recipient, dict):
+        return recipient['email'], recipient.get('context') or {}, recipient.get('language')
+    return recipient, {}, None
+
+
+def send_template_emails_handler(
+        subject: tp.Text,
+        email_from: tp.Text,
+        recipients: tp.Iterable[tp.Union[tp.Text, tp.Dict]],
+        template_name: tp.Text,
+        context_data: tp.Optional[tp.Dict] = None,
+        batch_size: tp.Optional[int] = None,
+        max_retries: tp.Optional[int] = None,
+) -> int:
+    """
+    Function for bulk email sending. Every recipient gets its own message.
+    Template is loaded once, messages without personal context are rendered once per language,
+    and messages are sent through one SMTP connection by ``batch_size`` messages.
+    Messages failed with temporary SMTP errors are retried with exponential backoff
+    through new connection (only not yet delivered messages of batch are sent again).
+
+    :param subject: mail subject (translated to recipient language).
+    :param email_from: sender that be setup in email.
+    :param recipients: email addresses or dicts with ``email`` and optional ``context``
+                       (personal context data) and ``language`` (language code) keys.
+    :param template_name: relative path to template in `templates` directory, must include extension in file name.
+    :param context_data: dictionary with common context for rendering message template.
+    :param batch_size: count of messages sent through connection at once. Default is ``EMAIL_BATCH_SIZE`` setting.
+    :param max_retries: count of retries on temporary errors. Default is ``EMAIL_MAX_RETRIES`` setting.
+    :return: count of sent messages.
+    """
+    from django.conf import settings
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    max_retries = settings.EMAIL_MAX_RETRIES if max_retries is None else max_retries
+    template = loader.get_template(template_name)
+    common_context = dict(context_data or {})
+    rendered: tp.Dict[tp.Optional[tp.Text], tp.Tuple[tp.Text, tp.Text]] = {}
+
+    def render(context: tp.Dict, language: tp.Optional[tp.Text]) -> tp.Tuple[tp.Text, tp.Text]:
+        with translation.override(language or translation.get_language()):
+            return translation.gettext(subject) if subject else subject, template.render({**common_context, **context})
+
+    def make_message(recipient: tp.Union[tp.Text, tp.Dict]) -> EmailMultiAlternatives:
+        email, context, language = _get_recipient(recipient)
+        if context:
+            message_subject, html = render(context, language)
+        else:
+            if language not in rendered:
+                rendered[language] = render(context, language)
+            message_subject, html = rendered[language]
+        message = EmailMultiAlternatives(message_subject, '', email_from, [email])
+        message.attach_alternative(html, 'text/html')
+        return message
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        recipients_iterator = iter(recipients)
+        while True:
+            batch = [make_message(recipient) for recipient in itertools.islice(recipients_iterator, batch_size)]
+            if not batch:
+                break
+            position = 0
+            for attempt in range(max_retries + 1):
+                try:
+                    connection.open()
+                    # Messages are sent one by one, so retry doesn't resend already delivered messages.
+                    while position < len(batch):
+                        sent += connection.send_messages(batch[position:position + 1]) or 0
+                        position += 1
+                    break
+                except Exception as error:
+                    if attempt >= max_retries or not _is_transient_smtp_error(error):
+                        raise
+                    logger.warning(f'Temporary error while sending emails: {error}. Retrying.')
+                    with raise_context():
+                        connection.close()
+                    time.sleep(settings.EMAIL_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))  # nosec
+    finally:
+        connection.close()
+    return sent
+
+
+def send_template_emails(sync: bool = False, **kwargs):
+    """
+    Function executing sync or async bulk email sending by :func:`.send_template_emails_handler`.
+    With celery, recipients are split to chunks by ``EMAIL_TASK_CHUNK_SIZE`` setting and every chunk
+    is sent by separate task.
+
+    :param sync: argument for determining how send email, asynchronously or synchronously
+    :param subject: mail subject.
+    :param recipients: email addresses or dicts with ``email``, ``context`` and ``language`` keys.
+    :param template_name: relative path to template in `templates` directory, must include extension in file name.
+    :param context_data: dictionary with common context for rendering message template.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import send_template_emails
+
+            send_template_emails(
+                subject='News',
+                template_name='news.html',
+                context_data={'news': news},
+                recipients=[
+                    {'email': user.email, 'context': {'user': user.username}, 'language': user.lang}
+                    for user in users
+                ],
+            )
+    """
+    from django.conf import settings
+    if sync or not settings.RPC_ENABLED:
+        return send_template_emails_handler(email_from=settings.EMAIL_FROM_ADDRESS, **kwargs)
+    from .tasks import SendEmailMessages
+    recipients = list(kwargs.pop('recipients'))
+    chunk_size = settings.EMAIL_TASK_CHUNK_SIZE
+    return [
+        SendEmailMessages.do(
+            email_from=settings.EMAIL_FROM_ADDRESS,
+            recipients=recipients[start:start + chunk_size],
+            **kwargs
+        )
+        for start in range(0, len(recipients), chunk_size)
+    ]
+
+
 class apply_decorators:
     """
     Decorator which apply list of decorators on method or class.
@@ -699,6 +850,540 @@ class UnhandledExecutor(Executor):
     working_handler = None  # type: ignore
 
 
+class OutputBuffer:
+    """
+    Text buffer which keeps only last ``limit`` characters of written text
+    and optionally writes full text to ``spill_file``.
+
+    :param limit: -- max size of kept text in characters or ``None`` for unlimited buffer.
+    :type limit: int,None
+    :param spill_file: -- path to file for full output.
+    :type spill_file: str,Path,None
+    """
+    __slots__ = ('limit', 'size', 'truncated', '_chunks', '_file')
+
+    def __init__(self, limit: tp.Optional[int] = None, spill_file: tp.Optional[tp.Union[tp.Text, Path]] = None):
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+        self._chunks: tp.Deque[tp.Text] = collections.deque()
+        # pylint: disable=consider-using-with
+        self._file = open(spill_file, 'a', encoding='utf-8') if spill_file else None
+
+    def write(self, text: tp.Text) -> None:
+        if not text:
+            return
+        if self._file is not None:
+            self._file.write(text)
+        self._chunks.append(text)
+        self.size += len(text)
+        if self.limit is None:
+            return
+        while self.size > self.limit:
+            self.truncated = True
+            overflow = self.size - self.limit
+            first = self._chunks[0]
+            if len(first) <= overflow:
+                self._chunks.popleft()
+                self.size -= len(first)
+            else:
+                self._chunks[0] = first[overflow:]
+                self.size -= overflow
+
+    def getvalue(self) -> tp.Text:
+        if len(self._chunks) > 1:
+            value = ''.join(self._chunks)
+            self._chunks.clear()
+            self._chunks.append(value)
+        return self._chunks[0] if self._chunks else ''
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _LinesSplitter:
+    __slots__ = ('decoder', 'pending')
+
+    newlines_regex = re.compile(r'\r\n|\r|\n')
+
+    def __init__(self, encoding: tp.Text = 'utf-8'):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.pending = ''
+
+    def feed(self, data: bytes, final: bool = False) -> tp.List[tp.Text]:
+        text = self.pending + self.decoder.decode(data, final)
+        hold = ''
+        if not final and text.endswith('\r'):
+            # "\r" may be the first part of "\r\n" separator.
+            text, hold = text[:-1], '\r'
+        lines = self.newlines_regex.split(text)
+        self.pending = lines.pop() + hold
+        if final and self.pending:
+            lines.append(self.pending)
+            self.pending = ''
+        return [line.rstrip() for line in lines]
+
+
+class StreamingExecutor(Executor):
+    """
+    Event-driven variant of :class:`.Executor` for long-running commands with huge output.
+
+    * stdout and stderr are read in chunks of ``CHUNK_SIZE`` bytes with :mod:`selectors`,
+      and lines are delivered in batches to :meth:`.StreamingExecutor.lines_handler`,
+      which calls :meth:`.Executor.line_handler` for every line by default;
+    * ``output`` keeps only last ``output_limit`` characters (unlimited by default)
+      and full output may be written to ``output_file``;
+    * there is no polling thread: :meth:`.Executor.working_handler` is called from reading loop
+      at most once per ``WORKING_INTERVAL`` seconds, and :meth:`.StreamingExecutor.cancel`
+      wakes up reading loop and terminates process immediately.
+
+    Use :meth:`.StreamingExecutor.aexecute` in async code.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import StreamingExecutor
+
+
+            class AnsibleExecutor(StreamingExecutor):
+                def lines_handler(self, lines):
+                    super().lines_handler(lines)
+                    save_history_lines(lines)
+
+
+            executor = AnsibleExecutor(output_limit=1024 * 1024, output_file='/tmp/job.log')
+            executor.execute(['ansible-playbook', 'main.yml'], '/projects/1')
+    """
+    __slots__ = ('output_limit', 'output_file', '_buffer', '_cancelled', '_wakeup', '_wakeup_lock')
+
+    CHUNK_SIZE: tp.ClassVar[int] = 64 * 1024
+    LINES_BATCH: tp.ClassVar[int] = 512
+    WORKING_INTERVAL: tp.ClassVar[float] = 0.1
+    ENCODING: tp.ClassVar[tp.Text] = 'utf-8'
+
+    def __init__(self, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                 output_limit: tp.Optional[int] = None, output_file: tp.Optional[tp.Union[tp.Text, Path]] = None,
+                 **environ_variables):
+        """
+        :type stdout: BinaryIO,int
+        :type stderr: BinaryIO,int
+        :param output_limit: -- max size of ``output`` in characters.
+        :type output_limit: int,None
+        :param output_file: -- file for full output.
+        :type output_file: str,Path,None
+        """
+        self.output_limit = output_limit
+        self.output_file = output_file
+        self._buffer = OutputBuffer(output_limit)
+        self._cancelled = Event()
+        self._wakeup: tp.Optional[tp.Tuple[int, int]] = None
+        # Descriptors of wakeup pipe are written by other threads only while they are open.
+        self._wakeup_lock = ThreadLock()
+        super().__init__(stdout, stderr, **environ_variables)
+
+    @property  # type: ignore
+    def output(self) -> tp.Text:  # type: ignore
+        return self._buffer.getvalue()
+
+    @output.setter
+    def output(self, value: tp.Text) -> None:
+        self._buffer = OutputBuffer(self.output_limit)
+        self._buffer.write(value)
+
+    def write_output(self, line: tp.Text) -> None:
+        self._buffer.write(str(line))
+
+    def lines_handler(self, lines: tp.List[tp.Text]) -> None:
+        """
+        Handler for batch of output lines.
+
+        :param lines: -- lines from command output
+        :type lines: list
+        """
+        for line in lines:
+            self.line_handler(line)
+
+    def cancel(self) -> None:
+        """
+        Terminate executing process. Can be called from any thread.
+        """
+        self._cancelled.set()
+        with self._wakeup_lock:
+            if self._wakeup is not None:
+                with raise_context():
+                    os.write(self._wakeup[1], b'\0')
+
+    def _get_working_handler(self) -> tp.Optional[tp.Callable]:
+        # Default handler does nothing, so there is no need to wake up for it.
+        if getattr(self.working_handler, '__func__', None) is Executor.working_handler:
+            return None
+        return self.working_handler
+
+    def _read_output(self, proc: subprocess.Popen) -> None:
+        # pylint: disable=too-many-branches
+        working_handler = self._get_working_handler()
+        streams = [stream for stream in (proc.stdout, proc.stderr) if stream is not None]
+        with selectors.DefaultSelector() as selector:
+            for stream in streams:
+                selector.register(stream, selectors.EVENT_READ, _LinesSplitter(self.ENCODING))
+            selector.register(self._wakeup[0], selectors.EVENT_READ, None)  # type: ignore
+            last_check = time.monotonic()
+            while streams:
+                timeout = None
+                if working_handler is not None:
+                    timeout = max(self.WORKING_INTERVAL - (time.monotonic() - last_check), 0)
+                lines: tp.List[tp.Text] = []
+                for key, _ in selector.select(timeout):
+                    if key.data is None:
+                        os.read(key.fd, 1024)
+                        continue
+                    data = os.read(key.fd, self.CHUNK_SIZE)
+                    lines.extend(key.data.feed(data, final=not data))
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        streams.remove(key.fileobj)
+                        key.fileobj.close()  # type: ignore
+                    while len(lines) >= self.LINES_BATCH:
+                        self.lines_handler(lines[:self.LINES_BATCH])
+                        lines = lines[self.LINES_BATCH:]
+                if lines:
+                    self.lines_handler(lines)
+                if self._cancelled.is_set() and proc.poll() is None:
+                    proc.terminate()
+                if working_handler is not None and time.monotonic() - last_check >= self.WORKING_INTERVAL:
+                    working_handler(proc)
+                    last_check = time.monotonic()
+
+    def execute(self, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]) -> tp.Text:
+        """
+        Execute commands and output this.
+
+        :param cmd: -- list of cmd command and arguments
+        :type cmd: list
+        :param cwd: -- workdir for executions
+        :type cwd: str
+        :return: -- string with output (last ``output_limit`` characters)
+        :rtype: str
+        """
+        self._buffer = OutputBuffer(self.output_limit, self.output_file)
+        self._cancelled.clear()
+        env = os.environ.copy()
+        env.update(self.env)
+        with self._wakeup_lock:
+            self._wakeup = os.pipe()
+            # Cancel must not block while holding lock if pipe is full.
+            os.set_blocking(self._wakeup[1], False)
+        try:
+            proc = subprocess.Popen(  # pylint: disable=consider-using-with
+                cmd, stdout=self._stdout, stderr=self._stderr,
+                bufsize=0, cwd=str(cwd), env=env,
+                close_fds=ON_POSIX
+            )
+            if self._cancelled.is_set():  # nocv
+                proc.terminate()
+            self._read_output(proc)
+            return_code = proc.wait()
+        finally:
+            with self._wakeup_lock:
+                for descriptor in self._wakeup:
+                    os.close(descriptor)
+                self._wakeup = None
+            self._buffer.close()
+        if return_code:
+            logger.error(self.output)
+            raise subprocess.CalledProcessError(
+                return_code, cmd, output=str(self.output)
+            )
+        return self.output
+
+    async def aexecute(self, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]) -> tp.Text:
+        """
+        Same as :meth:`.StreamingExecutor.execute` but awaitable.
+        Process is supervised in default executor of running event loop
+        and cancelling of awaiting task terminates process.
+        """
+        future = asyncio.get_event_loop().run_in_executor(None, self.execute, cmd, cwd)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.cancel()
+            with raise_context():
+                await future
+            raise
+
+
+class _AsyncProcessPopen:
+    """
+    :class:`subprocess.Popen` compatible wrapper for :class:`asyncio.subprocess.Process`
+    which is safe to use from worker thread.
+    """
+    __slots__ = ('_process', '_loop', 'args')
+
+    def __init__(self, process, loop: asyncio.AbstractEventLoop, args: tp.List[tp.Text]):
+        self._process = process
+        self._loop = loop
+        self.args = args
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    @property
+    def returncode(self) -> tp.Optional[int]:
+        return self._process.returncode
+
+    def poll(self) -> tp.Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: tp.Optional[float] = None) -> int:
+        future = asyncio.run_coroutine_threadsafe(asyncio.wait_for(self._process.wait(), timeout), self._loop)
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+
+    def _call(self, method: tp.Text, *args) -> None:
+        if self._process.returncode is None:
+            with raise_context():
+                getattr(self._process, method)(*args)
+
+    def send_signal(self, sig: int) -> None:
+        self._loop.call_soon_threadsafe(self._call, 'send_signal', sig)
+
+    def terminate(self) -> None:
+        self._loop.call_soon_threadsafe(self._call, 'terminate')
+
+    def kill(self) -> None:
+        self._loop.call_soon_threadsafe(self._call, 'kill')
+
+
+class AsyncExecutor(StreamingExecutor):
+    """
+    Asynchronous variant of :class:`.StreamingExecutor` based on :func:`asyncio.create_subprocess_exec`.
+    Doesn't use any threads, so one event loop can supervise hundreds of processes.
+
+    :meth:`.AsyncExecutor.aexecute` is a coroutine which calls asynchronous hooks
+    :meth:`.AsyncExecutor.alines_handler`, :meth:`.AsyncExecutor.aline_handler`
+    and :meth:`.AsyncExecutor.aworking_handler` (by default they call synchronous ones),
+    and :meth:`.StreamingExecutor.execute` still works synchronously with synchronous hooks.
+    ``semaphore`` (:class:`asyncio.Semaphore`) limits count of concurrently
+    executed processes shared between executors, and :meth:`.AsyncExecutor.execute_many`
+    runs many commands with concurrency cap.
+
+    .. note::
+        Python before 3.8 can't spawn subprocesses from event loop outside of main thread
+        (e.g. in ``async_to_sync`` or celery worker), so there process is supervised in thread
+        like in :meth:`.StreamingExecutor.aexecute` and hooks are called in event loop.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import AsyncExecutor
+
+
+            class WebSocketExecutor(AsyncExecutor):
+                def __init__(self, consumer, **kwargs):
+                    super().__init__(**kwargs)
+                    self.consumer = consumer
+
+                async def aline_handler(self, line):
+                    await super().aline_handler(line)
+                    await self.consumer.send_json({'line': line})
+
+
+            # inside async consumer method
+            output = await WebSocketExecutor(self).aexecute(['ansible-playbook', 'main.yml'], '/projects/1')
+    """
+    __slots__ = ('semaphore', '_process', '_loop', '_handler_lock', '_cmd')
+
+    def __init__(self, *args, semaphore: tp.Optional[asyncio.Semaphore] = None, **kwargs):
+        """
+        :param semaphore: -- semaphore which limits concurrently executed processes.
+        :type semaphore: asyncio.Semaphore,None
+        """
+        self.semaphore = semaphore
+        self._process: tp.Optional[asyncio.subprocess.Process] = None  # pylint: disable=no-member
+        self._loop: tp.Optional[asyncio.AbstractEventLoop] = None
+        self._handler_lock: tp.Optional[asyncio.Lock] = None
+        self._cmd: tp.List[tp.Text] = []
+        super().__init__(*args, **kwargs)
+
+    async def alines_handler(self, lines: tp.List[tp.Text]) -> None:
+        """
+        Asynchronous handler for batch of output lines.
+
+        :param lines: -- lines from command output
+        :type lines: list
+        """
+        for line in lines:
+            await self.aline_handler(line)
+
+    async def aline_handler(self, line: tp.Text) -> None:
+        """
+        Asynchronous handler for output line. Calls :meth:`.Executor.line_handler` by default.
+        """
+        self.line_handler(line)
+
+    async def aworking_handler(self, process) -> None:
+        """
+        Asynchronous handler which is called every ``WORKING_INTERVAL`` seconds while process is running.
+        Receives :class:`asyncio.subprocess.Process` (or :class:`subprocess.Popen`
+        when process is supervised in thread).
+
+        By default calls :meth:`.Executor.working_handler` in default executor of event loop,
+        so synchronous handler doesn't block the loop. Handler receives :class:`subprocess.Popen`
+        compatible object with ``pid``, ``returncode``, ``poll()``, ``wait()``,
+        ``send_signal()``, ``terminate()`` and ``kill()``.
+        """
+        loop = asyncio.get_event_loop()
+        if isinstance(process, asyncio.subprocess.Process):  # pylint: disable=no-member
+            process = _AsyncProcessPopen(process, loop, self._cmd)
+        await loop.run_in_executor(None, self.working_handler, process)
+
+    def _has_aworking_handler(self) -> bool:
+        return getattr(self.aworking_handler, '__func__', None) is not AsyncExecutor.aworking_handler
+
+    def _call_in_loop(self, coroutine) -> None:
+        asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()  # type: ignore
+
+    def lines_handler(self, lines: tp.List[tp.Text]) -> None:
+        if self._loop is None:
+            super().lines_handler(lines)
+        else:
+            # Process is supervised in thread, but hooks are called in event loop.
+            self._call_in_loop(self.alines_handler(lines))
+
+    def _get_working_handler(self) -> tp.Optional[tp.Callable]:
+        if self._loop is not None and self._has_aworking_handler():
+            return lambda process: self._call_in_loop(self.aworking_handler(process))
+        return super()._get_working_handler()
+
+    def _supervise_in_thread(self) -> bool:
+        return sys.version_info < (3, 8) and current_thread() is not main_thread()
+
+    def _terminate(self) -> None:
+        process = self._process
+        if process is not None and process.returncode is None:
+            with raise_context():
+                process.terminate()
+
+    def cancel(self) -> None:
+        """
+        Terminate executing process. Can be called from any thread.
+        """
+        super().cancel()
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._terminate)
+
+    async def _read_stream(self, stream: asyncio.StreamReader) -> None:
+        splitter = _LinesSplitter(self.ENCODING)
+        while True:
+            data = await stream.read(self.CHUNK_SIZE)
+            lines = splitter.feed(data, final=not data)
+            for start in range(0, len(lines), self.LINES_BATCH):
+                async with self._handler_lock:  # type: ignore
+                    await self.alines_handler(lines[start:start + self.LINES_BATCH])
+            if not data:
+                break
+
+    async def _watch(self, process) -> None:
+        while process.returncode is None:
+            try:
+                await asyncio.wait_for(asyncio.shield(process.wait()), self.WORKING_INTERVAL)
+            except asyncio.TimeoutError:
+                await self.aworking_handler(process)
+
+    async def _execute(self, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]) -> int:
+        env = os.environ.copy()
+        env.update(self.env)
+        self._handler_lock = asyncio.Lock()
+        self._cmd = cmd
+        process = self._process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=self._stdout, stderr=self._stderr,
+            cwd=str(cwd), env=env, close_fds=ON_POSIX
+        )
+        watcher = None
+        if self._get_working_handler() is not None:
+            watcher = asyncio.ensure_future(self._watch(process))
+        try:
+            if self._cancelled.is_set():
+                self._terminate()
+            await asyncio.gather(*(
+                self._read_stream(stream)
+                for stream in (process.stdout, process.stderr)
+                if stream is not None
+            ))
+            return await process.wait()
+        except asyncio.CancelledError:
+            self._terminate()
+            await asyncio.shield(process.wait())
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self._process = None
+
+    async def _aexecute(self, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]) -> tp.Text:
+        self._loop = asyncio.get_event_loop()
+        try:
+            if self._supervise_in_thread():
+                return await super().aexecute(cmd, cwd)
+            self._buffer = OutputBuffer(self.output_limit, self.output_file)
+            self._cancelled.clear()
+            try:
+                return_code = await self._execute(cmd, cwd)
+            finally:
+                self._buffer.close()
+        finally:
+            self._loop = None
+        if return_code:
+            logger.error(self.output)
+            raise subprocess.CalledProcessError(
+                return_code, cmd, output=str(self.output)
+            )
+        return self.output
+
+    async def aexecute(self, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]) -> tp.Text:
+        """
+        Execute commands in event loop and output this.
+
+        :param cmd: -- list of cmd command and arguments
+        :type cmd: list
+        :param cwd: -- workdir for executions
+        :type cwd: str
+        :return: -- string with output (last ``output_limit`` characters)
+        :rtype: str
+        """
+        if self.semaphore is None:
+            return await self._aexecute(cmd, cwd)
+        async with self.semaphore:
+            return await self._aexecute(cmd, cwd)
+
+    @staticmethod
+    async def execute_many(jobs: tp.Iterable[tp.Tuple['AsyncExecutor', tp.List[tp.Text], tp.Union[tp.Text, Path]]],
+                           concurrency: tp.Optional[int] = None) -> tp.List[tp.Union[tp.Text, BaseException]]:
+        """
+        Execute many commands concurrently, but not more than ``concurrency`` at the same time.
+
+        :param jobs: -- iterable of ``(executor, cmd, cwd)`` tuples.
+        :param concurrency: -- max count of concurrently running processes.
+        :type concurrency: int,None
+        :return: -- list of outputs or exceptions in order of jobs.
+        """
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def run(executor: AsyncExecutor, cmd: tp.List[tp.Text], cwd: tp.Union[tp.Text, Path]):
+            if semaphore is None:
+                return await executor.aexecute(cmd, cwd)
+            async with semaphore:
+                return await executor.aexecute(cmd, cwd)
+
+        return await asyncio.gather(*(run(*job) for job in jobs), return_exceptions=True)
+
+
 class KVExchanger(BaseVstObject):
     """
     Class for transmit data using key-value fast (cache-like) storage between
@@ -706,6 +1391,15 @@ class KVExchanger(BaseVstObject):
     """
     TIMEOUT: tp.ClassVar[int] = 60
 
+    # Lua scripts for atomic owner-checked operations on redis backends.
+    COMPARE_AND_DELETE: tp.ClassVar[tp.Text] = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    )
+    COMPARE_AND_EXPIRE: tp.ClassVar[tp.Text] = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+
     @classproperty
     def PREFIX(cls):
         # pylint: disable=no-self-argument
@@ -727,10 +1421,18 @@ class KVExchanger(BaseVstObject):
         # pylint: disable=no-member
         return self.cache.add(self.key, value, ttl or self.timeout)
 
-    def prolong(self, ttl=None):
+    def _touch(self, ttl, key=None):
         # pylint: disable=no-member
-        payload = self.cache.get(self.key)
-        self.cache.set(self.key, payload, ttl or self.timeout)
+        key = key or self.key
+        try:
+            return self.cache.touch(key, ttl)
+        except NotImplementedError:  # nocv
+            payload = self.cache.get(key)
+            self.cache.set(key, payload, ttl)
+            return True
+
+    def prolong(self, ttl=None):
+        return self._touch(ttl or self.timeout)
 
     def get(self):
         # pylint: disable=no-member
@@ -742,18 +1444,134 @@ class KVExchanger(BaseVstObject):
         # pylint: disable=no-member
         self.cache.delete(self.key)
 
+    def _get_redis_client(self):
+        # pylint: disable=no-member
+        client = getattr(self.cache, 'client', None)
+        if all(hasattr(client, attr) for attr in ('get_client', 'make_key', 'encode')):
+            return client  # nocv
+        return None
+
+    def compare_and_delete(self, expected) -> bool:
+        """
+        Delete key only if it still holds ``expected`` value.
+        Atomic on redis backends, otherwise checks value right before deletion.
+
+        :param expected: -- value which should be stored in key.
+        :return: -- ``True`` if key was deleted.
+        """
+        # pylint: disable=no-member
+        client = self._get_redis_client()
+        if client is not None:  # nocv
+            return bool(client.get_client(write=True).eval(
+                self.COMPARE_AND_DELETE, 1, client.make_key(self.key), client.encode(expected)
+            ))
+        if self.cache.get(self.key) != expected:
+            return False
+        self.cache.delete(self.key)
+        return True
+
+    def compare_and_prolong(self, expected, ttl=None) -> bool:
+        """
+        Prolong key TTL only if it still holds ``expected`` value.
+        Atomic on redis backends, otherwise checks value right before prolongation.
+
+        :param expected: -- value which should be stored in key.
+        :param ttl: -- new TTL in seconds. Default is ``timeout`` of object.
+        :return: -- ``True`` if key was prolonged.
+        """
+        # pylint: disable=no-member
+        ttl = ttl or self.timeout
+        client = self._get_redis_client()
+        if client is not None:  # nocv
+            return bool(client.get_client(write=True).eval(
+                self.COMPARE_AND_EXPIRE, 1, client.make_key(self.key), client.encode(expected), int(ttl * 1000)
+            ))
+        if self.cache.get(self.key) != expected:
+            return False
+        return bool(self._touch(ttl))
+
+
+class ProgressExchanger(KVExchanger):
+    """
+    Progress counters (``total``, ``done`` and ``failed``) of job
+    which is executed by many workers. Counters are incremented atomically
+    on backends which support atomic ``incr`` (redis, memcached).
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import ProgressExchanger
+
+            progress = ProgressExchanger('backfill-1')
+            progress.start(total=1000)
+            # in workers
+            progress.add(done=100, failed=1)
+            # anywhere
+            progress.get()  # {'total': 1000, 'done': 100, 'failed': 1}
+    """
+    TIMEOUT: tp.ClassVar[int] = 60 * 60 * 24
+    FIELDS: tp.ClassVar[tp.Tuple[tp.Text, ...]] = ('total', 'done', 'failed')
+
+    def _field_key(self, field: tp.Text) -> tp.Text:
+        return f'{self.key}_{field}'
+
+    def start(self, total: int = 0) -> None:
+        # pylint: disable=no-member
+        self.cache.set_many({self._field_key(field): 0 for field in self.FIELDS}, self.timeout)
+        self.cache.set(self._field_key('total'), total, self.timeout)
+
+    def add(self, **counters: int) -> None:
+        # pylint: disable=no-member
+        for field, value in counters.items():
+            if not value:
+                continue
+            key = self._field_key(field)
+            try:
+                self.cache.incr(key, value)
+            except ValueError:
+                if not self.cache.add(key, value, self.timeout):  # nocv
+                    self.cache.incr(key, value)
+
+    def get(self) -> tp.Dict[tp.Text, int]:
+        # pylint: disable=no-member
+        values = self.cache.get_many([self._field_key(field) for field in self.FIELDS])
+        return {field: values.get(self._field_key(field), 0) for field in self.FIELDS}
+
+    def delete(self) -> None:
+        # pylint: disable=no-member
+        self.cache.delete_many([self._field_key(field) for field in self.FIELDS])
+
 
 class Lock(KVExchanger):
     """
     Lock class for multi-jobs workflow.
+    Every acquired lock owns unique token, so lock can be released or prolonged only by its owner
+    and expired lock never removes lock acquired by another worker.
+    While waiting for lock, attempts are repeated with exponential backoff.
+
+    Owner can get monotonically increasing ``fencing_token`` of acquisition
+    which can be passed to protected resources to reject requests from stale owners.
+    Token is requested from cache on first access (only while lock is still owned),
+    so locks without fencing make no extra requests.
+    Counter of tokens expires after ``FENCE_TIMEOUT`` seconds without acquisitions.
+
+    Lock is stored in cache as ``(token, payload)`` tuple.
+    :meth:`.Lock.get` returns payload and also reads values stored as payload only
+    (e.g. by previous versions).
 
     .. note::
         - Used django.core.cache lib and settings in `settings.py`
         - Have Lock.SCHEDULER and Lock.GLOBAL id
+        - For long critical sections use ``auto_renew=True`` and lock will be prolonged
+          in background thread every ``timeout / 3`` seconds until release.
     """
     TIMEOUT: tp.ClassVar[int] = 60 * 60 * 24
     GLOBAL: tp.ClassVar[tp.Text] = "global-deploy"
     SCHEDULER: tp.ClassVar[tp.Text] = "celery-beat"
+    MIN_BACKOFF: tp.ClassVar[float] = 0.005
+    MAX_BACKOFF: tp.ClassVar[float] = 0.5
+    FENCING: tp.ClassVar[bool] = True
+    FENCE_TIMEOUT: tp.ClassVar[int] = 60 * 60 * 24 * 30
 
     class AcquireLockException(Exception):
         pass
@@ -763,7 +1581,7 @@ class Lock(KVExchanger):
         # pylint: disable=no-self-argument
         return f"{cls.get_django_settings('VST_PROJECT_LIB')}_lock_"
 
-    def __init__(self, id, payload=None, repeat=1, err_msg="", timeout=None):
+    def __init__(self, id, payload=None, repeat=1, err_msg="", timeout=None, auto_renew=False):
         # pylint: disable=too-many-arguments
         """
         :param id: -- unique id for lock.
@@ -773,19 +1591,115 @@ class Lock(KVExchanger):
         :type repeat: int
         :param err_msg: -- message for AcquireLockException error.
         :type err_msg: str
+        :param auto_renew: -- prolong lock in background thread until release.
+        :type auto_renew: bool
         """
         super().__init__(id, timeout)
-        self.id, start = None, time.time()
-        while time.time() - start <= repeat:
-            if self.send(payload):
-                self.id = id
-                return
-            time.sleep(0.01)
-        raise self.AcquireLockException(err_msg)
+        self.id, self._fencing_token, self._renewal = None, None, None
+        self._value = (uuid.uuid4().hex, payload)
+        start = time.monotonic()
+        acquired = self._wait_for(self._acquire, start + repeat)
+        self._observe_wait(time.monotonic() - start, acquired)
+        if not acquired:
+            raise self.AcquireLockException(err_msg)
+        self.id = id
+        if auto_renew:
+            self.start_renewal()
+
+    def _acquire(self) -> bool:
+        return bool(self.send(self._value))
+
+    def _observe_wait(self, duration: float, acquired: bool):
+        from .metrics import lock_wait_time  # pylint: disable=import-outside-toplevel
+        lock_wait_time.observe(duration, kind=self.__class__.__name__, result='acquired' if acquired else 'timeout')
+
+    def _wait_for(self, attempt: tp.Callable[[], bool], deadline: float) -> bool:
+        delay = self.MIN_BACKOFF
+        while not attempt():
+            remaining = deadline - time.monotonic()
+            if remaining < 0:
+                return False
+            time.sleep(min(delay * random.uniform(0.5, 1.5), remaining))  # nosec
+            delay = min(delay * 2, self.MAX_BACKOFF)
+        return True
+
+    @property
+    def token(self) -> tp.Text:
+        return self._value[0]
+
+    @property
+    def fencing_token(self) -> tp.Optional[int]:
+        """
+        Monotonically increasing token of acquisition (``None`` for released lock).
+
+        :raises Lock.AcquireLockException: if lock was lost before token was got.
+        """
+        if self._fencing_token is None and self.FENCING and self.id is not None:
+            self._fencing_token = self._next_fencing_token()
+        return self._fencing_token
+
+    def _next_fencing_token(self) -> int:
+        # pylint: disable=no-member
+        fence_key = f'{self.key}_fence'
+        self.cache.add(fence_key, 0, self.FENCE_TIMEOUT)
+        try:
+            token = self.cache.incr(fence_key)
+        except ValueError:  # nocv
+            self.cache.add(fence_key, 1, self.FENCE_TIMEOUT)
+            token = 1
+        else:
+            # Counters of unused keys (e.g. locks by pk) are not kept forever.
+            self._touch(self.FENCE_TIMEOUT, fence_key)
+        # Token is got after acquisition, so it's valid only if lock wasn't lost before.
+        if self.cache.get(self.key) != self._value:
+            raise self.AcquireLockException(f'Lock "{self.key}" was lost.')
+        return token
 
-    def get(self):  # nocv
+    def get(self):
         # pylint: disable=no-member
-        return self.cache.get(self.key)
+        value = self.cache.get(self.key)
+        return value[1] if isinstance(value, tuple) else value
+
+    def extend(self, ttl=None) -> bool:
+        """
+        Prolong lock if it is still owned.
+
+        :param ttl: -- new TTL in seconds. Default is ``timeout`` of lock.
+        :return: -- ``False`` if lock was expired or acquired by another owner.
+        """
+        if self.id is None:
+            return False
+        return self.compare_and_prolong(self._value, ttl)
+
+    prolong = extend
+
+    def start_renewal(self, interval=None):
+        """
+        Start daemon thread which prolongs lock every ``interval`` seconds
+        (``timeout / 3`` by default) until lock release or loss.
+        """
+        if self._renewal is not None:
+            return
+        stop_event, lock_ref = Event(), weakref.ref(self)
+        interval = interval or self.timeout / 3
+
+        def renew():
+            while not stop_event.wait(interval):
+                lock = lock_ref()
+                if lock is None:
+                    return  # nocv
+                if not lock.extend():
+                    logger.warning(f'Lock "{lock.key}" was lost before release.')
+                    return
+                del lock
+
+        self._renewal = stop_event
+        Thread(target=renew, name=f'lock-renewal-{self.key}', daemon=True).start()
+
+    def stop_renewal(self):
+        if getattr(self, '_renewal', None) is not None:
+            self._renewal.set()
+            self._renewal = None
 
     def __enter__(self):
         return self
@@ -793,14 +1707,165 @@ class Lock(KVExchanger):
     def __exit__(self, type_e, value, tb):
         self.release()
 
-    def release(self):
-        # pylint: disable=no-member
-        self.cache.delete(self.key)
+    def release(self) -> bool:
+        self.stop_renewal()
+        if getattr(self, 'id', None) is None:
+            return False
+        self.id = None
+        return self.compare_and_delete(self._value)
 
     def __del__(self):
         self.release()
 
 
+class Semaphore(Lock):
+    """
+    Lock which allows up to ``limit`` concurrent owners with the same id.
+    Every owner holds one of ``limit`` slots, so slots of crashed workers
+    are freed after ``timeout``. Supports same interface as :class:`.Lock`.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import Semaphore
+
+            with Semaphore(f'export_{tenant_id}', limit=3, repeat=10):
+                # Only 3 exports per tenant will run at the same time
+                # across all web and celery workers.
+                make_export(tenant_id)
+    """
+    FENCING: tp.ClassVar[bool] = False
+
+    @classproperty
+    def PREFIX(cls):
+        # pylint: disable=no-self-argument
+        return f"{cls.get_django_settings('VST_PROJECT_LIB')}_semaphore_"
+
+    def __init__(self, id, limit, *args, **kwargs):
+        """
+        :param id: -- unique id for semaphore.
+        :type id: int,str
+        :param limit: -- count of concurrent owners.
+        :type limit: int
+        """
+        self.limit, self.slot = limit, None
+        self.slot_keys = [f'{self.PREFIX}{id}_{slot}' for slot in range(limit)]
+        super().__init__(id, *args, **kwargs)
+
+    def send(self, value, ttl=None):
+        # pylint: disable=no-member
+        busy = self.cache.get_many(self.slot_keys)
+        free_slots = [slot for slot, key in enumerate(self.slot_keys) if key not in busy]
+        random.shuffle(free_slots)
+        for slot in free_slots:
+            if self.cache.add(self.slot_keys[slot], value, ttl or self.timeout):
+                self.key, self.slot = self.slot_keys[slot], slot
+                return True
+        return False
+
+    @property
+    def holders(self) -> int:
+        """
+        Count of currently acquired slots.
+        """
+        # pylint: disable=no-member
+        return len(self.cache.get_many(self.slot_keys))
+
+
+class _RWLockReader(Semaphore):
+    @classproperty
+    def PREFIX(cls):
+        # pylint: disable=no-self-argument
+        return f"{cls.get_django_settings('VST_PROJECT_LIB')}_rwlock_"
+
+    def __init__(self, id, max_readers, *args, **kwargs):
+        self.writer_key = f'{self.PREFIX}{id}_writer'
+        super().__init__(f'{id}_readers', max_readers, *args, **kwargs)
+
+    def send(self, value, ttl=None):
+        # pylint: disable=no-member
+        if self.cache.get(self.writer_key) is not None or not super().send(value, ttl):
+            return False
+        if self.cache.get(self.writer_key) is not None:
+            # Writer came between check and acquire, so give it a way.
+            self.compare_and_delete(value)
+            return False
+        return True
+
+
+class _RWLockWriter(Lock):
+    @classproperty
+    def PREFIX(cls):
+        # pylint: disable=no-self-argument
+        return f"{cls.get_django_settings('VST_PROJECT_LIB')}_rwlock_"
+
+    def __init__(self, id, max_readers, *args, **kwargs):
+        self.reader_keys = [f'{self.PREFIX}{id}_readers_{slot}' for slot in range(max_readers)]
+        self._writer_held = False
+        try:
+            super().__init__(f'{id}_writer', *args, **kwargs)
+        except self.AcquireLockException:
+            if self._writer_held:
+                self.compare_and_delete(self._value)
+            raise
+
+    def _acquire(self) -> bool:
+        # pylint: disable=no-member
+        if not self._writer_held:
+            # New readers wait while writer key exists.
+            self._writer_held = super()._acquire()
+        return self._writer_held and not self.cache.get_many(self.reader_keys)
+
+
+class RWLock(BaseVstObject):
+    """
+    Readers-writer lock: many readers can hold lock at the same time, but writer
+    waits until all readers leave and excludes everyone else. Writers have priority,
+    so new readers wait while writer is waiting.
+    Lock is stored in `locks` cache and every holder recovers after ``timeout`` on crash.
+    All kwargs are passed to acquired :class:`.Lock` (``repeat``, ``timeout``, ``auto_renew`` and etc.).
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import RWLock
+
+            config_lock = RWLock('config', repeat=5)
+
+            with config_lock.read():
+                # Many workers can read config.
+                data = read_config()
+
+            with config_lock.write():
+                # Only one worker changes config and nobody reads it.
+                write_config(data)
+    """
+    MAX_READERS: tp.ClassVar[int] = 64
+
+    def __init__(self, id, max_readers=None, **kwargs):
+        """
+        :param id: -- unique id for lock.
+        :type id: int,str
+        :param max_readers: -- limit of concurrent readers.
+        :type max_readers: int
+        """
+        self.id = id
+        self.max_readers = max_readers or self.MAX_READERS
+        self.kwargs = kwargs
+
+    def read(self, **kwargs) -> Lock:
+        """
+        Acquire lock for reading.
+        """
+        return _RWLockReader(self.id, self.max_readers, **{**self.kwargs, **kwargs})
+
+    def write(self, **kwargs) -> Lock:
+        """
+        Acquire exclusive lock for writing.
+        """
+        return _RWLockWriter(self.id, self.max_readers, **{**self.kwargs, **kwargs})
+
+
 class __LockAbstractDecorator:
     _err = "Wait until the end."
     _lock_key = None
@@ -809,9 +1874,18 @@ class __LockAbstractDecorator:
         self.kwargs = kwargs
         self.kwargs["err_msg"] = self.kwargs.get("err_msg", self._err)
 
+    def get_lock_key(self, *args, **kwargs):
+        if callable(self._lock_key):
+            return self._lock_key(*args, **kwargs)
+        return self._lock_key
+
+    def get_lock(self, lock_key):
+        return Lock(lock_key, **self.kwargs)
+
     def execute(self, func, *args, **kwargs):
-        if self._lock_key is not None:
-            with Lock(self._lock_key, **self.kwargs):
+        lock_key = self.get_lock_key(*args, **kwargs)
+        if lock_key is not None:
+            with self.get_lock(lock_key):
                 return func(*args, **kwargs)
         return func(*args, **kwargs)
 
@@ -825,7 +1899,8 @@ class __LockAbstractDecorator:
 class model_lock_decorator(__LockAbstractDecorator):
     """
     Decorator for functions where 'pk' kwarg exist
-    for lock by id.
+    for lock by id. All decorator kwargs (``repeat``, ``timeout``, ``auto_renew`` and etc.)
+    are passed to :class:`.Lock`.
 
     .. warning::
         - On locked error raised ``Lock.AcquireLockException``
@@ -834,9 +1909,62 @@ class model_lock_decorator(__LockAbstractDecorator):
     """
     _err = "Object locked. Wait until unlock."
 
-    def execute(self, func, *args, **kwargs):
-        self._lock_key = kwargs.get('pk', None)
-        return super().execute(func, *args, **kwargs)
+    def get_lock_key(self, *args, **kwargs):
+        return kwargs.get('pk', None)
+
+
+class semaphore_decorator(__LockAbstractDecorator):
+    """
+    Decorator which limits concurrent executions of function by :class:`.Semaphore`.
+    Other kwargs are passed to :class:`.Semaphore`.
+
+    Example:
+        .. sourcecode:: python
+
+            from vstutils.utils import semaphore_decorator
+
+            @semaphore_decorator(lambda tenant, **kw: f'export_{tenant}', limit=3, repeat=10)
+            def heavy_export(tenant):
+                ...
+
+    .. warning::
+        - On exceeded limit raised ``Lock.AcquireLockException``
+
+    :param key: -- semaphore id or callable which gets id from function arguments.
+    :param limit: -- count of concurrent executions.
+    """
+    _err = "Too many concurrent executions. Wait until the end."
+
+    def __init__(self, key, limit, **kwargs):
+        super().__init__(**kwargs)
+        self._lock_key = key
+        self.limit = limit
+
+    def get_lock(self, lock_key):
+        return Semaphore(lock_key, self.limit, **self.kwargs)
+
+
+class rwlock_decorator(__LockAbstractDecorator):
+    """
+    Decorator which executes function under read or write lock of :class:`.RWLock`.
+    Other kwargs are passed to acquired lock.
+
+    .. warning::
+        - On locked error raised ``Lock.AcquireLockException``
+
+    :param key: -- lock id or callable which gets id from function arguments.
+    :param write: -- acquire exclusive write lock instead of read.
+    """
+
+    def __init__(self, key, write=False, max_readers=None, **kwargs):
+        super().__init__(**kwargs)
+        self._lock_key = key
+        self.write = write
+        self.max_readers = max_readers
+
+    def get_lock(self, lock_key):
+        lock = RWLock(lock_key, self.max_readers, **self.kwargs)
+        return lock.write() if self.write else lock.read()
 
 
 class Paginator(BasePaginator):
@@ -866,6 +1994,109 @@ class Paginator(BasePaginator):
                 yield obj
 
 
+class KeysetPaginator(BaseVstObject):
+    """
+    Class for fragmenting the query for small queries by ranges of unique key (keyset pagination).
+    Unlike :class:`.Paginator` it doesn't count objects and doesn't use ``OFFSET``,
+    so every chunk is fetched by ``key > last_key ORDER BY key LIMIT chunk_size``
+    query with constant cost, and objects are never skipped or repeated
+    when table is changed during iteration.
+
+    With ``prefetch=True`` next chunk is fetched in background thread
+    while current chunk is handled. Prefetching is disabled inside transactions,
+    because other connections can't see uncommitted changes.
+
+    Querysets of objects, ``values()`` and ``values_list()`` are supported,
+    but key must be selected by ``values()`` and ``values_list()`` with fields.
+    """
+    __slots__ = ('qs', 'chunk_size', 'key', 'prefetch', '_get_last_key_value', '_lookup', '_is_objects')
+
+    _values_iterables = (ValuesIterable, ValuesListIterable, FlatValuesListIterable)
+
+    def __init__(self, qs, chunk_size=None, key='pk', prefetch=False):
+        """
+        :param qs: -- queryset for fragmenting
+        :type qs: django.db.models.QuerySet
+        :param chunk_size: -- size of the fragments.
+        :type chunk_size: int
+        :param key: -- unique and indexed field name used for ordering (``-`` prefix for descending order).
+        :type key: str
+        :param prefetch: -- fetch next chunk in background thread.
+        :type prefetch: bool
+        :raises ValueError: if rows of ``values()`` or ``values_list()`` don't contain key.
+        """
+        self.chunk_size = chunk_size or self.get_django_settings("PAGE_LIMIT", None)
+        self.key = key
+        self.prefetch = prefetch
+        field_name = key.lstrip('-')
+        self._lookup = f'{field_name}__{"lt" if key.startswith("-") else "gt"}'
+        self._is_objects = not issubclass(qs._iterable_class, self._values_iterables)
+        self._get_last_key_value = self._get_key_getter(qs, field_name)
+        self.qs = qs.order_by(key)
+
+    @classmethod
+    def _get_key_getter(cls, qs, field_name) -> tp.Callable:
+        # pylint: disable=protected-access
+        pk = qs.model._meta.pk
+        names = (field_name,) if field_name != 'pk' else ('pk', pk.attname, pk.name)
+        if not issubclass(qs._iterable_class, cls._values_iterables):
+            return operator.attrgetter(pk.attname if field_name == 'pk' else field_name)
+        fields = list(qs._fields or ())
+        if not fields:
+            # Rows contain all concrete fields.
+            fields = [field.attname for field in qs.model._meta.concrete_fields]
+            if issubclass(qs._iterable_class, ValuesIterable):
+                fields = fields + list(qs.query.annotation_select)
+        name = next((name for name in names if name in fields), None)
+        if name is None:
+            raise ValueError(f'Key "{field_name}" must be selected in values() or values_list() of queryset.')
+        if issubclass(qs._iterable_class, ValuesIterable):
+            return operator.itemgetter(name)
+        if issubclass(qs._iterable_class, FlatValuesListIterable):
+            return lambda value: value
+        return operator.itemgetter(fields.index(name))
+
+    def _get_last_key(self, chunk):
+        return self._get_last_key_value(chunk[-1])
+
+    def get_chunk(self, last_key=None) -> tp.List:
+        qs = self.qs
+        if last_key is not None:
+            qs = qs.filter(**{self._lookup: last_key})
+        return list(qs[:self.chunk_size])
+
+    def _can_prefetch(self) -> bool:
+        return self.prefetch and not connections[self.qs.db].in_atomic_block
+
+    def __iter__(self) -> tp.Iterator[tp.List]:
+        chunk = self.get_chunk()
+        if not self._can_prefetch():
+            while chunk:
+                yield chunk
+                if len(chunk) < self.chunk_size:
+                    return
+                chunk = self.get_chunk(self._get_last_key(chunk))
+            return
+        with ThreadPoolExecutor(1) as executor:
+            try:
+                while chunk:
+                    future = None
+                    if len(chunk) >= self.chunk_size:
+                        future = executor.submit(self.get_chunk, self._get_last_key(chunk))
+                    yield chunk
+                    chunk = future.result() if future is not None else []
+            finally:
+                # Connections are thread-local, so close ones opened by worker thread.
+                executor.submit(connections.close_all)
+
+    def items(self):
+        for chunk in self:
+            for obj in chunk:
+                if self._is_objects:
+                    obj.paginator = self
+                yield obj
+
+
 class ObjectHandlers(BaseVstObject):
     """
     Handlers wrapper for get objects from some settings structure.